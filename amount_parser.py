@@ -0,0 +1,111 @@
+"""
+	parses the tip amount following the (last) u/chaintip mention of a tipping comment:
+
+		u/chaintip <prefix_symbol><decimal>     e.g. u/chaintip $1.50
+		u/chaintip <quantity> <unit>            e.g. u/chaintip 2 beers, u/chaintip a coffee, u/chaintip 5 usd
+		u/chaintip <unit>                       e.g. u/chaintip cookie
+
+	Only a bounded tail after the mention is tokenized and units, prefix symbols and
+	quantity aliases from amount_config are looked up in dicts built once at import.
+	A 3-letter word is a currency code only if amount_config uses it or it is among the
+	currencies passed in (e.g. those quoted by an exchange), so "u/chaintip for the help" has no amount.
+	parseAmount() doesn't raise; it returns Amount, NoAmount or UnparseableAmount.
+"""
+
+import re
+from decimal import Decimal
+from typing import NamedTuple
+
+from .config import amount_config
+
+MENTION = "u/chaintip"
+MAX_TAIL_CHARS = 200 # amount is in the first words after the mention
+
+# --- parse results ---
+
+class Amount(NamedTuple):
+	quantity: Decimal
+	unit: str # unit name or currency code, see resolveUnit()
+	text: str # as displayed in tiplist
+
+class NoAmount(NamedTuple):
+	"""no mention or mention not followed by an amount: default amount applies"""
+	mention_found: bool
+
+class UnparseableAmount(NamedTuple):
+	"""mention followed by something that starts like an amount but isn't one"""
+	text: str
+	reason: str
+
+# --- lookup tables ---
+
+UNITS_BY_NAME = {}
+for unit in amount_config["units"]:
+	for name in unit["names"]:
+		UNITS_BY_NAME.setdefault(name.lower(), unit) # first unit listing a name wins
+PREFIX_SYMBOLS = amount_config["prefix_symbols"]
+QUANTITY_ALIASES = {alias.lower(): quantity for alias, quantity in amount_config["quantity_aliases"].items()}
+CONFIG_CURRENCIES = frozenset([unit["value_currency"] for unit in amount_config["units"]] + list(PREFIX_SYMBOLS.values()))
+
+p_decimal = re.compile(r'\d+\.?\d*|\.\d+')
+p_word = re.compile(r'\w*')
+
+def resolveUnit(name: str, currencies = frozenset()):
+	"""unit record (dict with "value" and "value_currency") for unit name or known currency code (CONFIG_CURRENCIES or currencies), None if unknown"""
+	if not name:
+		return None
+	unit = UNITS_BY_NAME.get(name.lower(), None)
+	if unit is None and len(name) == 3:
+		code = name.upper()
+		if code in CONFIG_CURRENCIES or code in currencies:
+			unit = {"names": [code], "value": Decimal("1"), "value_currency": code}
+	return unit
+
+def findMention(body: str):
+	"""index after the last 'u/chaintip' not followed by a word character (-1 if none)"""
+	i = body.rfind(MENTION)
+	while i >= 0:
+		end = i + len(MENTION)
+		if end >= len(body) or not (body[end].isalnum() or body[end] in "_-"):
+			return end
+		i = body.rfind(MENTION, 0, i)
+	return -1
+
+def parseAmount(body: str, currencies = frozenset()):
+	"""returns Amount, NoAmount or UnparseableAmount for the tipping comment body (currencies: see resolveUnit())"""
+	start = findMention(body)
+	if start < 0:
+		return NoAmount(False)
+	tokens = body[start:start + MAX_TAIL_CHARS].split(None, 2)[:2]
+	if len(tokens) == 0:
+		return NoAmount(True)
+	first = tokens[0]
+
+	# <prefix_symbol><decimal>
+	if first[0] in PREFIX_SYMBOLS:
+		number = first[1:] if len(first) > 1 else (tokens[1] if len(tokens) > 1 else "")
+		m = p_decimal.match(number)
+		if not m:
+			return UnparseableAmount(first, "no decimal after currency symbol")
+		return Amount(Decimal(m.group()), PREFIX_SYMBOLS[first[0]], first[0] + m.group())
+
+	# <quantity> <unit>
+	if first.lower() in QUANTITY_ALIASES:
+		quantity = QUANTITY_ALIASES[first.lower()]
+	elif first[0].isdigit() or first[0] == ".":
+		m = p_decimal.fullmatch(first)
+		if not m:
+			return UnparseableAmount(first, "invalid quantity")
+		quantity = Decimal(m.group())
+	else: # <unit>
+		unit = p_word.match(first).group()
+		if resolveUnit(unit, currencies):
+			return Amount(Decimal("1"), unit, unit)
+		return NoAmount(True)
+
+	if len(tokens) < 2:
+		return UnparseableAmount(first, "missing unit")
+	unit = p_word.match(tokens[1]).group()
+	if not resolveUnit(unit, currencies):
+		return UnparseableAmount(f"{first} {tokens[1]}", "unknown unit")
+	return Amount(quantity, unit, f"{quantity} {unit}")
@@ -9,7 +9,7 @@ from electroncash.address import Address
 from electroncash.transaction import Transaction
 from electroncash.bitcoin import COIN, TYPE_ADDRESS
 
-from .model import TipListener
+from .model import TipListener, PaymentState
 from .util import read_config
 from .config import c
 
@@ -66,21 +66,21 @@ class AutoPay(TipListener, PrintError):
 		# 	return False
 
 		# not ready to pay?
-		if tip.payment_status != 'ready to pay': return False
+		if tip.payment_state != PaymentState.READY_TO_PAY: return False
 
 		# recipient_address set?
 		if \
 			tip.recipient_address == None or \
 			not isinstance(tip.recipient_address, Address) \
 		:
-			tip.payment_status = 'invalid recipient address'
+			tip.setPaymentState(PaymentState.AUTOPAY_BLOCKED, 'invalid recipient address')
 			tip.update()
 			return False
 
 		# autopay deactivated?
 		if not read_config(wallet, "autopay"): 
 			#tip.print_error("autopay: ", read_config(wallet, "autopay"))
-			tip.payment_status = 'autopay disabled'
+			tip.setPaymentState(PaymentState.AUTOPAY_BLOCKED, 'autopay disabled')
 			tip.update()
 			return False		
 
@@ -92,7 +92,7 @@ class AutoPay(TipListener, PrintError):
 		if read_config(wallet, "autopay_disallow_default") \
 			and tip.default_amount_used \
 		: 
-			tip.payment_status = 'autopay disallowed (default amount)'
+			tip.setPaymentState(PaymentState.AUTOPAY_BLOCKED, 'autopay disallowed (default amount)')
 			tip.update()
 			return False
 
@@ -100,7 +100,7 @@ class AutoPay(TipListener, PrintError):
 		autopay_use_limit = read_config(wallet, "autopay_use_limit")
 		autopay_limit_bch = Decimal(read_config(wallet, "autopay_limit_bch"))
 		if autopay_use_limit and tip.amount_bch > autopay_limit_bch: 
-			tip.payment_status = "autopay amount-limited"
+			tip.setPaymentState(PaymentState.AUTOPAY_BLOCKED, "autopay amount-limited")
 			tip.update()
 			return False
 
@@ -114,8 +114,8 @@ class AutoPay(TipListener, PrintError):
 		if len(tips) <= 0:
 			return False
 
-		# (re)check wether tips qualify for autopay
-		tips = [tip for tip in tips if self.qualifiesForAutopay(tip)]
+		# (re)check wether tips qualify for autopay, claiming them atomically (amount can't change while autopaying)
+		tips = [tip for tip in tips if self.qualifiesForAutopay(tip) and tip.setPaymentState(PaymentState.AUTOPAYING, expected = PaymentState.READY_TO_PAY)]
 
 		if len(tips) <= 0:
 			return
@@ -129,18 +129,15 @@ class AutoPay(TipListener, PrintError):
 				desc_separator = ", "
 		self.print_error("label for tx: ", desc)
 
-		# construct transaction
-		outputs = []
-		#outputs.append(OPReturn.output_for_stringdata(op_return))
-		for tip in tips:
-			address = tip.recipient_address
-			amount = int(COIN * tip.amount_bch)
-			outputs.append((TYPE_ADDRESS, address, amount))
-			self.print_error("address: ", address, "amount:", amount)
-
 		try:
+			# construct transaction
+			outputs = []
+			#outputs.append(OPReturn.output_for_stringdata(op_return))
 			for tip in tips:
-				tip.payment_status = "autopaying..."
+				address = tip.recipient_address
+				amount = int(COIN * tip.amount_bch)
+				outputs.append((TYPE_ADDRESS, address, amount))
+				self.print_error("address: ", address, "amount:", amount)
 
 			tx = self.wallet.mktx(outputs, password=None, config=get_config())
 
@@ -161,7 +158,7 @@ class AutoPay(TipListener, PrintError):
 				#sleep(3) # my god, where have I gone?
 			else:
 				for tip in tips:
-					tip.payment_status = "autopay error: " + msg
+					tip.setPaymentState(PaymentState.AUTOPAY_ERROR, "autopay error: " + msg)
 					self.tiplist.updateTip(tip)
 
 			return status
@@ -173,7 +170,7 @@ class AutoPay(TipListener, PrintError):
 			else:
 				error = "tx create/send error: " + str(e).partition('\n')[0]
 			for tip in tips:
-				tip.payment_status = error
+				tip.setPaymentState(PaymentState.AUTOPAY_ERROR, error)
 				self.tiplist.updateTip(tip)
 			return False
 
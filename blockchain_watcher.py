@@ -1,3 +1,5 @@
+import heapq
+import threading
 import traceback
 from decimal import Decimal
 from time import time
@@ -5,33 +7,69 @@ from time import time
 from electroncash.util import PrintError
 from electroncash.network import Network
 from electroncash.address import Address
-from electroncash.transaction import Transaction
 
+from .config import c
 from .model import TipListener
+from .payment_attribution import PaymentAttribution
+from .subscription_batcher import SubscriptionBatcher
+from .tx_cache import TxCache
+from .tx_decoder import output_scripthashes
 
 class BlockchainWatcher(TipListener, PrintError):
 	"""
 		BlockchainWatcher 
 		listens for tips 
 		and uses electrum network to watch for payments to recipient addresses 
-		in order to mark tips as paid
+		in order to mark tips as paid.
+		Recipient scripthashes are collected and subscribed to in chunks by do_work()
+		(see SubscriptionBatcher), which also resubscribes everything after a server switch.
+		At most c["max_watched_addresses"] are watched. Addresses are ranked by (has unfinished
+		tips, newest tip time): when full, a higher ranked address evicts the lowest ranked watched
+		one (e.g. old tips that were never paid), which waits for a free slot like other addresses
+		that didn't get one. Finished tips are unsubscribed once all their payments have
+		c["unwatch_min_confirmations"] and marked payments_confirmed, recheck() watches them again.
+		Payments made by this wallet are matched from the wallet's own transactions (scanned once
+		by do_work(), then as they arrive), only other transactions are fetched from the server.
+		Statuses, histories and fetched outputs are kept in a persisted TxCache, so unchanged
+		addresses cost no requests after a restart. Outputs are attributed to tips by
+		PaymentAttribution, as several tips can share a recipient address.
 	""" 
 
 	def __init__(self, wallet, tiplist):
 		self.wallet = wallet
 		self.network = self.wallet.weak_window().network
 		self.tiplist = tiplist
+		self.lock = threading.Lock()
+		self.processed_tx_hashes = set() # matched or requested this session
+		self.requested_statuses = {} # status by scripthash of pending history requests
+		self.tx_cache = TxCache()
+		self.watched = set() # subscribed recipient scripthashes
+		self.attribution = PaymentAttribution() # tips and payments by recipient scripthash
+		self.wallet_scanned = False
+		self.local_tx_count = 0 # wallet transactions matched
+		self.local_request_count = 0 # history transactions taken from wallet instead of requesting them
+		self.fetched_tx_count = 0
+		self.waiting = set() # scripthashes waiting for a free watch slot
+		self.ranks = {} # rank (see rank()) by watched or waiting scripthash
+		self.watched_heap = [] # (rank, scripthash), lowest first, entries with outdated rank are skipped
+		self.waiting_heap = [] # (negated rank, scripthash), highest rank first, likewise
+		self.evict_count = 0
+		self.settled_heights = {} # by watched scripthash: height of last tx if all its history is confirmed
+		self.unwatch_count = 0
+		self.batcher = SubscriptionBatcher(self.subscribe)
 		self.tiplist.registerTipListener(self)
-		self.hash2tip = {}
-		self.requested_tx_hashes = {}
-		self.tips_by_address = {} # track tips by address
-		self.tipless_payments_by_address = {} # track payments that did not have a tip associated at the time of receiving
+		if self.network:
+			self.network.register_callback(self.on_new_transaction, ['new_transaction'])
 
 	def __del__(self):
 		self.tiplist.unregisterTipListener(self)		
 
+	def close(self):
+		if self.network:
+			self.network.unregister_callback(self.on_new_transaction)
+
 	def debug_stats(self):
-		return f" BlockchainWatcher: {len(self.hash2tip.keys())} scripthash subscriptions"
+		return f" BlockchainWatcher: {len(self.watched)} watched addresses, {len(self.waiting)} waiting, {self.unwatch_count} unwatched, {self.evict_count} evicted, {self.batcher.debug_stats()}, {self.local_tx_count} wallet txs matched, {self.local_request_count} history txs taken from wallet, {self.fetched_tx_count} fetched, {self.tx_cache.debug_stats()}, {self.attribution.debug_stats()}"
 
 	# stolen from synchronizer
 	def parse_response(self, response):
@@ -47,57 +85,259 @@ class BlockchainWatcher(TipListener, PrintError):
 	# TipListener overrides
 
 	def tipRemoved(self, tip):
-		self.tips_by_address.pop(tip.recipient_address, None)
+		scripthash = tip.getScripthash()
+		self.attribution.removeTip(tip)
+		if len(self.attribution.tips(scripthash)) == 0:
+			with self.lock:
+				self.watched.discard(scripthash)
+				self.waiting.discard(scripthash)
+				self.ranks.pop(scripthash, None)
 
 	def tipAdded(self, tip):
-		self.tipUpdated(tip)
+		self.registerTip(tip)
+
+	def tipsAdded(self, tips):
+		for tip in tips:
+			self.registerTip(tip)
 
 	def tipUpdated(self, tip):
-		if isinstance(tip.recipient_address, Address):
-			# check if already seen a payment
-			if tip.recipient_address in self.tipless_payments_by_address:
-				payment = self.tipless_payments_by_address[tip.recipient_address]
-				tip.registerPayment(payment["tx_hash"], payment["amount_bch"], "chain")
-
-			# subscribe to recipient address scripthash
-			if tip.recipient_address not in self.tips_by_address:
-				self.tips_by_address[tip.recipient_address] = tip
-
-				scripthash = tip.recipient_address.to_scripthash_hex()
-				if scripthash not in self.hash2tip.keys():
-					self.hash2tip[scripthash] = tip
-
-				# subscribe to scripthash
-				if not self.network:
-					self.print_error("no network, unable to check for tip payments")
-				else:
-					#self.print_error("subscribing to ", tip.recipient_address)
-					self.network.subscribe_to_scripthashes([scripthash], self.on_status_change)
-					tip.subscription_time = time()
-
-	def on_status_change(self, c):
-		scripthash = c["params"][0]
-		#txhash = c["result"]
-		tip = self.hash2tip[scripthash]
+		self.registerTip(tip)
+
+	#
+
+	def registerTip(self, tip):
+		"""track tip by recipient scripthash, queueing the scripthash for subscription if new and there is room (waiting otherwise)"""
+		scripthash = tip.getScripthash()
+		if scripthash is None:
+			return
+		# attribute payments seen before
+		self.registerPayments(self.attribution.addTip(tip, scripthash))
+		if tip.payments_confirmed and tip.isFinished():
+			return
+		rank = self.rank(scripthash)
+		evicted = None
+		with self.lock:
+			if scripthash in self.watched:
+				self.setRank(scripthash, rank)
+				is_new = False
+			elif scripthash in self.waiting:
+				self.setRank(scripthash, rank)
+				is_new = False
+			else:
+				is_new = True
+				if len(self.watched) >= c["max_watched_addresses"]:
+					lowest = self.peekRanked(self.watched_heap, self.watched, 1)
+					if lowest is not None and lowest[0] < rank:
+						evicted = lowest[1]
+						self.watched.discard(evicted)
+						self.settled_heights.pop(evicted, None)
+						self.waiting.add(evicted)
+						self.ranks.pop(evicted)
+						self.setRank(evicted, lowest[0])
+						self.evict_count += 1
+					else:
+						self.waiting.add(scripthash)
+						is_new = False
+				if is_new:
+					self.watched.add(scripthash)
+				self.setRank(scripthash, rank)
+		if evicted is not None:
+			self.unsubscribe([evicted])
+		if is_new:
+			self.batcher.add(scripthash)
+		elif not getattr(tip, "subscription_time", None) and self.batcher.isSubscribed(scripthash):
+			tip.subscription_time = time() # e.g. repeat tip to a watched address, do_work() only sees new subscriptions
+
+	def rank(self, scripthash):
+		"""(has unfinished tips, newest tip time) of tips at scripthash, higher ranks are watched first"""
+		tips = self.attribution.tips(scripthash)
+		return (any(not tip.isFinished() for tip in tips), max((tip.getCreatedUTC() or 0 for tip in tips), default=0))
+
+	def setRank(self, scripthash, rank):
+		"""(caller holds lock)"""
+		if self.ranks.get(scripthash, None) == rank:
+			return
+		self.ranks[scripthash] = rank
+		if scripthash in self.watched:
+			heapq.heappush(self.watched_heap, (rank, scripthash))
+		else:
+			heapq.heappush(self.waiting_heap, ((-rank[0], -rank[1]), scripthash))
+
+	def peekRanked(self, heap, members, sign):
+		"""(rank, scripthash) on top of heap among members, dropping outdated entries (caller holds lock)"""
+		while len(heap) > 0:
+			key, scripthash = heap[0]
+			rank = key if sign > 0 else (-key[0], -key[1])
+			if scripthash in members and self.ranks.get(scripthash, None) == rank:
+				return rank, scripthash
+			heapq.heappop(heap)
+		return None
+
+	def unsubscribe(self, scripthashes):
+		unsubscribe = getattr(self.network, "unsubscribe_from_scripthashes", None) # not available in older electroncash
+		unsubscribed = [scripthash for scripthash in scripthashes if self.batcher.remove(scripthash)]
+		if unsubscribe and len(unsubscribed) > 0:
+			unsubscribe(unsubscribed, self.on_status_change)
+
+	def recheck(self, tips):
+		"""watch settled tips again (regardless of max_watched_addresses) to pick up payments made after they were unwatched"""
+		for tip in tips:
+			scripthash = tip.getScripthash()
+			if scripthash is None:
+				continue
+			with self.lock:
+				self.waiting.discard(scripthash)
+				self.settled_heights.pop(scripthash, None)
+				self.watched.add(scripthash)
+				self.ranks.pop(scripthash, None)
+				self.setRank(scripthash, (True, tip.getCreatedUTC() or 0))
+			self.tx_cache.forgetHistory(scripthash)
+			self.batcher.remove(scripthash) # resubscribe to get current status
+			self.batcher.add(scripthash)
+			tip.payments_confirmed = False
+			tip.update()
+
+	def unwatchSettled(self):
+		"""unsubscribe addresses whose tips are all finished and have enough confirmations, then fill free slots from waiting ones"""
+		local_height = self.network.get_local_height()
+		settled = []
+		with self.lock:
+			for scripthash, height in list(self.settled_heights.items()):
+				if scripthash not in self.watched:
+					del self.settled_heights[scripthash]
+					continue
+				tips = self.attribution.tips(scripthash)
+				if local_height - height + 1 >= c["unwatch_min_confirmations"] and len(tips) > 0 and all(tip.isFinished() for tip in tips):
+					del self.settled_heights[scripthash]
+					self.watched.discard(scripthash)
+					self.ranks.pop(scripthash, None)
+					settled.append((scripthash, tips))
+			room = c["max_watched_addresses"] - len(self.watched)
+			promoted = []
+			while room > 0:
+				top = self.peekRanked(self.waiting_heap, self.waiting, -1)
+				if top is None:
+					break
+				rank, scripthash = top
+				heapq.heappop(self.waiting_heap)
+				self.waiting.discard(scripthash)
+				self.watched.add(scripthash)
+				self.ranks.pop(scripthash, None)
+				self.setRank(scripthash, rank)
+				promoted.append(scripthash)
+				room -= 1
+		if len(settled) == 0 and len(promoted) == 0:
+			return
+		self.unwatch_count += len(settled)
+		self.unsubscribe([scripthash for scripthash, tips in settled])
+		for scripthash in promoted:
+			self.batcher.add(scripthash)
+		for scripthash, tips in settled:
+			for tip in tips:
+				tip.payments_confirmed = True
+				tip.update()
+		self.print_error(f"unwatched {len(settled)} settled addresses, {len(promoted)} waiting addresses now watched")
+
+	def do_work(self):
+		"""apply watch policy and subscribe to queued scripthashes (all of them again after a server switch)"""
+		if not self.network:
+			return
+		if not self.wallet_scanned:
+			self.scanWalletTransactions()
+		self.unwatchSettled()
+		interface = self.network.interface
+		scripthashes = self.batcher.flush(interface.server if interface else None)
+		if len(scripthashes) == 0:
+			return
+		self.print_error(f"subscribed to {len(scripthashes)} scripthashes")
+		now = time()
+		for scripthash in scripthashes:
+			for tip in self.attribution.tips(scripthash):
+				if not getattr(tip, "subscription_time", None):
+					tip.subscription_time = now
+
+	def scanWalletTransactions(self):
+		"""match outputs of all wallet transactions (before subscribing, so their history needs no tx requests)"""
+		t0 = time()
+		with self.wallet.lock:
+			transactions = list(self.wallet.transactions.items())
+		for tx_hash, tx in transactions:
+			self.matchOutputs(tx_hash, self.walletTxOutputs(tx), self.walletTxTimestamp(tx_hash))
+		self.local_tx_count += len(transactions)
+		self.wallet_scanned = True
+		self.print_error(f"scanned {len(transactions)} wallet transactions in {time() - t0:.3f}s")
+
+	def on_new_transaction(self, event, tx, wallet):
+		if wallet is self.wallet and self.wallet_scanned:
+			self.matchOutputs(tx.txid(), self.walletTxOutputs(tx), time())
+			self.local_tx_count += 1
+
+	def subscribe(self, scripthashes):
+		"""subscribe to recipient address scripthashes in a single request batch"""
+		self.network.subscribe_to_scripthashes(scripthashes, self.on_status_change)
+
+	def on_status_change(self, response):
+		scripthash = response["params"][0]
+		status = response.get("result", None) # status hash (None: no history)
+		with self.lock:
+			if scripthash not in self.watched:
+				return # unwatched meanwhile
+
+		# unchanged status: history is known
+		history = self.tx_cache.getHistory(scripthash, status)
+		if history is not None:
+			self.processHistory(scripthash, history)
+			return
 
 		# get scripthash history
+		with self.lock:
+			self.requested_statuses[scripthash] = status
 		self.network.request_scripthash_history(scripthash, self.on_address_history)		
 
 	def on_address_history(self, response):
 		params, result, error = self.parse_response(response)
 		if error:
 			return
-		tx_hashes = map(lambda item: item['tx_hash'], result)
-		self.request_tx(tx_hashes)
+		scripthash = params[0]
+		history = [[item['tx_hash'], item['height']] for item in result]
+		with self.lock:
+			requested = scripthash in self.requested_statuses
+			status = self.requested_statuses.pop(scripthash, None)
+		if requested:
+			self.tx_cache.putHistory(scripthash, status, history)
+		self.processHistory(scripthash, history)
+
+	def processHistory(self, scripthash, history):
+		"""note settled height and match transactions of scripthash history ([[tx_hash, height], ...])"""
+		with self.lock:
+			if len(history) > 0 and all(height > 0 for tx_hash, height in history):
+				self.settled_heights[scripthash] = max(height for tx_hash, height in history)
+			else:
+				self.settled_heights.pop(scripthash, None)
+		self.request_tx([tx_hash for tx_hash, height in history])
 	
 	def request_tx(self, tx_hashes):
+		"""match transactions not processed yet, taken from wallet or cache if possible, requested otherwise"""
 		requests = []
 		for tx_hash in tx_hashes:
-			if tx_hash not in self.requested_tx_hashes.keys():
-				self.requested_tx_hashes[tx_hash] = 17
+			with self.lock:
+				if tx_hash in self.processed_tx_hashes:
+					continue
+				self.processed_tx_hashes.add(tx_hash)
+			tx = self.wallet.transactions.get(tx_hash, None)
+			if tx is not None:
+				self.matchOutputs(tx_hash, self.walletTxOutputs(tx), self.walletTxTimestamp(tx_hash)) # no-op if already scanned
+				self.local_request_count += 1
+				continue
+			outputs = self.tx_cache.getOutputs(tx_hash)
+			if outputs is not None:
+				self.matchOutputs(tx_hash, outputs)
+			else:
 				requests.append(('blockchain.transaction.get', [tx_hash]))
 		#self.print_error("requesting transactions, requests: ", requests)
-		self.network.send(requests, self.on_tx)
+		if len(requests) > 0:
+			self.fetched_tx_count += len(requests)
+			self.network.send(requests, self.on_tx)
 
 	def on_tx(self, response):
 		#self.print_error("--- got tx response: ", response)
@@ -107,22 +347,30 @@ class BlockchainWatcher(TipListener, PrintError):
 			self.print_error("error for tx_hash {}, skipping".format(tx_hash))
 			return
 		try:
-			tx = Transaction(result)
-			for o in tx.outputs():
-				#self.print_error("   output", o)
-				address = o[1]
-				satoshis = o[2]
-				tip = self.tips_by_address.get(address, None)
-				if tip:
-					tip.registerPayment(tx_hash, Decimal("0.00000001") * satoshis, "chain")
-				else:
-					self.tipless_payments_by_address[address] = {
-						"tx_hash": tx_hash,
-						"amount_bch": Decimal("0.00000001") * satoshis
-					}
-				# else:
-				# 	self.print_error("address", address, ": cannot find associated tip")
-		except Exception:
+			outputs = [[scripthash.hex(), satoshis, n] for scripthash, satoshis, n in output_scripthashes(result)]
+		except ValueError:
 			traceback.print_exc()
 			self.print_msg("cannot deserialize transaction, skipping", tx_hash)
 			return
+		self.tx_cache.putOutputs(tx_hash, outputs)
+		self.matchOutputs(tx_hash, outputs)
+
+	def walletTxOutputs(self, tx):
+		"""[scripthash, satoshis, n] of wallet transaction outputs to addresses not in this wallet"""
+		return [[o[1].to_scripthash_hex(), o[2], n] for n, o in enumerate(tx.outputs()) if isinstance(o[1], Address) and not self.wallet.is_mine(o[1])]
+
+	def walletTxTimestamp(self, tx_hash):
+		"""block time of wallet transaction, None if unknown (unconfirmed)"""
+		try:
+			height, conf, timestamp = self.wallet.get_tx_height(tx_hash)
+			return timestamp or None
+		except Exception:
+			return None
+
+	def matchOutputs(self, tx_hash, outputs, timestamp: float = None):
+		"""attribute outputs ([scripthash, satoshis, n], ...) of tx to tips and register the payments"""
+		self.registerPayments(self.attribution.addOutputs(tx_hash, outputs, timestamp))
+
+	def registerPayments(self, attributed):
+		for tip, tx_hash, satoshis in attributed:
+			tip.registerPayment(tx_hash, Decimal("0.00000001") * satoshis, "chain")
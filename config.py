@@ -11,10 +11,18 @@ c = {
 			"redirect_uri": "https://localhost:18763",
 			"local_auth_server_port": 18763
 		},
-		"use_categories": False,
 		"autopay_min_wait_secs": 3,
 		"ready_to_pay_grace_secs": 2,
 		"check_grace_secs": 6,
+		"rate_cache_ttl_secs": 600,
+		"rate_cache_max_stale_secs": 60*60, # older rates aren't served while refreshing fails
+		"seen_items_bloom_capacity": 1000000,
+		"seen_items_bloom_error_rate": 0.001,
+		"seen_items_wallet_window_size": 1000, # recent seen items kept in the wallet file by the "wallet" tip store (which doesn't keep the bloom filter)
+		"pending_association_ttl_secs": 60*60*24*30,
+		"pending_association_max_entries": 10000,
+		"max_watched_addresses": 2000, # hot subscriptions held by BlockchainWatcher, further tips wait for a free slot
+		"unwatch_min_confirmations": 6, # finished tips are unsubscribed once their payments have this many confirmations
 
 		"default_default_amount": "0.1",
 		"default_default_amount_currency": "USD",
@@ -24,6 +32,7 @@ c = {
 
 		"default_activate_on_wallet_open": False,
 		"default_mark_read_digested_tips": True,
+		"default_tip_store": "wallet", # "wallet" or "sqlite"
 		
 		"default_autopay": False,
 		"default_autopay_use_limit": False,
@@ -163,5 +172,6 @@ def amount_config_to_rich_text():
 	s += "<h4>with <bg>&lt;unit&gt;</b> one of...</h4>"
 	#units_str = '<tr><td><b>Unit Names</b></td><td align="right"><b>Value</b></td><td><b>Currency</b></td></tr>' 
 	units_str = "\n".join(f'	<li><b>{", ".join(unit["names"])}</b>: {unit["value"]} {unit["value_currency"]}</li>' for unit in ac["units"])
+	units_str += "\n	<li><b>&lt;3-letter currency code&gt;</b> (quoted by an exchange): 1 of that currency</li>"
 	s += "<ul>\n" + units_str + "</ul>\n" 
 	return s
@@ -0,0 +1,90 @@
+import math
+import threading
+from collections import OrderedDict
+from time import time
+
+from electroncash.util import PrintError
+
+class FetchOutcomes(PrintError):
+	"""
+		FetchOutcomes
+		outcome of the last fetch of each tipping comment ("ok", "not_found" or "parse_failed")
+		and the number of attempts. Failed fetches are retried after RETRY_BASE_SECS, doubling
+		per attempt up to RETRY_MAX_SECS, and given up after MAX_ATTEMPTS. Oldest entries beyond
+		MAX_ENTRIES are dropped. Persisted through takePersistData()/load().
+	"""
+
+	OK = "ok"
+	NOT_FOUND = "not_found"
+	PARSE_FAILED = "parse_failed"
+
+	RETRY_BASE_SECS = 300
+	RETRY_MAX_SECS = 24 * 3600
+	MAX_ATTEMPTS = 8
+	MAX_ENTRIES = 20000
+
+	def __init__(self):
+		self.lock = threading.Lock()
+		self.outcomes = OrderedDict() # {"outcome", "attempts", "time"} by tipping comment id, oldest first
+		self.dirty = False
+
+	def debug_stats(self):
+		with self.lock:
+			counts = {}
+			given_up = 0
+			for entry in self.outcomes.values():
+				counts[entry["outcome"]] = counts.get(entry["outcome"], 0) + 1
+				if entry["outcome"] != FetchOutcomes.OK and entry["attempts"] >= FetchOutcomes.MAX_ATTEMPTS:
+					given_up += 1
+		return f"tipping comment fetch outcomes: {counts}, {given_up} given up"
+
+	def record(self, tipping_comment_id: str, outcome: str):
+		with self.lock:
+			entry = self.outcomes.pop(tipping_comment_id, None)
+			attempts = 1 if entry is None or entry["outcome"] != outcome else entry["attempts"] + 1
+			self.outcomes[tipping_comment_id] = {
+				"outcome": outcome,
+				"attempts": attempts,
+				"time": time(),
+			}
+			while len(self.outcomes) > FetchOutcomes.MAX_ENTRIES:
+				self.outcomes.popitem(last=False)
+			self.dirty = True
+
+	def forget(self, tipping_comment_id: str):
+		"""allow immediate refetch (e.g. when user asks for it)"""
+		with self.lock:
+			if self.outcomes.pop(tipping_comment_id, None):
+				self.dirty = True
+
+	def retryTime(self, tipping_comment_id: str):
+		"""time before which tipping comment shouldn't be fetched (0 if it can be fetched now, math.inf if given up)"""
+		with self.lock:
+			entry = self.outcomes.get(tipping_comment_id, None)
+		if entry is None or entry["outcome"] == FetchOutcomes.OK:
+			return 0
+		if entry["attempts"] >= FetchOutcomes.MAX_ATTEMPTS:
+			return math.inf
+		delay = min(FetchOutcomes.RETRY_BASE_SECS * 2 ** (entry["attempts"] - 1), FetchOutcomes.RETRY_MAX_SECS)
+		return entry["time"] + delay
+
+	def takePersistData(self):
+		"""returns dict to persist if changed, None otherwise"""
+		with self.lock:
+			if not self.dirty:
+				return None
+			self.dirty = False
+			return {"outcomes": dict(self.outcomes)}
+
+	def load(self, d: dict):
+		"""merge persisted entries (stored entries are older than any recorded this session)"""
+		if not d:
+			return
+		with self.lock:
+			outcomes = OrderedDict(sorted(d.get("outcomes", {}).items(), key=lambda i: i[1]["time"]))
+			for tipping_comment_id, entry in self.outcomes.items():
+				outcomes.pop(tipping_comment_id, None)
+				outcomes[tipping_comment_id] = entry
+			while len(outcomes) > FetchOutcomes.MAX_ENTRIES:
+				outcomes.popitem(last=False)
+			self.outcomes = outcomes
@@ -0,0 +1,154 @@
+"""
+	classifies chaintip inbox items (messages by subject, comments by body markers) and
+	extracts their fields with anchored or literal-prefixed patterns, so each body is
+	scanned a bounded number of times instead of backtracking through leading '.*' groups.
+	Has no electroncash/praw dependencies (see scripts/bench_message_classifier.py).
+"""
+
+import re
+from typing import NamedTuple, Optional
+
+# --- parse results ---
+
+class ClaimReturn(NamedTuple):
+	"""'Tip claimed.', 'Tip returned to you.' or 'Tip funded.' message"""
+	action: str
+	claimant: str
+	amount: str
+	reference: Optional[str] # tipping comment, tippee post or comment id (without kind prefix) if known from message
+	confirmation_comment_id: Optional[str] # otherwise: id of the chaintip confirmation comment, whose parent is the tipping comment
+	claim_return_txid: Optional[str]
+
+class OutgoingTip(NamedTuple):
+	"""message about a tip we sent"""
+	tipping_comment_id: Optional[str]
+	username: Optional[str]
+	acceptance_status: Optional[str] # 'linked' or 'not yet linked'
+	recipient_address: Optional[str]
+	stealth_content_type: Optional[str] # 'post' or 'comment' for stealth tips
+	stealth_content_link: Optional[str]
+	stealth_subreddit: Optional[str]
+	stealth_post_id: Optional[str]
+	stealth_comment_id: Optional[str]
+
+class IncomingTip(NamedTuple):
+	"""'You've been tipped!' message"""
+	username: str
+	amount: str
+
+class ConfirmationComment(NamedTuple):
+	"""chaintip's reply to a tipping comment"""
+	status: str # 'confirmed', 'unclaimed', 'claimed' or 'returned'
+
+# --- messages ---
+
+CLAIM_RETURN_SUBJECTS = ("Tip claimed", "Tip returned to you", "Tip funded")
+INCOMING_TIP_SUBJECT = "You've been tipped!"
+
+p_claim_return_link = re.compile(r'Your \[tip\]\(([^)\s]*)\) of (\d*\.\d*) Bitcoin Cash')
+p_claim_return_claimant = re.compile(r'to u/(\S*)')
+p_claim_return_action = re.compile(r' has \[been ([^\]\s]*)\]\([^)\s]*/(\w*)\)')
+p_various_head = re.compile(r'Your tip to u/(\S*) for their \[([^\]]*)\]\([^)\s]*/(\w*)/(\w*)/\)')
+p_various_amount = re.compile(r'of (\d*\.\d*) Bitcoin Cash')
+p_various_action = re.compile(r'has \[been ([^\]\s]*)\]')
+
+p_tip_comment = re.compile(r'\[your tip\]\(([^)\s]*)\)')
+p_acceptance_head = re.compile(r'u/(\S*) has ')
+p_acceptance_address = re.compile(r'Bitcoin Cash \(BCH\) to: \*\*(bitcoincash:q\w*)\*\*')
+p_sender = re.compile(r'u/(\S*) has just sent you (\S*) Bitcoin Cash \(about \S* USD\) \[via\]\((\S*)\) ')
+p_stealth = re.compile(r'Tip \*\*[^*]*\*\* for their \[(\w*)\]\((/(r/\w*)/[^)\s]*/(\w*)/(\w*)/)\)')
+
+def linkTail(link: str, separator: str):
+	"""part of link after the last separator (the shortlink comment id), None if separator isn't found"""
+	head, sep, tail = link.rpartition(separator)
+	return tail if sep else None
+
+def isClaimReturnSubject(subject: str):
+	return subject.startswith(CLAIM_RETURN_SUBJECTS)
+
+def parseClaimReturn(body: str):
+	"""returns ClaimReturn or None"""
+	m = p_claim_return_link.match(body)
+	if m and linkTail(m.group(1), "_/") is not None:
+		claimant = p_claim_return_claimant.search(body, m.end())
+		action = p_claim_return_action.search(body, claimant.end()) if claimant else None
+		if action:
+			return ClaimReturn(action.group(1), claimant.group(1), m.group(2), None, linkTail(m.group(1), "_/"), action.group(2))
+		return None
+
+	m = p_various_head.match(body)
+	if m:
+		amount = p_various_amount.search(body, m.end())
+		action = p_various_action.search(body, amount.end()) if amount else None
+		if action:
+			post_or_comment = m.group(2)
+			if post_or_comment == 'post':
+				reference, confirmation_comment_id = m.group(3), None
+			elif post_or_comment == 'comment':
+				reference, confirmation_comment_id = m.group(4), None
+			else:
+				reference, confirmation_comment_id = None, m.group(4)
+			return ClaimReturn(action.group(1), m.group(1), amount.group(1), reference, confirmation_comment_id, None)
+	return None
+
+def parseIncomingTip(body: str):
+	"""returns IncomingTip or None"""
+	m = p_sender.match(body)
+	if m and linkTail(m.group(3), "/_/") is not None:
+		return IncomingTip(m.group(1), m.group(2))
+	return None
+
+def parseOutgoingTip(body: str):
+	"""returns OutgoingTip (fields None where not found)"""
+	m = p_tip_comment.search(body)
+	tipping_comment_id = linkTail(m.group(1), "/_/") if m else None
+
+	username = acceptance_status = recipient_address = None
+	m = p_acceptance_head.match(body)
+	if m:
+		address = p_acceptance_address.search(body, m.end())
+		linked = body.rfind("linked", m.end(), address.start()) if address else -1
+		if linked >= 0:
+			username = m.group(1)
+			acceptance_status = 'not yet linked' if body[m.end():linked + 6] == "not yet linked" else 'linked'
+			recipient_address = address.group(1)
+
+	m = p_stealth.search(body)
+	if m:
+		return OutgoingTip(tipping_comment_id, username, acceptance_status, recipient_address, m.group(1), m.group(2), m.group(3), m.group(4), m.group(5))
+	return OutgoingTip(tipping_comment_id, username, acceptance_status, recipient_address, None, None, None, None, None)
+
+def classifyMessage(subject: str, body: str):
+	"""
+		dispatch chaintip message on subject.
+		Returns ClaimReturn, IncomingTip, OutgoingTip or None (ignored/unparseable)
+	"""
+	if isClaimReturnSubject(subject):
+		claim_return = parseClaimReturn(body)
+		if claim_return or subject in ("Tip funded.", "Tip claimed."):
+			return claim_return
+	if subject == INCOMING_TIP_SUBJECT:
+		return parseIncomingTip(body)
+	if subject.startswith("Tip "):
+		return parseOutgoingTip(body)
+	return None
+
+# --- comments ---
+
+p_confirmation_sent = re.compile(r"u/[^\s,]*, you've \[been sent\]\([^)\s]*/bitcoincash:\w*\)")
+p_confirmation_returned = re.compile(r' has \[returned\]\([^)\s]*/bitcoincash:\w*\)')
+
+def classifyComment(body: str):
+	"""returns ConfirmationComment or None"""
+	i = body.find("[chaintip]")
+	if i >= 0 and p_confirmation_returned.search(body, i):
+		return ConfirmationComment('returned')
+	i = body.rfind("has [claimed]")
+	if i >= 0 and body.find("u/", 0, i) >= 0:
+		return ConfirmationComment('claimed')
+	m = p_confirmation_sent.search(body)
+	if m:
+		if body.find("Please [claim it!]", m.end()) >= 0:
+			return ConfirmationComment('unclaimed')
+		return ConfirmationComment('confirmed')
+	return None
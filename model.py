@@ -1,8 +1,116 @@
 from electroncash.util import PrintError, print_error
 from decimal import Decimal
+from collections import defaultdict
+from enum import Enum
+from math import ceil
+from time import time
+import bisect
+import threading
 import weakref
 from PyQt5.QtCore import QObject, pyqtSignal
 
+from .config import c
+
+class PaymentState(Enum):
+	"""payment states of a tip, values are used for storage and display"""
+	NONE = ""
+	AMOUNT_SET = "amount set"
+	CHECK = "check"
+	READY_TO_PAY = "ready to pay"
+	AUTOPAY_BLOCKED = "autopay blocked" # payment_status_detail tells why
+	AUTOPAYING = "autopaying..."
+	AUTOPAY_ERROR = "autopay error" # payment_status_detail tells what
+	PAID = "paid"
+
+	@staticmethod
+	def parse(s: str):
+		"""parse stored (possibly legacy, like 'amount set (2s)') payment status string, returns (state, detail)"""
+		if not s:
+			return (PaymentState.NONE, None)
+		for state in (PaymentState.AMOUNT_SET, PaymentState.CHECK, PaymentState.READY_TO_PAY, PaymentState.AUTOPAYING, PaymentState.PAID):
+			if s.startswith(state.value):
+				return (state, None)
+		if s == PaymentState.AUTOPAY_BLOCKED.value:
+			return (PaymentState.AUTOPAY_BLOCKED, None)
+		if s.startswith("autopay disabled") or s.startswith("autopay disallowed") or \
+			s.startswith("autopay amount-limited") or s.startswith("invalid recipient address"):
+			return (PaymentState.AUTOPAY_BLOCKED, s)
+		if s == PaymentState.AUTOPAY_ERROR.value:
+			return (PaymentState.AUTOPAY_ERROR, None)
+		return (PaymentState.AUTOPAY_ERROR, s)
+
+# states only valid within a session: a loaded tip in one of them goes back to AMOUNT_SET (re-priced, re-checked)
+TRANSIENT_PAYMENT_STATES = {PaymentState.CHECK, PaymentState.READY_TO_PAY, PaymentState.AUTOPAYING}
+
+# allowed payment state transitions (current state -> set of next states)
+PAYMENT_STATE_TRANSITIONS = {
+	PaymentState.NONE: {PaymentState.AMOUNT_SET, PaymentState.PAID},
+	PaymentState.AMOUNT_SET: {PaymentState.AMOUNT_SET, PaymentState.CHECK, PaymentState.PAID},
+	PaymentState.CHECK: {PaymentState.AMOUNT_SET, PaymentState.READY_TO_PAY, PaymentState.PAID},
+	PaymentState.READY_TO_PAY: {PaymentState.AMOUNT_SET, PaymentState.AUTOPAY_BLOCKED, PaymentState.AUTOPAYING, PaymentState.PAID},
+	PaymentState.AUTOPAY_BLOCKED: {PaymentState.AMOUNT_SET, PaymentState.PAID},
+	PaymentState.AUTOPAYING: {PaymentState.AUTOPAY_ERROR, PaymentState.PAID},
+	PaymentState.AUTOPAY_ERROR: {PaymentState.AMOUNT_SET, PaymentState.PAID},
+	PaymentState.PAID: {PaymentState.PAID},
+}
+
+class LazyField():
+	"""
+		data descriptor for tip fields that are expensive to decode (Address, Decimal, ...).
+		setRaw() stores the storage representation, which is decoded on first access.
+		toRaw() returns the storage representation without decoding.
+		Fields of a partially loaded tip (see Tip.decodeStoredData()) are loaded on first access.
+	"""
+	lock = threading.RLock()
+
+	def __init__(self, decode, encode):
+		self.decode = decode
+		self.encode = encode
+
+	def __set_name__(self, owner, name):
+		self.name = name
+		self.raw_name = "_raw_" + name
+
+	def __get__(self, obj, objtype=None):
+		if obj is None:
+			return self
+		d = obj.__dict__
+		try:
+			return d[self.name]
+		except KeyError:
+			pass
+		if self.raw_name not in d and "load_stored_data" in d:
+			obj.decodeStoredData()
+		with LazyField.lock:
+			if self.name not in d:
+				if self.raw_name not in d:
+					return None
+				d[self.name] = self.decode(d[self.raw_name])
+			return d[self.name]
+
+	def __set__(self, obj, value):
+		with LazyField.lock:
+			obj.__dict__.pop(self.raw_name, None)
+			obj.__dict__[self.name] = value
+
+	def setRaw(self, obj, raw):
+		with LazyField.lock:
+			obj.__dict__.pop(self.name, None)
+			obj.__dict__[self.raw_name] = raw
+
+	def toRaw(self, obj):
+		d = obj.__dict__
+		try:
+			return d[self.raw_name]
+		except KeyError:
+			pass
+		if self.name not in d and "load_stored_data" in d:
+			obj.decodeStoredData()
+		with LazyField.lock:
+			if self.raw_name not in d:
+				d[self.raw_name] = self.encode(d.get(self.name, None))
+			return d[self.raw_name]
+
 class Tip(PrintError):
 	def __init__(self, tiplist):
 		self.tiplist_weakref = weakref.ref(tiplist)
@@ -22,10 +130,48 @@ class Tip(PrintError):
 		self.tip_quantity = None
 		self.tip_unit = None
 		self.tip_op_return = None
-		self.payment_status = None
+		self.lock = threading.RLock() # guards payment state and amount against concurrent tasks
+		self.payment_state = PaymentState.NONE
+		self.payment_status_detail = None
 
 		self.payments_by_txhash = {}
 		self.amount_received_bch = None
+		self.payments_confirmed = False # settled, recipient address no longer watched (see BlockchainWatcher)
+
+	def __getattr__(self, name):
+		# only called for missing attributes: a partially loaded tip decodes its stored data first
+		if name.startswith("__") or "load_stored_data" not in self.__dict__:
+			raise AttributeError(name)
+		self.decodeStoredData()
+		return object.__getattribute__(self, name)
+
+	def decodeStoredData(self):
+		"""
+			complete a partially loaded tip (created with only some fields set and load_stored_data,
+			a function returning its stored dict): fields not set (or set since loading) are
+			taken from the stored dict. Called on first access of a missing field.
+		"""
+		with self.lock:
+			load = self.__dict__.get("load_stored_data", None)
+			if load is None:
+				return
+			complete = self.newInstance()
+			d = load()
+			if d is None:
+				self.print_error(f"stored data of tip {self.getID()} not found")
+			else:
+				complete.from_dict(d)
+			own = self.__dict__
+			for key, value in complete.__dict__.items():
+				name = key[len("_raw_"):] if key.startswith("_raw_") else key
+				if isinstance(getattr(type(self), name, None), LazyField) and (name in own or "_raw_" + name in own):
+					continue
+				own.setdefault(key, value)
+			del own["load_stored_data"]
+
+	def newInstance(self):
+		"""new tip with default values, of same type and list (used by decodeStoredData())"""
+		raise Exception("newInstance() not implemented by subclass")
 
 	def getID(self):
 		raise Exception("getID() not implemented by subclass")
@@ -36,6 +182,72 @@ class Tip(PrintError):
 	def from_dict(self):
 		raise Exception("from_dict() not implemented by subclass")
 
+	def getReference(self):
+		"""id of the content this tip refers to (used by TipList index), None if unknown"""
+		return None
+
+	def getCreatedUTC(self):
+		"""creation time of the tip (used by TipList index), None if unknown"""
+		return None
+
+	def getRecipientAddressString(self):
+		"""recipient address in cashaddr format (used by TipList index), None if unknown"""
+		return self.recipient_address.to_cashaddr() if self.recipient_address else None
+
+	def getScripthash(self):
+		"""electrum scripthash (hex) of recipient address, cached on the tip. None if unknown"""
+		address_string = self.getRecipientAddressString()
+		if not address_string:
+			return None
+		if getattr(self, "scripthash_address_string", None) != address_string:
+			self.recipient_scripthash = self.recipient_address.to_scripthash_hex()
+			self.scripthash_address_string = address_string
+		return self.recipient_scripthash
+
+	# payment state
+
+	def isPaid(self):
+		return self.payment_state == PaymentState.PAID
+
+	def setPaymentState(self, state: PaymentState, detail: str = None, expected: PaymentState = None):
+		"""
+			transition to given state if allowed by PAYMENT_STATE_TRANSITIONS (and, if given,
+			the current state is expected). Atomic. Returns True on success
+		"""
+		with self.lock:
+			if expected is not None and self.payment_state != expected:
+				return False
+			if state not in PAYMENT_STATE_TRANSITIONS[self.payment_state]:
+				self.print_error(f"refusing payment state transition {self.payment_state.name} -> {state.name} for tip {self.getID()}")
+				return False
+			self.payment_state = state
+			self.payment_status_detail = detail
+			if state == PaymentState.AMOUNT_SET:
+				self.amount_set_time = time()
+			return True
+
+	def getPaymentDeadline(self):
+		"""time at which the current (timed) payment state expires, None if not applicable"""
+		if self.payment_state == PaymentState.AMOUNT_SET and hasattr(self, "amount_set_time"):
+			return self.amount_set_time + c["ready_to_pay_grace_secs"]
+		if self.payment_state == PaymentState.CHECK and getattr(self, "subscription_time", None):
+			return self.subscription_time + c["check_grace_secs"]
+		return None
+
+	@property
+	def payment_status(self):
+		"""payment status text for display, countdowns are derived from deadlines"""
+		state = self.payment_state
+		if state in (PaymentState.AMOUNT_SET, PaymentState.CHECK):
+			deadline = self.getPaymentDeadline()
+			secs = ceil(deadline - time()) if deadline else 0
+			return f"{state.value} ({secs}s)" if secs > 0 else state.value
+		if state == PaymentState.PAID and len(self.payments_by_txhash) > 1:
+			return f'paid ({len(self.payments_by_txhash)} txs)'
+		if self.payment_status_detail:
+			return self.payment_status_detail
+		return state.value
+
 	def update(self):
 		if self.tiplist_weakref():
 			self.tiplist_weakref().updateTip(self)
@@ -56,10 +268,7 @@ class Tip(PrintError):
 				self.amount_received_bch = amount_bch
 			else:
 				self.amount_received_bch += amount_bch
-			if len(self.payments_by_txhash) == 1:
-				self.payment_status = "paid"
-			else:
-				self.payment_status = f'paid ({len(self.payments_by_txhash)} txs)'
+			self.setPaymentState(PaymentState.PAID)
 			self.update()
 
 
@@ -67,14 +276,97 @@ class Tip(PrintError):
 class TipList(PrintError, QObject):
 	update_signal = pyqtSignal()
 	added_signal = pyqtSignal()
+	removed_signal = pyqtSignal()
 
 	def __init__(self):
 		super(TipList, self).__init__()
 		self.tip_listeners = []
 		self.tips = {} # tip instances by id (uses getID())
+		self.lock = threading.RLock()
+
+		# secondary indexes, kept consistent by addTip(), removeTip() and updateTip()
+		self.index_keys_by_id = {} # keys each tip is currently indexed under
+		self.tips_by_reference = {}
+		self.tips_by_tipping_comment_id = {}
+		self.tips_by_address = defaultdict(set) # by cashaddr string
+		self.tips_by_status = defaultdict(set)
+		self.created_index = [] # sorted list of (created_utc, tip id)
 
 	def debug_stats(self):
-		return f"           Tiplist: {len(self.tips)} tips"
+		return f"           Tiplist: {len(self.tips)} tips, {len(self.tips_by_address)} addresses"
+
+	# indexes
+
+	def getIndexKeys(self, tip):
+		return (tip.getReference(), tip.tipping_comment_id, tip.getRecipientAddressString(), tip.getCreatedUTC(), tip.payment_state)
+
+	def index(self, tip):
+		keys = self.getIndexKeys(tip)
+		reference, tipping_comment_id, address, created_utc, status = keys
+		if reference:
+			self.tips_by_reference[reference] = tip
+		if tipping_comment_id:
+			self.tips_by_tipping_comment_id[tipping_comment_id] = tip
+		if address:
+			self.tips_by_address[address].add(tip)
+		if created_utc is not None:
+			bisect.insort(self.created_index, (created_utc, tip.getID()))
+		self.tips_by_status[status].add(tip)
+		self.index_keys_by_id[tip.getID()] = keys
+
+	def unindex(self, tip):
+		keys = self.index_keys_by_id.pop(tip.getID(), None)
+		if not keys:
+			return
+		reference, tipping_comment_id, address, created_utc, status = keys
+		if reference and self.tips_by_reference.get(reference, None) is tip:
+			del self.tips_by_reference[reference]
+		if tipping_comment_id and self.tips_by_tipping_comment_id.get(tipping_comment_id, None) is tip:
+			del self.tips_by_tipping_comment_id[tipping_comment_id]
+		if address:
+			self.tips_by_address[address].discard(tip)
+			if len(self.tips_by_address[address]) == 0:
+				del self.tips_by_address[address]
+		if created_utc is not None:
+			entry = (created_utc, tip.getID())
+			i = bisect.bisect_left(self.created_index, entry)
+			if i < len(self.created_index) and self.created_index[i] == entry:
+				del self.created_index[i]
+		self.tips_by_status[status].discard(tip)
+		if len(self.tips_by_status[status]) == 0:
+			del self.tips_by_status[status]
+
+	def reindex(self, tip):
+		"""update indexes for tip if any of its keys changed (tip must be in list)"""
+		if self.index_keys_by_id.get(tip.getID(), None) != self.getIndexKeys(tip):
+			self.unindex(tip)
+			self.index(tip)
+
+	def getTipByReference(self, reference):
+		return self.tips_by_reference.get(reference, None)
+
+	def getTipByTippingCommentID(self, tipping_comment_id):
+		return self.tips_by_tipping_comment_id.get(tipping_comment_id, None)
+
+	def getTipsByAddress(self, address):
+		"""address can be given as Address or cashaddr string"""
+		if not isinstance(address, str):
+			address = address.to_cashaddr()
+		with self.lock:
+			return list(self.tips_by_address.get(address, ()))
+
+	def getTipsByStatus(self, status):
+		with self.lock:
+			return list(self.tips_by_status.get(status, ()))
+
+	def getNewestCreatedUTC(self):
+		"""creation time of newest tip or None if list is empty"""
+		with self.lock:
+			if len(self.created_index) == 0:
+				return None
+			return self.created_index[-1][0]
+
+	# tip listeners
 
 	def registerTipListener(self, tip_listener):
 		self.tip_listeners.append(tip_listener)
@@ -83,19 +375,43 @@ class TipList(PrintError, QObject):
 		self.tip_listeners.remove(tip_listener)
 
 	def addTip(self, tip):
-		if tip.getID() in self.tips.keys():
-			raise Exception("addTip(): duplicate tip.getID()")
-		self.tips[tip.getID()] = tip
+		with self.lock:
+			if tip.getID() in self.tips.keys():
+				raise Exception("addTip(): duplicate tip.getID()")
+			self.tips[tip.getID()] = tip
+			self.index(tip)
 		for tip_listener in self.tip_listeners:
 			tip_listener.tipAdded(tip)
 		self.added_signal.emit()
 
+	def addTips(self, tips: list):
+		"""bulk add: listeners are notified once through tipsAdded()"""
+		added_tips = []
+		with self.lock:
+			for tip in tips:
+				if tip.getID() in self.tips.keys():
+					self.print_error("addTips(): skipping duplicate tip.getID()", tip.getID())
+					continue
+				self.tips[tip.getID()] = tip
+				self.index(tip)
+				added_tips.append(tip)
+		for tip_listener in self.tip_listeners:
+			tip_listener.tipsAdded(added_tips)
+		self.added_signal.emit()
+		return added_tips
+
 	def removeTip(self, tip):
-		del self.tips[tip.getID()]
+		with self.lock:
+			self.unindex(tip)
+			del self.tips[tip.getID()]
 		for tip_listener in self.tip_listeners:
 			tip_listener.tipRemoved(tip)
+		self.removed_signal.emit()
 
 	def updateTip(self, tip):
+		with self.lock:
+			if self.tips.get(tip.getID(), None) is tip:
+				self.reindex(tip)
 		for tip_listener in self.tip_listeners:
 			tip_listener.tipUpdated(tip)
 		self.update_signal.emit()
@@ -104,6 +420,11 @@ class TipListener():
 	def tipAdded(self, tip):
 		raise Exception(f"tipAdded() not implemented in class {type(self)}")
 
+	def tipsAdded(self, tips):
+		"""bulk add, override to handle in batch"""
+		for tip in tips:
+			self.tipAdded(tip)
+
 	def tipRemoved(self, tip):
 		raise Exception(f"tipRemoved() not implemented in class {type(self)}")
 
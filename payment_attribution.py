@@ -0,0 +1,188 @@
+import threading
+from bisect import bisect_right, insort
+from decimal import Decimal
+
+from electroncash.util import PrintError
+
+LAST = "\uffff" # sorts after any tip id
+
+def tipSatoshis(tip):
+	"""tip amount in satoshis, None if not set (yet)"""
+	return int(tip.amount_bch * 100000000) if isinstance(tip.amount_bch, Decimal) else None
+
+class AddressLedger:
+	"""tips and outputs of one recipient scripthash (used by PaymentAttribution under its lock)"""
+
+	def __init__(self):
+		self.tips = {} # by tip id
+		self.keys = {} # (created, satoshis, settled) each tip is indexed under, by tip id
+		self.by_time = [] # (created, tip id), sorted
+		self.unsettled_by_time = []
+		self.unsettled_by_amount = {} # satoshis -> [(created, tip id), ...] sorted
+		self.outputs_by_tip = {} # tip id -> {(tx_hash, n), ...}
+		self.tips_by_txhash = {} # tip ids by tx_hash of payments the tips already had
+		self.assigned = {} # (tip id, satoshis, timestamp) by (tx_hash, n)
+		self.unassigned = {} # (satoshis, timestamp) by (tx_hash, n) for outputs without tip
+
+	def index(self, tip_id, created, satoshis, settled):
+		self.keys[tip_id] = (created, satoshis, settled)
+		insort(self.by_time, (created, tip_id))
+		if not settled:
+			insort(self.unsettled_by_time, (created, tip_id))
+			if satoshis is not None:
+				insort(self.unsettled_by_amount.setdefault(satoshis, []), (created, tip_id))
+
+	def unindex(self, tip_id):
+		created, satoshis, settled = self.keys.pop(tip_id)
+		removeSorted(self.by_time, (created, tip_id))
+		if not settled:
+			removeSorted(self.unsettled_by_time, (created, tip_id))
+			if satoshis is not None:
+				same_amount = self.unsettled_by_amount[satoshis]
+				removeSorted(same_amount, (created, tip_id))
+				if len(same_amount) == 0:
+					del self.unsettled_by_amount[satoshis]
+
+	def pick(self, tx_hash, n, satoshis, timestamp):
+		"""tip id to attribute output to: a tip already paid by tx, else the unsettled tip of same amount,
+		else any unsettled tip, else any tip, each nearest in time. None if no tips"""
+		for tip_id in self.tips_by_txhash.get(tx_hash, []):
+			if not any(key[0] == tx_hash for key in self.outputs_by_tip.get(tip_id, ())):
+				return tip_id
+		for candidates in (self.unsettled_by_amount.get(satoshis, None), self.unsettled_by_time, self.by_time):
+			if candidates:
+				return nearest(candidates, timestamp)
+		return None
+
+	def assign(self, tip_id, tx_hash, n, satoshis, timestamp):
+		self.assigned[(tx_hash, n)] = (tip_id, satoshis, timestamp)
+		self.outputs_by_tip.setdefault(tip_id, set()).add((tx_hash, n))
+		created, satoshis, settled = self.keys[tip_id]
+		if not settled:
+			self.unindex(tip_id)
+			self.index(tip_id, created, satoshis, True)
+
+def removeSorted(a: list, item):
+	i = bisect_right(a, item) - 1
+	if i >= 0 and a[i] == item:
+		del a[i]
+
+def nearest(candidates: list, timestamp):
+	"""tip id of candidate ((created, tip id) sorted) created last before timestamp, oldest one if none (or no timestamp)"""
+	if timestamp is not None:
+		i = bisect_right(candidates, (timestamp, LAST))
+		if i > 0:
+			return candidates[i - 1][1]
+	return candidates[0][1]
+
+class PaymentAttribution(PrintError):
+	"""
+		PaymentAttribution
+		attributes transaction outputs to tips when several tips share a recipient address.
+		Keeps all tips and outputs per scripthash. An output goes to a tip that already had it
+		as payment, else to the unpaid tip with the same amount created closest before the
+		output, else to any unpaid tip, else (additional payment) to any tip, always preferring
+		the one created closest before the output (oldest if no timestamp). Outputs arriving before
+		any tip at their address are kept and attributed when tips are added. Candidate lookups
+		are bisections in per-address sorted lists.
+	"""
+
+	def __init__(self):
+		self.lock = threading.Lock()
+		self.ledgers = {} # AddressLedger by scripthash
+		self.scripthash_by_tip_id = {}
+		self.settled_by_txhash = {} # {n: tip} by tx_hash
+
+	def debug_stats(self):
+		with self.lock:
+			tip_count = len(self.scripthash_by_tip_id)
+			shared = sum(1 for ledger in self.ledgers.values() if len(ledger.tips) > 1)
+			unassigned = sum(len(ledger.unassigned) for ledger in self.ledgers.values())
+		return f"PaymentAttribution: {tip_count} tips at {len(self.ledgers)} addresses ({shared} shared), {len(self.settled_by_txhash)} paying txs, {unassigned} unattributed outputs"
+
+	def tips(self, scripthash: str):
+		with self.lock:
+			ledger = self.ledgers.get(scripthash, None)
+			return list(ledger.tips.values()) if ledger else []
+
+	def settledBy(self, tx_hash: str):
+		"""tips settled by outputs of tx, by output index"""
+		with self.lock:
+			return dict(self.settled_by_txhash.get(tx_hash, {}))
+
+	def addTip(self, tip, scripthash: str):
+		"""add or re-index tip (amount, address or payments changed). Returns [(tip, tx_hash, satoshis), ...] attributed to tips now"""
+		tip_id = tip.getID()
+		with self.lock:
+			if self.scripthash_by_tip_id.get(tip_id, scripthash) != scripthash:
+				self.removeTipLocked(tip_id)
+			ledger = self.ledgers.setdefault(scripthash, AddressLedger())
+			settled = len(tip.payments_by_txhash) > 0 or len(ledger.outputs_by_tip.get(tip_id, ())) > 0
+			key = (tip.getCreatedUTC() or 0, tipSatoshis(tip), settled)
+			if ledger.keys.get(tip_id, None) == key:
+				return []
+			if tip_id in ledger.keys:
+				ledger.unindex(tip_id)
+			ledger.tips[tip_id] = tip
+			ledger.index(tip_id, *key)
+			self.scripthash_by_tip_id[tip_id] = scripthash
+			for tx_hash in tip.payments_by_txhash.keys():
+				tip_ids = ledger.tips_by_txhash.setdefault(tx_hash, [])
+				if tip_id not in tip_ids:
+					tip_ids.append(tip_id)
+
+			# attribute outputs waiting for a tip
+			attributed = []
+			for (tx_hash, n), (satoshis, timestamp) in sorted(ledger.unassigned.items(), key=lambda i: i[1][1] or 0):
+				picked = ledger.pick(tx_hash, n, satoshis, timestamp)
+				if picked is None:
+					break
+				del ledger.unassigned[(tx_hash, n)]
+				attributed.append(self.assignLocked(ledger, picked, tx_hash, n, satoshis, timestamp))
+			return attributed
+
+	def removeTip(self, tip):
+		with self.lock:
+			self.removeTipLocked(tip.getID())
+
+	def removeTipLocked(self, tip_id):
+		"""drop tip, its outputs become unattributed"""
+		scripthash = self.scripthash_by_tip_id.pop(tip_id, None)
+		ledger = self.ledgers.get(scripthash, None)
+		if ledger is None or tip_id not in ledger.tips:
+			return
+		ledger.unindex(tip_id)
+		del ledger.tips[tip_id]
+		for tip_ids in ledger.tips_by_txhash.values():
+			if tip_id in tip_ids:
+				tip_ids.remove(tip_id)
+		for tx_hash, n in ledger.outputs_by_tip.pop(tip_id, ()):
+			assigned_tip_id, satoshis, timestamp = ledger.assigned.pop((tx_hash, n))
+			ledger.unassigned[(tx_hash, n)] = (satoshis, timestamp)
+			settled = self.settled_by_txhash.get(tx_hash, {})
+			settled.pop(n, None)
+			if len(settled) == 0:
+				self.settled_by_txhash.pop(tx_hash, None)
+
+	def addOutputs(self, tx_hash: str, outputs, timestamp: float = None):
+		"""add outputs ([scripthash, satoshis, n], ...) of tx. Returns [(tip, tx_hash, satoshis), ...] newly attributed"""
+		attributed = []
+		with self.lock:
+			for scripthash, satoshis, n in outputs:
+				ledger = self.ledgers.get(scripthash, None)
+				if ledger is None:
+					ledger = self.ledgers[scripthash] = AddressLedger()
+				if (tx_hash, n) in ledger.assigned or (tx_hash, n) in ledger.unassigned:
+					continue
+				picked = ledger.pick(tx_hash, n, satoshis, timestamp)
+				if picked is None:
+					ledger.unassigned[(tx_hash, n)] = (satoshis, timestamp)
+				else:
+					attributed.append(self.assignLocked(ledger, picked, tx_hash, n, satoshis, timestamp))
+		return attributed
+
+	def assignLocked(self, ledger, tip_id, tx_hash, n, satoshis, timestamp):
+		ledger.assign(tip_id, tx_hash, n, satoshis, timestamp)
+		tip = ledger.tips[tip_id]
+		self.settled_by_txhash.setdefault(tx_hash, {})[n] = tip
+		return (tip, tx_hash, satoshis)
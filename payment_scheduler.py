@@ -0,0 +1,120 @@
+import heapq
+import threading
+from time import time
+
+from electroncash.util import PrintError
+
+from .model import TipListener, PaymentState
+
+class PaymentScheduler(TipListener, PrintError):
+	"""
+		PaymentScheduler
+		drives the timed payment state transitions ('amount set' -> 'check' -> 'ready to pay')
+		using a heap of deadlines, so each tick() only touches tips whose grace period expired
+	"""
+
+	TIMED_STATES = (PaymentState.AMOUNT_SET, PaymentState.CHECK)
+	POLL_SECS = 1 # re-check interval for tips in a timed state without a deadline yet
+
+	def __init__(self, tiplist):
+		self.tiplist = tiplist
+		self.lock = threading.Lock()
+		self.heap = [] # (deadline, seq, tip id), may contain stale entries
+		self.deadlines_by_id = {} # currently valid deadline by tip id
+		self.seq = 0
+		self.offline = False
+		self.online_since = time()
+		self.tiplist.registerTipListener(self)
+
+	def __del__(self):
+		self.tiplist.unregisterTipListener(self)
+
+	def debug_stats(self):
+		return f"  PaymentScheduler: {len(self.deadlines_by_id)} deadlines pending"
+
+	# TipListener overrides
+
+	def tipRemoved(self, tip):
+		with self.lock:
+			self.deadlines_by_id.pop(tip.getID(), None)
+
+	def tipAdded(self, tip):
+		self.tipUpdated(tip)
+
+	def tipUpdated(self, tip):
+		self.schedule(tip)
+
+	#
+
+	def schedule(self, tip):
+		tip_id = tip.getID()
+		if tip.payment_state not in PaymentScheduler.TIMED_STATES:
+			with self.lock:
+				self.deadlines_by_id.pop(tip_id, None)
+			return
+		deadline = tip.getPaymentDeadline()
+		with self.lock:
+			if deadline is None:
+				if tip_id in self.deadlines_by_id:
+					return # keep polling at the already scheduled time
+				deadline = time() + PaymentScheduler.POLL_SECS
+			if self.deadlines_by_id.get(tip_id, None) == deadline:
+				return
+			self.deadlines_by_id[tip_id] = deadline
+			heapq.heappush(self.heap, (deadline, self.seq, tip_id))
+			self.seq += 1
+
+	def popDue(self, now):
+		due = []
+		with self.lock:
+			while len(self.heap) > 0 and self.heap[0][0] <= now:
+				deadline, seq, tip_id = heapq.heappop(self.heap)
+				if self.deadlines_by_id.get(tip_id, None) != deadline:
+					continue # stale entry
+				del self.deadlines_by_id[tip_id]
+				due.append(tip_id)
+		return due
+
+	def tick(self, offline: bool = False):
+		"""
+			perform due transitions, should be called periodically.
+			returns list of tips that moved to 'check'
+		"""
+		now = time()
+		if offline:
+			self.offline = True
+			return []
+		if self.offline:
+			# grace periods only count while online
+			self.offline = False
+			self.online_since = now
+
+		checked_tips = []
+		for tip_id in self.popDue(now):
+			tip = self.tiplist.tips.get(tip_id, None)
+			if not tip:
+				continue
+
+			with tip.lock: # state and deadline mustn't change between check and transition
+				transitioned = False
+
+				# "amount set" -> "check"
+				if tip.payment_state == PaymentState.AMOUNT_SET:
+					if not hasattr(tip, "amount_set_time") or tip.amount_set_time < self.online_since:
+						tip.amount_set_time = min(now, self.online_since)
+					if tip.getPaymentDeadline() <= now:
+						transitioned = tip.setPaymentState(PaymentState.CHECK)
+						if transitioned:
+							checked_tips.append(tip)
+
+				# "check" -> "ready to pay"
+				elif tip.payment_state == PaymentState.CHECK:
+					deadline = tip.getPaymentDeadline()
+					if deadline is not None and deadline <= now:
+						transitioned = tip.setPaymentState(PaymentState.READY_TO_PAY)
+			if transitioned:
+				tip.update()
+			else:
+				self.schedule(tip)
+
+		return checked_tips
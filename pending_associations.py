@@ -0,0 +1,118 @@
+import threading
+from collections import OrderedDict
+from time import time
+
+from electroncash.util import PrintError
+
+from .config import c
+
+class PendingAssociations(PrintError):
+	"""
+		PendingAssociations
+		claim/return messages and chaintip confirmation comments that arrived before their tip.
+		Only the fields needed to apply them to the tip are kept (no praw objects). Entries are
+		evicted after c["pending_association_ttl_secs"] or, oldest first, when more than
+		c["pending_association_max_entries"] are held. Persisted through to_dict()/load().
+	"""
+
+	def __init__(self):
+		self.lock = threading.Lock()
+		self.claims_by_reference = OrderedDict() # list of claim/return dicts by reference (tipping comment, post or comment id), oldest first
+		self.confirmations_by_tipping_comment_id = OrderedDict() # confirmation dict by tipping comment id, oldest first
+		self.claim_count = 0
+		self.dirty = False
+
+	def debug_stats(self):
+		return f"{len(self.confirmations_by_tipping_comment_id)} unassociated chaintip comments\n\
+                       {self.claim_count} unassociated claim/returned messages"
+
+	def addClaim(self, reference: str, message_id: str, action: str, claim_return_txid: str):
+		with self.lock:
+			claims = self.claims_by_reference.setdefault(reference, [])
+			claims.append({
+				"message_id": message_id,
+				"action": action,
+				"claim_return_txid": claim_return_txid,
+				"time": time(),
+			})
+			self.claim_count += 1
+			self.dirty = True
+			self.evict()
+
+	def popClaims(self, reference: str):
+		"""remove and return claim/return dicts stored for reference (empty list if none)"""
+		with self.lock:
+			claims = self.claims_by_reference.pop(reference, [])
+			if len(claims) > 0:
+				self.claim_count -= len(claims)
+				self.dirty = True
+			return claims
+
+	def addConfirmation(self, tipping_comment_id: str, status: str, comment_link: str):
+		with self.lock:
+			self.confirmations_by_tipping_comment_id.pop(tipping_comment_id, None)
+			self.confirmations_by_tipping_comment_id[tipping_comment_id] = {
+				"status": status,
+				"comment_link": comment_link,
+				"time": time(),
+			}
+			self.dirty = True
+			self.evict()
+
+	def popConfirmation(self, tipping_comment_id: str):
+		"""remove and return confirmation dict stored for tipping_comment_id (None if none)"""
+		with self.lock:
+			confirmation = self.confirmations_by_tipping_comment_id.pop(tipping_comment_id, None)
+			if confirmation:
+				self.dirty = True
+			return confirmation
+
+	def references(self):
+		with self.lock:
+			return list(self.claims_by_reference.keys()), list(self.confirmations_by_tipping_comment_id.keys())
+
+	def evict(self):
+		"""drop expired entries and oldest entries above size limit (caller holds lock)"""
+		expiry = time() - c["pending_association_ttl_secs"]
+		max_entries = c["pending_association_max_entries"]
+		while len(self.claims_by_reference) > 0:
+			reference, claims = next(iter(self.claims_by_reference.items()))
+			if claims[-1]["time"] >= expiry and len(self.claims_by_reference) <= max_entries:
+				break
+			del self.claims_by_reference[reference]
+			self.claim_count -= len(claims)
+			self.dirty = True
+		while len(self.confirmations_by_tipping_comment_id) > 0:
+			tipping_comment_id, confirmation = next(iter(self.confirmations_by_tipping_comment_id.items()))
+			if confirmation["time"] >= expiry and len(self.confirmations_by_tipping_comment_id) <= max_entries:
+				break
+			del self.confirmations_by_tipping_comment_id[tipping_comment_id]
+			self.dirty = True
+
+	def takePersistData(self):
+		"""returns dict to persist if changed, None otherwise"""
+		with self.lock:
+			if not self.dirty:
+				return None
+			self.dirty = False
+			self.evict()
+			return {
+				"claims": dict(self.claims_by_reference),
+				"confirmations": dict(self.confirmations_by_tipping_comment_id),
+			}
+
+	def load(self, d: dict):
+		"""merge persisted entries (stored entries are older than any added this session)"""
+		if not d:
+			return
+		with self.lock:
+			claims_by_reference = OrderedDict(sorted(d.get("claims", {}).items(), key=lambda i: i[1][-1]["time"]))
+			for reference, claims in self.claims_by_reference.items():
+				claims_by_reference.setdefault(reference, []).extend(claims)
+			self.claims_by_reference = claims_by_reference
+			self.claim_count = sum(len(claims) for claims in self.claims_by_reference.values())
+
+			confirmations = OrderedDict(sorted(d.get("confirmations", {}).items(), key=lambda i: i[1]["time"]))
+			confirmations.update(self.confirmations_by_tipping_comment_id)
+			self.confirmations_by_tipping_comment_id = confirmations
+			self.evict()
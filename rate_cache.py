@@ -0,0 +1,170 @@
+import threading
+import traceback
+from decimal import Decimal
+from time import time
+
+from electroncash.util import PrintError
+from electroncash import exchange_rate
+from electroncash.exchange_rate import get_exchanges_by_ccy
+
+from .config import c
+
+class RateCache(PrintError):
+	"""
+		RateCache
+		per-process cache of exchange rates (price of 1 BCH in ccy) shared by all wallets.
+		Rates are fetched in batches (a single get_rates() call yields all currencies
+		quoted by an exchange) and kept for c["rate_cache_ttl_secs"]. Stale rates are
+		still served and queued for revalidation by refresh() (stale-while-revalidate),
+		up to an age of c["rate_cache_max_stale_secs"], after which they are refetched
+		(blocking) or dropped. Concurrent fetches from the same exchange are joined.
+	"""
+
+	FETCH_WAIT_SECS = 30 # max time to wait for another thread fetching from the same exchange
+
+	_instance = None
+	_instance_lock = threading.Lock()
+
+	@classmethod
+	def get_instance(cls):
+		with cls._instance_lock:
+			if cls._instance is None:
+				cls._instance = cls()
+			return cls._instance
+
+	def __init__(self):
+		self.lock = threading.RLock()
+		self.rates_by_ccy = {} # (rate, fetch_time) by ccy
+		self.stale_ccys = set() # ccys served stale, to be revalidated by refresh()
+		self.exchanges_by_name = {} # exchange instances we created (fx.exchange is used when possible)
+		self.exchanges_by_ccy = None
+		self.currency_codes = None
+		self.fetching = {} # threading.Event by exchange, set when the fetch in flight finishes
+		self.fetch_count = 0
+
+	def debug_stats(self):
+		return f"         RateCache: {len(self.rates_by_ccy)} rates cached, {len(self.stale_ccys)} stale, {self.fetch_count} fetches"
+
+	def getRate(self, ccy: str, fx=None):
+		"""return cached rate for ccy, fetching (blocking) only on cold miss"""
+		ccy = ccy.upper()
+		if ccy == 'BCH':
+			return Decimal("1.0")
+		with self.lock:
+			entry = self.rates_by_ccy.get(ccy, None)
+			if entry:
+				rate, fetch_time = entry
+				age = time() - fetch_time
+				if age <= c["rate_cache_max_stale_secs"]:
+					if age > c["rate_cache_ttl_secs"]:
+						self.stale_ccys.add(ccy)
+					return rate
+		self.fetch([ccy], fx)
+		with self.lock:
+			entry = self.rates_by_ccy.get(ccy, None)
+		if not entry:
+			raise Exception(f"no exchange rate available for {ccy}")
+		if time() - entry[1] > c["rate_cache_max_stale_secs"]:
+			raise Exception(f"exchange rate for {ccy} is outdated and cannot be refreshed")
+		return entry[0]
+
+	def currencies(self):
+		"""codes of currencies quoted by some exchange (empty if the exchange list can't be read)"""
+		with self.lock:
+			if self.currency_codes is None:
+				try:
+					if self.exchanges_by_ccy is None:
+						self.exchanges_by_ccy = get_exchanges_by_ccy(False)
+					self.currency_codes = frozenset(self.exchanges_by_ccy.keys())
+				except Exception as e:
+					self.print_error("cannot read exchanges by currency: ", repr(e))
+					return frozenset()
+			return self.currency_codes
+
+	def getExchange(self, ccy: str, fx=None):
+		with self.lock:
+			if self.exchanges_by_ccy is None:
+				self.exchanges_by_ccy = get_exchanges_by_ccy(False)
+			exchanges = self.exchanges_by_ccy[ccy]
+			if fx and type(fx.exchange).__name__ in exchanges:
+				return fx.exchange
+			exchange_name = exchanges[0]
+			if exchange_name not in self.exchanges_by_name:
+				klass = getattr(exchange_rate, exchange_name)
+				self.exchanges_by_name[exchange_name] = klass(None, None)
+			return self.exchanges_by_name[exchange_name]
+
+	def fetch(self, ccys, fx=None):
+		"""
+			fetch rates for all given ccys, using one request per exchange involved.
+			If another thread is already fetching from an exchange, its result is waited for
+			instead of issuing a second request.
+			returns set of ccys whose rate changed (in fetches done by this call).
+		"""
+		ccys_by_exchange = {}
+		for ccy in set(ccy.upper() for ccy in ccys):
+			if ccy == 'BCH':
+				continue
+			try:
+				exchange = self.getExchange(ccy, fx)
+			except KeyError:
+				self.print_error(f"no exchange known for {ccy}")
+				continue
+			ccys_by_exchange.setdefault(exchange, []).append(ccy)
+
+		changed_ccys = set()
+		joined = []
+		for exchange, exchange_ccys in ccys_by_exchange.items():
+			with self.lock:
+				event = self.fetching.get(exchange, None)
+				if event:
+					joined.append((exchange, event))
+					continue
+				self.fetching[exchange] = threading.Event()
+			try:
+				changed_ccys |= self.fetchExchange(exchange, exchange_ccys)
+			finally:
+				with self.lock:
+					self.fetching.pop(exchange).set()
+		for exchange, event in joined:
+			if not event.wait(RateCache.FETCH_WAIT_SECS):
+				self.print_error(f"gave up waiting for rates from {type(exchange).__name__}")
+		return changed_ccys
+
+	def fetchExchange(self, exchange, exchange_ccys):
+		"""single get_rates() request, returns set of ccys whose rate changed"""
+		changed_ccys = set()
+		try:
+			rates = exchange.get_rates(exchange_ccys[0])
+		except Exception as e:
+			self.print_error(f"error fetching rates from {type(exchange).__name__}: ", repr(e))
+			return changed_ccys
+		now = time()
+		with self.lock:
+			self.fetch_count += 1
+			for ccy, rate in rates.items():
+				if rate is None:
+					continue
+				rate = Decimal(rate)
+				old = self.rates_by_ccy.get(ccy, None)
+				if not old or old[0] != rate:
+					changed_ccys.add(ccy)
+				self.rates_by_ccy[ccy] = (rate, now)
+				self.stale_ccys.discard(ccy)
+		missing = [ccy for ccy in exchange_ccys if ccy not in rates]
+		if len(missing) > 0:
+			self.print_error(f"{type(exchange).__name__} has no rate for {missing}")
+		return changed_ccys
+
+	def refresh(self, fx=None):
+		"""revalidate stale rates, returns set of ccys whose rate changed"""
+		with self.lock:
+			stale_ccys = self.stale_ccys
+			self.stale_ccys = set()
+		if len(stale_ccys) == 0:
+			return set()
+		try:
+			return self.fetch(stale_ccys, fx)
+		except Exception:
+			traceback.print_exc()
+			return set()
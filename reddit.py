@@ -1,6 +1,5 @@
-from electroncash.util import PrintError, print_error, age, Weak, InvalidPassword, format_time
+from electroncash.util import PrintError, print_error, age, Weak, InvalidPassword
 from electroncash.address import Address
-from electroncash.exchange_rate import *
 from electroncash.wallet import Abstract_Wallet
 from electroncash_gui.qt.util import webopen, MessageBoxMixin
 from electroncash.i18n import _
@@ -10,20 +9,30 @@ from decimal import Decimal
 from datetime import datetime
 import traceback
 import re
+import queue
+import threading
+import weakref
 import random
 import socket
 import sys
-from time import time, sleep, mktime
+from time import time, mktime
 from datetime import date
-from collections import defaultdict
 
 from PyQt5.QtCore import QObject, pyqtSignal, QThread
 from PyQt5.QtWidgets import QApplication, QMessageBox
 from PyQt5.QtGui import QIcon
 
-from .model import Tip, TipList
+from .model import Tip, TipList, PaymentState, TRANSIENT_PAYMENT_STATES, LazyField
 from .config import c, amount_config
 from .util import read_config, write_config, has_config
+from .rate_cache import RateCache
+from .seen_items import SeenItems
+from .pending_associations import PendingAssociations
+from .fetch_outcomes import FetchOutcomes
+from .request_scheduler import RequestScheduler, ScheduledRequestor
+from .task_scheduler import TaskScheduler
+from . import message_classifier
+from . import amount_parser
 
 # praw and prawcore are being imported in this "top-level"-way to avoid loading lower modules which will fail as external plugins
 from . import praw
@@ -87,6 +96,22 @@ class Reddit(PrintError, QObject):
 	authorization stuff was largely taken from https://praw.readthedocs.io/en/latest/tutorials/refresh_token.html#using-refresh-tokens
 	"""
 	new_tip = pyqtSignal(Tip)
+	meta_signal = pyqtSignal(str, object) # (key, value) to persist in tip store, queued behind new_tip emits
+	import_progress_signal = pyqtSignal(object) # progress dict of background import, see doImport()
+
+	INBOX_CURSOR_KEY = "inbox_cursor" # newest digested inbox item
+	SEEN_ITEMS_KEY = "seen_items" # bloom filter of digested inbox items (only persisted in sqlite tip store)
+	SEEN_WINDOW_KEY = "seen_items_window" # most recent digested inbox items (only a tail of them in wallet tip store)
+	PENDING_ASSOCIATIONS_KEY = "pending_associations" # claims/confirmations waiting for their tip
+	FETCH_OUTCOMES_KEY = "tipping_comment_fetch_outcomes" # results and retry state of tipping comment fetches
+	IMPORT_CHECKPOINT_KEY = "import_checkpoint" # progress of an unfinished import
+	TX_CACHE_KEY = "blockchain_tx_cache" # TxCache blob of earlier versions (now kept in tip store tables, see PersistentTipList.loadTxCache())
+	META_KEYS = (INBOX_CURSOR_KEY, SEEN_ITEMS_KEY, SEEN_WINDOW_KEY, PENDING_ASSOCIATIONS_KEY, FETCH_OUTCOMES_KEY, IMPORT_CHECKPOINT_KEY) # moved with the tips to another tip store
+	BULK_META_KEYS = (SEEN_ITEMS_KEY,) # only kept by stores with BULK_META
+
+	DIGEST_BATCH_SIZE = 100 # items digested together (sharing bulk prefetches)
+	POLL_INTERVAL_SECS = 2 # inbox polling interval when idle
+	IMPORT_PREFETCH_PAGES = 2 # inbox pages fetched ahead while import digests the current page
 
 	def __init__(self, wallet_ui):
 		QObject.__init__(self)
@@ -94,17 +119,26 @@ class Reddit(PrintError, QObject):
 		self.reddit_authorized = False
 		self.should_quit = False
 		self.state = None # used in reddit auth flow
+		self.scheduler = RequestScheduler(lambda: self.should_quit) # all reddit requests pass through this
+		self.task_scheduler = TaskScheduler("reddit_tasks", lambda: self.should_quit) # background work, see run()
 		self.tips_to_refresh_amount = []
-		self.unassociated_claim_return_by_tipping_comment_id = defaultdict(list) # store claim/return info (dict with "message" and "action") for later association with a tip
-		self.unassociated_chaintip_comments_by_tipping_comment_id = {} # store chaintip comments for later association with a tip
-		self.items_by_fullname = {}
+		self.pending_associations = PendingAssociations() # claim/return messages and chaintip comments for later association with a tip
+		self.seen_items = SeenItems() # inbox items seen so far (bloom filter part loaded lazily from tip store)
+		self.fetch_outcomes = FetchOutcomes() # tipping comment fetch results for retry backoff (loaded lazily from tip store)
+		self.sync_state_loaded = False
 		self.items_to_mark_read = []
+		self.inbox_cursor = None # {"fullname", "created_utc"} of newest digested item, loaded lazily from tip store
+		self.parent_ids_by_comment_id = {} # prefetched parent ids of chaintip confirmation comments (None if unresolvable)
+		self.import_jobs = queue.Queue() # (limit_days, start_date_utc, description) run one after another by importWorker()
+		self.import_cancelled = threading.Event()
+		self.import_thread = None
 
 	def debug_stats(self):
 		return f"\
-            Reddit: {len(self.unassociated_chaintip_comments_by_tipping_comment_id)} unassociated chaintip comments\n\
-                       {sum([len(i) for i in self.unassociated_claim_return_by_tipping_comment_id.values()])} unassociated claim/returned messages\n\
-                       {len(self.items_by_fullname)} items registered"
+            Reddit: {self.pending_associations.debug_stats()}\n\
+                       {self.seen_items.debug_stats()}\n\
+                       {self.scheduler.debug_stats()}\n\
+                       {self.task_scheduler.debug_stats()}"
 
 	def disconnect(self):
 		write_config(self.wallet_ui.wallet, WalletStorageTokenManager.ACCESS_TOKEN_KEY, None)
@@ -161,6 +195,8 @@ class Reddit(PrintError, QObject):
 						user_agent = user_agent,
 						username = read_config(self.wallet_ui.wallet, "reddit_username"),
 						password = read_config(self.wallet_ui.wallet, "reddit_password"),
+						requestor_class = ScheduledRequestor,
+						requestor_kwargs = {"scheduler": self.scheduler},
 				)
 			elif authentication_mode == "app":
 				#redirect_uri = c["reddit"]["redirect_uri"]
@@ -174,7 +210,9 @@ class Reddit(PrintError, QObject):
 					client_secret = None,
 					redirect_uri = redirect_uri,
 					user_agent = user_agent,
-					token_manager = self.token_manager
+					token_manager = self.token_manager,
+					requestor_class = ScheduledRequestor,
+					requestor_kwargs = {"scheduler": self.scheduler},
 				)
 
 				# probe if current refresh token (if exists) works
@@ -279,17 +317,39 @@ class Reddit(PrintError, QObject):
 
 	p_context = re.compile('(/r.*/\w*/.*/)\w*/\?context=3', re.DOTALL)
 	def getCommentLink(self, comment):
-		if hasattr(comment, "permalink") and comment.permalink:
-			return comment.permalink
-		# construct link from context	
-		m = Reddit.p_context.match(comment.context)
+		# construct link from context (avoids lazy fetch of permalink)
+		m = Reddit.p_context.match(getattr(comment, "context", None) or "")
 		if m:
 			return m.group(1) + comment.id
+		if hasattr(comment, "permalink") and comment.permalink:
+			return comment.permalink
 		return None
 
-	def triggerRefreshTipAmounts(self):
+	def triggerRefreshTipAmounts(self, ccys: set = None):
+		"""queue tips for amount refresh. If ccys is given, only unpaid tips priced in one of those currencies are queued"""
 		if hasattr(self.wallet_ui, "tiplist"):
-			self.tips_to_refresh_amount += [tip for tip in self.wallet_ui.tiplist.tips.values()]
+			if ccys is None:
+				self.tips_to_refresh_amount += [tip for tip in self.wallet_ui.tiplist.tips.values()]
+			else:
+				self.tips_to_refresh_amount += [tip for tip in self.wallet_ui.tiplist.tips.values() if \
+					not tip.isPaid() and getattr(tip, "rate_currency", None) in ccys
+				]
+
+	def prefetchRates(self):
+		"""fetch rates for all currencies tip amounts might be priced in using as few requests as possible"""
+		wallet = self.wallet_ui.wallet
+		ccys = set(unit["value_currency"] for unit in amount_config["units"])
+		ccys |= set(amount_config["prefix_symbols"].values())
+		ccys.add(read_config(wallet, "default_amount_currency"))
+		ccys.add(read_config(wallet, "default_linked_amount_currency"))
+		RateCache.get_instance().fetch(ccys, self.wallet_ui.window.fx)
+
+	def refreshRates(self):
+		"""revalidate stale rates and re-price tips affected by changed rates"""
+		changed_ccys = RateCache.get_instance().refresh(self.wallet_ui.window.fx)
+		if len(changed_ccys) > 0:
+			self.print_error("rates changed for", changed_ccys)
+			self.triggerRefreshTipAmounts(changed_ccys)
 
 	def refreshTipAmounts(self):
 		while len(self.tips_to_refresh_amount) > 0:
@@ -297,34 +357,14 @@ class Reddit(PrintError, QObject):
 			tip.refreshAmount()
 
 	def payment_state_transitions(self):
-		network = Network.get_instance()
-		offline = not network
-		if not hasattr(self.wallet_ui, "tiplist") or self.wallet_ui.tiplist is None:
+		if not hasattr(self.wallet_ui, "payment_scheduler") or self.wallet_ui.payment_scheduler is None:
 			return
-		for tip in self.wallet_ui.tiplist.tips.values():
-			if tip.payment_status:
-				# "amount set" -> "check"
-				if tip.payment_status[:10] == 'amount set':
-					if offline:
-						tip.amount_set_time = time()
-					else:
-						secs = c["ready_to_pay_grace_secs"] - (int(time() - tip.amount_set_time))
-						if secs <= 0:
-							tip.payment_status = "check"
-							# reset autopay timer to improve batching (wait for more tips to become ready to pay)
-							if self.wallet_ui.autopay:
-								self.wallet_ui.autopay.resetTimer() 
-						else:
-							tip.payment_status = f'amount set ({secs}s)' 
-						tip.update()
-				# "check" -> "ready to pay"
-				if tip.payment_status[:5] == "check" and hasattr(tip, "subscription_time") and tip.subscription_time:
-					secs = c["check_grace_secs"] - (int(time() - tip.subscription_time))
-					if secs <= 0:
-						tip.payment_status = "ready to pay"
-					else:
-						tip.payment_status = f"check ({secs}s)"
-					tip.update()
+		offline = not Network.get_instance()
+		checked_tips = self.wallet_ui.payment_scheduler.tick(offline)
+		if len(checked_tips) > 0:
+			# reset autopay timer to improve batching (wait for more tips to become ready to pay)
+			if hasattr(self.wallet_ui, "autopay") and self.wallet_ui.autopay:
+				self.wallet_ui.autopay.resetTimer() 
 
 	p_mark_1 = re.compile('u/(\S*) has not yet linked an address\.', re.MULTILINE | re.DOTALL)
 	p_mark_2 = re.compile('Unfortunately, this .* bot is unable to understand your message\..*', re.MULTILINE | re.DOTALL)
@@ -348,12 +388,12 @@ class Reddit(PrintError, QObject):
 			if Reddit.p_mark_2.match(item.body): 
 				continue
 
-			if item.author == 'chaintip' and item.fullname not in self.items_by_fullname:
+			if item.author == 'chaintip' and not self.seen_items.isRecent(item.fullname):
 				items.append(item)
 
 		self.print_error(f"found {len(items)} items younger than {limit_days} days")
 		self.reddit.inbox.mark_unread(items)
-		self.items_by_fullname = {} # to enable unread() loop to read everything
+		self.seen_items = SeenItems() # to enable unread() loop to read everything
 
 	def mark_read_items_to_mark_read(self):
 		if len(self.items_to_mark_read) > 0:
@@ -363,147 +403,180 @@ class Reddit(PrintError, QObject):
 			self.items_to_mark_read = []
 
 	def findTipByReference(self, reference):
-		for tip in self.wallet_ui.tiplist.tips.values():
-			if tip.getReference() == reference:
-				return tip
-		raise Exception(f"tip not found by reference {reference}")
-
-	p_claimed_subject = re.compile('Tip claimed.')
-	p_returned_subject = re.compile('Tip returned to you.')
-	p_funded_subject = re.compile('Tip funded.')
-	p_claimed_or_returned_message = re.compile('Your \[tip\]\(.*_/(\S*)\) of (\d*\.\d*) Bitcoin Cash.*to u/(\S*).* has \[been (\S*)\]\(.*/(\w*)\).*', re.MULTILINE | re.DOTALL)
-	p_various_messages = re.compile('Your tip to u/(\S*) for their \[(.*)\]\(.*/(\w*)/(\w*)/\).*of (\d*\.\d*) Bitcoin Cash.*has \[been (\S*)\].*', re.MULTILINE | re.DOTALL)
-	def parseClaimedOrReturnedMessage(self, message: praw.models.Message):
-		#print_error("checking if message is claim/returned, subject", message.subject)
+		tip = self.wallet_ui.tiplist.getTipByReference(reference)
+		if not tip:
+			raise Exception(f"tip not found by reference {reference}")
+		return tip
+
+	def getConfirmationCommentID(self, message: praw.models.Message):
+		"""returns id of the confirmation comment parseClaimedOrReturnedMessage() will need to look up for message, or None"""
+		if not isinstance(message, praw.models.Message) or message.author != 'chaintip':
+			return None
+		if not message_classifier.isClaimReturnSubject(message.subject):
+			return None
+		claim_return = message_classifier.parseClaimReturn(message.body)
+		return claim_return.confirmation_comment_id if claim_return else None
 
-		# claimed message
-		if not self.p_claimed_subject.match(message.subject) \
-			and not self.p_returned_subject.match(message.subject) \
-			and not self.p_funded_subject.match(message.subject) \
-		:
+	def prefetchConfirmationCommentParents(self, items: list):
+		"""resolve parent ids of the confirmation comments referenced by claim/return messages in items using bulk info() calls"""
+		comment_ids = set(self.getConfirmationCommentID(item) for item in items) - {None} - self.parent_ids_by_comment_id.keys()
+		if len(comment_ids) == 0:
+			return
+		for comment_id in comment_ids:
+			self.parent_ids_by_comment_id[comment_id] = None
+		for comment in self.reddit.info(fullnames = ["t1_" + comment_id for comment_id in comment_ids]): # praw requests 100 per call
+			self.parent_ids_by_comment_id[comment.id] = comment.parent_id
+		self.print_error(f"prefetched parents of {len(comment_ids)} confirmation comments")
+
+	def getConfirmationCommentParentID(self, confirmation_comment_id):
+		"""parent id of confirmation comment, prefetched by prefetchConfirmationCommentParents() if possible"""
+		if confirmation_comment_id in self.parent_ids_by_comment_id:
+			parent_id = self.parent_ids_by_comment_id.pop(confirmation_comment_id)
+			if parent_id is None:
+				raise praw.exceptions.ClientException(f"confirmation comment {confirmation_comment_id} not found")
+			return parent_id
+		return self.reddit.comment(confirmation_comment_id).parent_id
+
+	def getInboxCursor(self):
+		if self.inbox_cursor is None:
+			self.inbox_cursor = self.wallet_ui.tiplist.getMeta(Reddit.INBOX_CURSOR_KEY)
+		return self.inbox_cursor
+
+	def isBehindInboxCursor(self, item):
+		"""True if item is not newer than the newest item digested so far (in this or an earlier session)"""
+		cursor = self.getInboxCursor()
+		return cursor is not None and (item.fullname == cursor["fullname"] or item.created_utc < cursor["created_utc"])
+
+	def advanceInboxCursor(self, item):
+		"""move inbox cursor to item if it is newer"""
+		if item is None:
+			return
+		cursor = self.getInboxCursor()
+		if cursor is None or item.created_utc > cursor["created_utc"]:
+			self.inbox_cursor = {"fullname": item.fullname, "created_utc": item.created_utc}
+			self.meta_signal.emit(Reddit.INBOX_CURSOR_KEY, self.inbox_cursor)
+
+	def loadSyncState(self):
+		"""load seen items, pending associations, fetch outcomes and tx cache from tip store (once)"""
+		if self.sync_state_loaded:
+			return
+		self.sync_state_loaded = True
+		tiplist = self.wallet_ui.tiplist
+		if tiplist.storesBulkMeta():
+			self.seen_items.load(tiplist.getMeta(Reddit.SEEN_ITEMS_KEY))
+		elif tiplist.getMeta(Reddit.SEEN_ITEMS_KEY) is not None: # drop bloom filter persisted into wallet file by earlier versions
+			tiplist.setMeta(Reddit.SEEN_ITEMS_KEY, None)
+		self.seen_items.loadWindow(tiplist.getMeta(Reddit.SEEN_WINDOW_KEY))
+		self.pending_associations.load(tiplist.getMeta(Reddit.PENDING_ASSOCIATIONS_KEY))
+		self.fetch_outcomes.load(tiplist.getMeta(Reddit.FETCH_OUTCOMES_KEY))
+		if getattr(self.wallet_ui, "blockchain_watcher", None):
+			if tiplist.getMeta(Reddit.TX_CACHE_KEY) is not None: # only a cache, dropped
+				tiplist.setMeta(Reddit.TX_CACHE_KEY, None)
+			self.wallet_ui.blockchain_watcher.tx_cache.load(tiplist.loadTxCache())
+
+		# tips might have been stored after their pending claims/confirmations
+		references, tipping_comment_ids = self.pending_associations.references()
+		for reference in references:
+			tip = tiplist.getTipByReference(reference)
+			if tip:
+				tip.associatePending()
+		for tipping_comment_id in tipping_comment_ids:
+			tip = tiplist.getTipByTippingCommentID(tipping_comment_id)
+			if tip:
+				tip.associatePending()
+
+	def persistSyncState(self, force: bool = False):
+		bulk = self.wallet_ui.tiplist.storesBulkMeta()
+		data = self.seen_items.takePersistData(force, SeenItems.WINDOW_SIZE if bulk else c["seen_items_wallet_window_size"], bulk)
+		if data:
+			window, bloom = data
+			self.meta_signal.emit(Reddit.SEEN_WINDOW_KEY, window)
+			if bloom:
+				self.meta_signal.emit(Reddit.SEEN_ITEMS_KEY, bloom)
+		data = self.pending_associations.takePersistData()
+		if data:
+			self.meta_signal.emit(Reddit.PENDING_ASSOCIATIONS_KEY, data)
+		data = self.fetch_outcomes.takePersistData()
+		if data:
+			self.meta_signal.emit(Reddit.FETCH_OUTCOMES_KEY, data)
+		if getattr(self.wallet_ui, "blockchain_watcher", None) and self.wallet_ui.tiplist.storesBulkMeta():
+			data = self.wallet_ui.blockchain_watcher.tx_cache.takePersistData(force)
+			if data:
+				self.wallet_ui.tiplist.writeTxCache(data)
+
+	def isDigested(self, item):
+		"""exact: item is among the recently seen ones or known from the tiplist (confirms a bloom filter hit)"""
+		if self.seen_items.isRecent(item.fullname):
+			return True
+		tiplist = self.wallet_ui.tiplist
+		if isinstance(item, praw.models.Message):
+			return item.id in tiplist.tips
+		if isinstance(item, praw.models.Comment):
+			tip = tiplist.getTipByTippingCommentID(RedditTip.sanitizeID(item.parent_id))
+			return tip is not None and bool(tip.chaintip_confirmation_comment_link)
+		return False
+
+	def getImportCheckpoint(self):
+		return self.wallet_ui.tiplist.getMeta(Reddit.IMPORT_CHECKPOINT_KEY)
+
+	def digestItems(self, items: list):
+		"""digest items after prefetching what they reference. Returns list of digested items"""
+		self.prefetchConfirmationCommentParents(items)
+		digested_items = []
+		for item in items:
+			if self.should_quit:
+				break
+			if self.digestItem(item):
+				digested_items.append(item)
+			self.seen_items.add(item.fullname)
+		return digested_items
+
+	def parseClaimedOrReturnedMessage(self, message: praw.models.Message):
+		"""returns True if message is a claim/return message (applied to its tip or stored for later association)"""
+		if not message_classifier.isClaimReturnSubject(message.subject):
 			return False
 
-		parsed_ok = False
-		tipping_comment_id = None
+		claim_return = message_classifier.parseClaimReturn(message.body)
 		reference = None # can be tipping_comment id or tippee_post_id or tippee_comment_id
-		post_or_comment = None # initialize for debugging output below
-		claim_return_txid = None
-
-		#print_error("detected claimed/returned message, body", message.body)
-		m = self.p_claimed_or_returned_message.match(message.body)
-		if m:
-			confirmation_comment_id = m.group(1)
-			try:
-				tipping_comment_id = RedditTip.sanitizeID(self.reddit.comment(confirmation_comment_id).parent_id)
-				reference = tipping_comment_id
-			except praw.exceptions.ClientException as e:
-				print_error(f"exception parsing tipping_comment_id from message {message.id}." )
-				traceback.print_exc()
+		if claim_return:
+			if claim_return.reference:
+				reference = RedditTip.sanitizeID(claim_return.reference)
+			elif claim_return.confirmation_comment_id:
+				try:
+					reference = RedditTip.sanitizeID(self.getConfirmationCommentParentID(claim_return.confirmation_comment_id))
+				except praw.exceptions.ClientException as e:
+					print_error(f"exception parsing tipping_comment_id from message {message.id}." )
+					traceback.print_exc()
 
-			amount = m.group(2)
-			claimant = m.group(3)
-			action = m.group(4)
-			claim_return_txid = m.group(5)
-			parsed_ok = True
-			# print_error("parsed claimed message", message.id)
-			# print_error("   tipping_comment_id:", tipping_comment_id)
-			# print_error("   amount: ", amount)
-			# print_error("   claimant:", claimant)
-			# print_error("   action:", action)
-		else:
-			m = self.p_various_messages.match(message.body)
-			if m:
-				#self.print_error("subject:", message.subject)
-				#self.print_error("body: ", message.body)
-				# print_error("   group 1", m.group(1))
-				# print_error("   group 2", m.group(2))
-				# print_error("   group 3", m.group(3))
-				# print_error("   group 4", m.group(4))
-				# print_error("   group 5", m.group(5))
-				# print_error("   group 6", m.group(6))
-
-				post_or_comment = m.group(2)
-				if post_or_comment == 'post':
-					reference = RedditTip.sanitizeID(m.group(3))
-				elif post_or_comment == 'comment':
-					reference = RedditTip.sanitizeID(m.group(4))
-				else:
-					confirmation_comment_id = m.group(4)
-					tipping_comment_id = self.reddit.comment(confirmation_comment_id).parent_id
-					reference = tipping_comment_id
-				amount = m.group(5)
-				claimant = m.group(1)
-				action = m.group(6)
-				parsed_ok = True
-
-#		if "user4morethan2mins" in message.subject or "user4morethan2mins" in message.body:
-		# if post_or_comment is None:
-		# 	self.print_error("subject:", message.subject)
-		# 	self.print_error("body: ", message.body)
-		# 	print_error("   reference", reference)
-		# 	print_error("   tipping_comment_id", tipping_comment_id)
-		# 	print_error("   post_or_comment", post_or_comment)
-		# 	print_error("   action", action)
-		# 	print_error("   parsed ok", parsed_ok)
-
-		if parsed_ok and reference is not None:
-			#self.print_error("", message.fullname, ": looking for tip...")
+		if reference is not None:
 			# find tip matching claim and set its acceptance_status
 			try:
 				tip = self.findTipByReference(reference)
-				#self.print_error(f"when parsing claim/returned message {message.id}: found matching tip (for claim)", tip)
-				tip.setAcceptanceOrConfirmationStatus(message, action, claim_return_txid)
+				tip.setAcceptanceOrConfirmationStatus(message.id, claim_return.action, claim_return.claim_return_txid)
 			except: 
-				self.unassociated_claim_return_by_tipping_comment_id[reference].append({
-					"message": message,
-					"action": action,
-					"claim_return_txid": claim_return_txid
-				})
-				#self.print_error(f"when parsing claim/returned message {message.id}: tip with reference {reference} not found. Not registering '{action}' status.")
-
+				self.pending_associations.addClaim(reference, message.id, claim_return.action, claim_return.claim_return_txid)
 			return True
 		else:
 			self.print_error("message", message.id, ": body not claim return: ", message.body)
 
 		return False
 
-#	p_confirmation_comment = re.compile('.*u/(\S*).*\[.*\]\(.*/(bitcoincash:\w*)\).*', re.MULTILINE | re.DOTALL)
-	p_confirmation_comment_please_claim = re.compile('.*u/(\S*), you\'ve \[been sent\]\(.*/(bitcoincash:\w*)\).*Please \[claim it!\].*', re.MULTILINE | re.DOTALL)
-	p_confirmation_comment = re.compile('.*u/(\S*), you\'ve \[been sent\]\(.*/(bitcoincash:\w*)\).*', re.MULTILINE | re.DOTALL)
-	p_confirmation_comment_claimed = re.compile('.*u/(\S*).*has \[claimed\].*', re.MULTILINE | re.DOTALL)
-	p_confirmation_comment_returned = re.compile('.*\[chaintip\].* has \[returned\]\(.*/(bitcoincash:\w*)\).*', re.MULTILINE | re.DOTALL)
 	def parseChaintipComment(self, comment: praw.models.Comment):
 		"""returns True if comment was digested, False otherwise"""
 		tipping_comment_id = RedditTip.sanitizeID(comment.parent_id)
-		tip = None
-		if tipping_comment_id in RedditTip.tips_by_tipping_comment_id.keys():
-			tip = RedditTip.tips_by_tipping_comment_id[tipping_comment_id]
+		tip = self.wallet_ui.tiplist.getTipByTippingCommentID(tipping_comment_id)
 
-		status = None
-
-		if Reddit.p_confirmation_comment.match(comment.body):
-			status = 'confirmed'
-
-		if Reddit.p_confirmation_comment_please_claim.match(comment.body):
-			status = 'unclaimed'
-
-		if Reddit.p_confirmation_comment_claimed.match(comment.body):
-			status = 'claimed'
-
-		if Reddit.p_confirmation_comment_returned.match(comment.body):
-			status = 'returned'
+		confirmation = message_classifier.classifyComment(comment.body)
+		status = confirmation.status if confirmation else None
 
 		# set data on tip (or defer)
 		if status:
 			if tip:
 				tip.chaintip_confirmation_status = status
-				tip.chaintip_confirmation_comment = comment
+				tip.chaintip_confirmation_comment_link = self.getCommentLink(comment)
 				tip.update()
 			else:
-				self.unassociated_chaintip_comments_by_tipping_comment_id[tipping_comment_id] = {
-					"comment": comment,
-					"status": status
-				}
+				self.pending_associations.addConfirmation(tipping_comment_id, status, self.getCommentLink(comment))
 			return True
 		else:
 			self.print_error("chaintip comment doesn't parse: ", comment.body)
@@ -564,165 +637,278 @@ class Reddit(PrintError, QObject):
 		return False
 
 	def fetchTippingComments(self):
-		if hasattr(self.wallet_ui, "tiplist"):
-			tips = self.wallet_ui.tiplist.tips.values()
-
-			# construct list of tips to work on
-			tips_without_tipping_comments = list([tip for tip in tips if \
-				hasattr(tip, "tipping_comment_id") and \
-				tip.tipping_comment_id is not None and \
-				(not hasattr(tip, "tipping_comment") or tip.tipping_comment is None) and\
-				(not hasattr(tip, "subreddit_str") or len(tip.subreddit_str) == 0)
-			])
-			# prefer unpaid tips which we NEED to get the tipping coments for
-			tips_without_tipping_comments.sort(key=lambda t: t.isPaid()) 
-
-			# get a batch of comments
-			tipping_comment_ids = [tip.tipping_comment_id for tip in tips_without_tipping_comments[:11]]
-			if len(tipping_comment_ids) > 0:
-				self.print_error(f"fetchTippingComments(): reddit.info({tipping_comment_ids})")
-				for info in self.reddit.info(fullnames = tipping_comment_ids):
-					if self.should_quit:
-						break
-					tipping_comment_ids.remove(info.fullname)
-					try:
-						tip = self.findTipByReference(info.fullname)
-						tip.parseTippingComment(info)
-					except Exception as e: # possibly tip was removed while we made the request
-						self.print_error(f"fetchTippingComments() error: {e}")
-				for unresolved_tipping_comment_id in tipping_comment_ids:
-					self.print_error("unresolved: ", unresolved_tipping_comment_id)
-					try:
-						tip = self.findTipByReference(unresolved_tipping_comment_id)
-						tip.tipping_comment_id = None
-					except Exception as e: # possibly tip was removed while we made the request
-						self.print_error(f"fetchTippingComments() error: {e}")
+		if hasattr(self.wallet_ui, "tipping_comment_fetcher") and self.wallet_ui.tipping_comment_fetcher:
+			self.wallet_ui.tipping_comment_fetcher.do_work()
+
+	def queueImport(self, limit_days = -1, start_date_utc = None, description = ""):
+		"""run doImport() in the background (after imports queued before)"""
+		self.import_jobs.put((limit_days, start_date_utc, description))
+		if self.import_thread is None:
+			self.import_thread = threading.Thread(target = self.importWorker, name = "reddit_import", daemon = True)
+			self.import_thread.start()
+
+	def cancelImports(self):
+		"""cancel running import and drop queued ones"""
+		try:
+			while True:
+				self.import_jobs.get_nowait()
+		except queue.Empty:
+			pass
+		self.import_cancelled.set()
 
-	def doImport(self, limit_days = -1, start_date_utc = None):
-		self.print_error(f"Reddit.doImport(limit_days={limit_days}) called")
-		current_time_utc = int(round(time()))
-		counter = 0
-		for item in self.reddit.inbox.all(limit=None):
-			if self.should_quit: 
-				self.print_error("break, should_quit=True")
-				break
-			if isinstance(item, praw.models.Message) or isinstance(item, praw.models.Comment):
-				if limit_days > 0 and ((current_time_utc - item.created_utc) / (60*60*24)) > limit_days:
-					self.print_error("break, limit_days reached")
-					break
-				if limit_days == -2:
-					if item.created_utc < RedditTip.CHAINTIP_TIPPING_COMMENT_LINK_INTRODUCTION_TIME:
-						self.print_error("break, CHAINTIP_TIPPING_COMMENT_LINK_INTRODUCTION_TIME reached")
-						break
-				if limit_days == -3:
-					if item.created_utc < start_date_utc:
-						break
-			if item.author != 'chaintip': 
+	def importWorker(self):
+		while not self.should_quit:
+			try:
+				limit_days, start_date_utc, description = self.import_jobs.get(timeout = 0.5)
+			except queue.Empty:
 				continue
-			self.digestItem(item)
-			counter += 1
-			if counter % 10 == 0:
-				self.print_error(f"digested {counter} items")
+			self.import_cancelled.clear()
+			try:
+				self.doImport(limit_days, start_date_utc, self.import_cancelled.is_set, description)
+			except Exception as e:
+				traceback.print_exc()
+				self.import_progress_signal.emit({"description": description, "finished": True, "error": f"{type(e).__name__} {e}"})
 
-	def run(self):
-		self.print_error("Reddit.run() called")
-		tips = []
+	def importPages(self, params: dict, stopped):
+		"""
+			generator of inbox pages (lists of up to DIGEST_BATCH_SIZE items), newest first.
+			A producer thread fetches up to IMPORT_PREFETCH_PAGES pages ahead. stopped() ends production.
+		"""
+		pages = queue.Queue(maxsize = Reddit.IMPORT_PREFETCH_PAGES)
+		end = object()
+		consumer_gone = threading.Event()
 
-		self.await_reddit_authorization()
+		def shouldStop():
+			return consumer_gone.is_set() or stopped() or self.should_quit
 
-		# main digestion (and other tasks) loop
-		flow_debug = False
-		cycle = 0
-		while not self.should_quit:
+		def put(page):
+			while not shouldStop():
+				try:
+					pages.put(page, timeout = 0.1)
+					return True
+				except queue.Full:
+					pass
+			return False
+
+		def produce():
+			with self.scheduler.priority(RequestScheduler.SYNC):
+				try:
+					page = []
+					for item in self.reddit.inbox.all(limit=None, params=params):
+						if shouldStop():
+							return
+						page.append(item)
+						if len(page) >= Reddit.DIGEST_BATCH_SIZE:
+							if not put(page):
+								return
+							page = []
+					if len(page) > 0 and not put(page):
+						return
+					put(end)
+				except Exception as e:
+					put(e)
+
+		threading.Thread(target = produce, name = "reddit_import_pages", daemon = True).start()
+		try:
+			while True:
+				try:
+					page = pages.get(timeout = 0.1)
+				except queue.Empty:
+					if shouldStop():
+						return
+					continue
+				if page is end:
+					return
+				if isinstance(page, Exception):
+					raise page
+				yield page
+		finally:
+			consumer_gone.set()
+
+	def doImport(self, limit_days = -1, start_date_utc = None, cancelled = lambda: False, description = ""):
+		"""
+			import inbox items, newest first. Progress of imports (except the -3 "since start_date_utc" mode)
+			is checkpointed, an interrupted import called again with the same arguments resumes where it stopped.
+			Pages are prefetched while the previous page is digested. Emits import_progress_signal with
+			items/s and (if the import has a time horizon) fraction done and ETA. A cancelled import isn't resumed.
+		"""
+		with self.scheduler.priority(RequestScheduler.SYNC):
+			self.print_error(f"Reddit.doImport(limit_days={limit_days}) called")
+			current_time_utc = int(round(time()))
+			start_time = time()
 			counter = 0
-			try:
-				if flow_debug: self.print_error("digest loop start (reddit request)")
-				items_this_cycle = 0
-				for item in self.reddit.inbox.unread(limit=None):
+			scanned_count = 0
+			items = []
+			newest_item = None
+			last_item = None
+
+			self.loadSyncState()
+			skipped_count = 0
+
+			if limit_days > 0:
+				horizon_utc = current_time_utc - limit_days * 60*60*24
+			elif limit_days == -2:
+				horizon_utc = RedditTip.CHAINTIP_TIPPING_COMMENT_LINK_INTRODUCTION_TIME
+			elif limit_days == -3:
+				horizon_utc = start_date_utc
+			else:
+				horizon_utc = None
+
+			resumable = limit_days != -3
+			params = {}
+			checkpoint = self.getImportCheckpoint() if resumable else None
+			if checkpoint and checkpoint["limit_days"] == limit_days and checkpoint["start_date_utc"] == start_date_utc and checkpoint["after"]:
+				self.print_error(f"resuming import after {checkpoint['after']}")
+				params["after"] = checkpoint["after"]
+			else:
+				checkpoint = {"limit_days": limit_days, "start_date_utc": start_date_utc, "after": None}
+
+			def digestBatch():
+				nonlocal counter, items
+				self.digestItems(items)
+				counter += len(items)
+				items = []
+				self.advanceInboxCursor(newest_item)
+				if resumable and last_item is not None and not self.should_quit:
+					checkpoint["after"] = last_item.fullname
+					self.meta_signal.emit(Reddit.IMPORT_CHECKPOINT_KEY, dict(checkpoint))
+
+			def emitProgress(finished = False):
+				elapsed = time() - start_time
+				fraction = eta_secs = None
+				if horizon_utc is not None and last_item is not None:
+					span = newest_item.created_utc - horizon_utc
+					fraction = min(1.0, max(0.0, (newest_item.created_utc - last_item.created_utc) / span)) if span > 0 else 1.0
+					eta_secs = elapsed * (1 - fraction) / fraction if fraction > 0 else None
+				self.import_progress_signal.emit({
+					"description": description,
+					"scanned": scanned_count,
+					"digested": counter,
+					"skipped": skipped_count,
+					"items_per_sec": scanned_count / elapsed if elapsed > 0 else 0,
+					"fraction": 1.0 if finished and not cancelled() else fraction,
+					"eta_secs": eta_secs,
+					"finished": finished,
+					"cancelled": cancelled(),
+				})
 
-					# break early in case of shutdown
-					if self.should_quit:
-						break
+			horizon_reached = False
+			for page in self.importPages(params, lambda: horizon_reached or cancelled()):
+				for item in page:
+					if isinstance(item, praw.models.Message) or isinstance(item, praw.models.Comment):
+						if horizon_utc is not None and item.created_utc < horizon_utc:
+							self.print_error("break, import horizon reached")
+							horizon_reached = True
+							break
+					if newest_item is None:
+						newest_item = item
+					last_item = item
+					scanned_count += 1
+					if item.author != 'chaintip': 
+						continue
+					# skip items digested before (bloom filter hit alone could be a false positive, needs confirmation)
+					if self.isBehindInboxCursor(item) and self.seen_items.mightHaveSeen(item.fullname) and self.isDigested(item):
+						skipped_count += 1
+						continue
+					items.append(item)
+				digestBatch()
+				self.print_error(f"digested {counter} of {scanned_count} items, skipped {skipped_count} seen before")
+				emitProgress()
+				if horizon_reached or cancelled() or self.should_quit:
+					break
 
-					# break on first already-digested message
-					if item.fullname in self.items_by_fullname.keys():
-						#self.print_error("aborting loading items at already-loaded item", item.fullname)
-						break
-					self.items_by_fullname[item.fullname] = item
+			if not self.should_quit:
+				# import finished or cancelled
+				if resumable:
+					self.meta_signal.emit(Reddit.IMPORT_CHECKPOINT_KEY, None)
+				if cancelled():
+					self.print_error("import cancelled")
+			emitProgress(finished = True)
+			self.persistSyncState(force = True)
+
+	def digestInbox(self):
+		"""digest new unread inbox items (triggers itself again while there are new items)"""
+		counter = 0
+		items = []
+		newest_item = None
+		for item in self.reddit.inbox.unread(limit=None):
 
-					if item is not None:
-						items_this_cycle += 1
+			# break early in case of shutdown
+			if self.should_quit:
+				break
 
-					# only read chaintip-authored item
-					if item.author != 'chaintip':
-						continue
+			# break on first already-digested message
+			if self.seen_items.isRecent(item.fullname):
+				#self.print_error("aborting loading items at already-loaded item", item.fullname)
+				break
+			# ... or digested in an earlier session
+			if self.isBehindInboxCursor(item):
+				break
+			self.seen_items.add(item.fullname)
+			if newest_item is None:
+				newest_item = item
+
+			# only read chaintip-authored item
+			if item.author != 'chaintip':
+				continue
+
+			counter += 1
+			items.append(item)
+
+		digested_items = self.digestItems(items)
+		if read_config(self.wallet_ui.wallet, "mark_read_digested_tips"):
+			self.items_to_mark_read.extend(digested_items)
+		if not self.should_quit:
+			self.advanceInboxCursor(newest_item)
+
+		if counter > 0:
+			self.print_error(f"loaded {counter} items")
+			self.task_scheduler.trigger("digest_inbox")
+
+	def initializeTipAmounts(self):
+		# fetch all needed rates in one go
+		self.prefetchRates()
+		# refresh tip amounts (basically to set payment state and amount_set_time, which is not stored)
+		self.triggerRefreshTipAmounts()
+		self.refreshTipAmounts()
+
+	def subscribeAddresses(self):
+		if hasattr(self.wallet_ui, "blockchain_watcher") and self.wallet_ui.blockchain_watcher:
+			self.wallet_ui.blockchain_watcher.do_work()
+
+	def autopayWork(self):
+		if hasattr(self.wallet_ui, "autopay") and self.wallet_ui.autopay:
+			self.wallet_ui.autopay.do_work()
+
+	def persist(self):
+		# write sync state and tiplist to wallet.storage
+		self.persistSyncState()
+		self.wallet_ui.persistTipList()
+
+	def run(self):
+		self.print_error("Reddit.run() called")
 
-					counter += 1
-
-					digested = self.digestItem(item)
-					if flow_debug:
-						self.print_error("digesting item", item, "and marking read" if digested else "NOT recognized")
-					if digested and read_config(self.wallet_ui.wallet, "mark_read_digested_tips"):
-						self.items_to_mark_read.append(item)
-
-				if flow_debug: self.print_error("digest loop finished")
-
-				if counter > 0:
-					self.print_error(f"loaded {counter} items, sleeping...")
-					counter = 0
-				else:
-					if flow_debug: self.print_error("sleep...")
-					cnt = 20
-					while not self.should_quit and cnt > 0:
-						sleep(0.1)
-						cnt -= 1
-
-				# -- some "background tasks" (reddit thread is abused as a main loop) ---
-
-				# after first round of loading items,...
-				if cycle == 0:
-					# refresh tip amounts (basically to set payment_status, which is not stored)
-					if flow_debug: self.print_error("cycle 0 triggerRefreshTipAmounts()")
-					self.triggerRefreshTipAmounts()
-					if flow_debug: self.print_error("cycle 0 refreshTipAmounts()")
-					self.refreshTipAmounts()
-				
-				#self.wallet_ui.print_debug_stats()
-
-				if flow_debug: self.print_error("mark_read_items_to_mark_read()")
-				self.mark_read_items_to_mark_read()
-
-				if flow_debug: self.print_error("fetchTippingComments()")
-				self.fetchTippingComments()
-
-				if flow_debug: self.print_error("refreshTipAmounts()")
-				self.refreshTipAmounts()
-
-				# payment readiness check and autopay
-				if flow_debug: self.print_error("payment_state_transitions")
-				self.payment_state_transitions()
-				if hasattr(self.wallet_ui, "autopay") and self.wallet_ui.autopay:
-					self.wallet_ui.autopay.do_work()
-
-				if False and items_this_cycle > 0:
-					# print unassociated infos:
-					for k, crl in self.unassociated_claim_return_by_tipping_comment_id.items():
-						for cr in crl:
-							item = cr["message"]
-							self.print_error(f"{k}: {format_time(item.created_utc)} {item.subject}")
-
-				# write tiplist to wallet.storage
-				if flow_debug: self.print_error("persistTipList")
-				self.wallet_ui.persistTipList()
-
-				cycle += 1
-			except prawcore.exceptions.PrawcoreException as e:
-				self.print_error("PrawCore (Reddit Network) Exception: ", e, "retrying later...")
-				sleep(30)
+		self.await_reddit_authorization()
+		self.loadSyncState()
+
+		# tasks run on a worker pool, tasks in the same group don't run concurrently
+		ts = self.task_scheduler
+		ts.addTask("digest_inbox", self.digestInbox, Reddit.POLL_INTERVAL_SECS, warn_after_secs=120, group="inbox")
+		ts.addTask("mark_read", self.mark_read_items_to_mark_read, 5, group="inbox")
+		ts.addTask("fetch_tipping_comments", self.fetchTippingComments, 5, warn_after_secs=120, group="comments")
+		ts.addTask("refresh_rates", self.refreshRates, 10, group="rates")
+		ts.addTask("subscribe_addresses", self.subscribeAddresses, 0.5, group="blockchain")
+		ts.addTask("initialize_tip_amounts", self.initializeTipAmounts, None, warn_after_secs=120, group="payments")
+		ts.addTask("refresh_tip_amounts", self.refreshTipAmounts, 2, group="payments")
+		ts.addTask("payment_state_transitions", self.payment_state_transitions, 1, group="payments")
+		ts.addTask("autopay", self.autopayWork, 1, group="payments")
+		ts.addTask("persist", self.persist, 2, group="persist")
+		ts.run()
 
 		# --- wind down ----
 
-		self.print_error("exited reddit inbox streaming")
+		self.print_error("exited reddit task loop")
+		self.persistSyncState(force = True)
 
 		self.dathread.quit()
 
@@ -746,7 +932,15 @@ class Reddit(PrintError, QObject):
 class RedditTip(Tip):
 
 	CHAINTIP_TIPPING_COMMENT_LINK_INTRODUCTION_TIME = mktime(date(2021,4,8).timetuple())
-	tips_by_tipping_comment_id = {}
+
+	# fields decoded on first access when loaded from storage
+	recipient_address = LazyField(
+		lambda s: Address.from_cashaddr_string(s) if s and len(s) > 0 else None,
+		lambda a: a.to_cashaddr() if a else ""
+	)
+	tip_quantity = LazyField(lambda s: Decimal(s) if len(s) > 0 else None, lambda v: str(v) if v else "")
+	amount_bch = LazyField(lambda s: Decimal(s) if len(s) > 0 else None, lambda v: str(v) if v else "")
+	amount_fiat = LazyField(lambda s: Decimal(s) if len(s) > 0 else None, lambda v: str(v) if v else "")
 
 	def sanitizeID(id):
 		if id[0] == "t" and id[2] == "_":
@@ -766,6 +960,9 @@ class RedditTip(Tip):
 		self.reddit = reddit
 		self.acceptance_status = ""
 
+		self.tippee_comment_id = None
+		self.tippee_post_id = None
+		self.tippee_content_link = None
 		self.chaintip_message_id = ""
 		self.chaintip_message_created_utc = ""
 		self.chaintip_message_author_name = ""
@@ -775,22 +972,21 @@ class RedditTip(Tip):
 		self.tipping_comment_body = ""
 		self.claim_or_returned_message_id = None
 		self.claim_return_txid = ""
-
-	def set_tipping_comment_id(self, tipping_comment_id):
-		if self.tipping_comment_id:
-			del ReddiTip.tips_by_tipping_comment_id[self.tipping_comment_id]
-		self.tipping_comment_id = tipping_comment_id
-		RedditTip.tips_by_tipping_comment_id[self.tipping_comment_id] = self
+		self.chaintip_confirmation_comment_link = None
 
 	# Tip overrides
 
 	def from_dict(self, d: dict):
 		"""used to load from wallet storage"""
-		self.set_tipping_comment_id(d["tipping_comment_id"])
+		self.tipping_comment_id = d["tipping_comment_id"]
 		self.tippee_comment_id = d["tippee_comment_id"]
 		self.tippee_post_id = d["tippee_post_id"]
 		self.acceptance_status = d["acceptance_status"]
-		self.payment_status = d["payment_status"]
+		self.payment_state, self.payment_status_detail = PaymentState.parse(d["payment_status"])
+		if d.get("payment_status_detail", None):
+			self.payment_status_detail = d["payment_status_detail"]
+		if self.payment_state in TRANSIENT_PAYMENT_STATES: # e.g. stopped mid-payment
+			self.payment_state, self.payment_status_detail = PaymentState.AMOUNT_SET, None
 		self.chaintip_confirmation_status = d["chaintip_confirmation_status"]
 		self.chaintip_message_id = d["chaintip_message_id"]
 		self.chaintip_message_created_utc = int(d["chaintip_message_created_utc"])
@@ -807,24 +1003,63 @@ class RedditTip(Tip):
 		self.type = d["type"]
 		self.tip_amount_text = d["tip_amount_text"]
 		self.tip_unit = d["tip_unit"]
-		self.tip_quantity = Decimal(d["tip_quantity"]) if len(d["tip_quantity"]) > 0 else None
-		self.amount_bch = Decimal(d["amount_bch"]) if len(d["amount_bch"]) > 0 else None
-		self.amount_fiat = Decimal(d["amount_fiat"]) if len(d["amount_fiat"]) > 0 else None
+		RedditTip.tip_quantity.setRaw(self, d["tip_quantity"])
+		RedditTip.amount_bch.setRaw(self, d["amount_bch"])
+		RedditTip.amount_fiat.setRaw(self, d["amount_fiat"])
 		self.fiat_currency = d["fiat_currency"]
-		self.recipient_address = Address.from_cashaddr_string(d["recipient_address"]) if d["recipient_address"] and len(d["recipient_address"]) > 0 else None
+		RedditTip.recipient_address.setRaw(self, d["recipient_address"])
 		self.direction = d["direction"]
 		self.claim_return_txid = d["claim_return_txid"] if "claim_return_txid" in d and len(d["claim_return_txid"]) > 0 else None
+		self.chaintip_confirmation_comment_link = d.get("chaintip_confirmation_comment_link", None)
+		if d.get("recipient_scripthash", None):
+			self.recipient_scripthash = d["recipient_scripthash"]
+			self.scripthash_address_string = d["recipient_address"]
 
 		#	tip.payment_status,
 		#	"{0:.8f}".format(tip.amount_received_bch) if isinstance(tip.amount_received_bch, Decimal) else "",
 
+	@staticmethod
+	def fromIndexDict(tiplist: TipList, reddit: Reddit, id, d: dict, load_stored_data):
+		"""
+			partially loaded tip: only the fields in d (indexed by the tip store) are set,
+			the rest is decoded from load_stored_data() on first access (see Tip.decodeStoredData())
+		"""
+		tip = RedditTip.__new__(RedditTip)
+		tip.tiplist_weakref = weakref.ref(tiplist)
+		tip.reddit = reddit
+		tip.lock = threading.RLock()
+		tip.chaintip_message_id = id
+		tip.chaintip_message_created_utc = int(d["chaintip_message_created_utc"]) if d["chaintip_message_created_utc"] is not None else ""
+		tip.payment_state = PaymentState.parse(d["payment_status"])[0]
+		if tip.payment_state in TRANSIENT_PAYMENT_STATES:
+			tip.payment_state, tip.payment_status_detail = PaymentState.AMOUNT_SET, None
+		tip.acceptance_status = d["acceptance_status"]
+		tip.tipping_comment_id = d["tipping_comment_id"]
+		tip.tippee_comment_id = d["tippee_comment_id"]
+		tip.tippee_post_id = d["tippee_post_id"]
+		tip.subreddit_str = d["subreddit_str"]
+		RedditTip.amount_bch.setRaw(tip, d["amount_bch"] or "")
+		RedditTip.recipient_address.setRaw(tip, d["recipient_address"] or "")
+		if d["recipient_scripthash"]:
+			tip.recipient_scripthash = d["recipient_scripthash"]
+			tip.scripthash_address_string = d["recipient_address"]
+		tip.payments_by_txhash = {}
+		tip.amount_received_bch = None
+		tip.payments_confirmed = bool(d["payments_confirmed"])
+		tip.load_stored_data = load_stored_data
+		return tip
+
+	def newInstance(self):
+		return RedditTip(self.tiplist_weakref(), self.reddit)
+
 	def to_dict(self):
 		return {
 			"tipping_comment_id": self.tipping_comment_id,
 			"tippee_comment_id": self.tippee_comment_id,
 			"tippee_post_id": self.tippee_post_id,
 			"acceptance_status": self.acceptance_status,
-			"payment_status": self.payment_status,
+			"payment_status": self.payment_state.value,
+			"payment_status_detail": self.payment_status_detail if self.payment_status_detail else "",
 			"chaintip_confirmation_status": self.chaintip_confirmation_status,
 			"chaintip_message_id": self.chaintip_message_id,
 			"chaintip_message_created_utc": self.chaintip_message_created_utc,
@@ -841,14 +1076,23 @@ class RedditTip(Tip):
 			"type": self.type,
 			"tip_amount_text": self.tip_amount_text,
 			"tip_unit": self.tip_unit,
-			"tip_quantity": str(self.tip_quantity) if self.tip_quantity else "",
-			"amount_bch": str(self.amount_bch) if self.amount_bch else "",
-			"amount_fiat": str(self.amount_fiat) if self.amount_fiat else "",
+			"tip_quantity": RedditTip.tip_quantity.toRaw(self),
+			"amount_bch": RedditTip.amount_bch.toRaw(self),
+			"amount_fiat": RedditTip.amount_fiat.toRaw(self),
 			"fiat_currency": self.fiat_currency if self.fiat_currency else "",
-			"recipient_address": self.recipient_address.to_cashaddr() if self.recipient_address else "",
+			"recipient_address": RedditTip.recipient_address.toRaw(self),
 			"claim_return_txid": self.claim_return_txid if self.claim_return_txid else "",
+			"chaintip_confirmation_comment_link": self.chaintip_confirmation_comment_link,
+			"recipient_scripthash": getattr(self, "recipient_scripthash", None) if getattr(self, "scripthash_address_string", None) == self.getRecipientAddressString() else None,
 		}
 
+	def getCreatedUTC(self):
+		return self.chaintip_message_created_utc if self.chaintip_message_created_utc != "" else None
+
+	def getRecipientAddressString(self):
+		s = RedditTip.recipient_address.toRaw(self)
+		return s if s else None
+
 	def getReference(self):
 		if self.tipping_comment_id:
 			return self.tipping_comment_id
@@ -864,7 +1108,7 @@ class RedditTip(Tip):
 			if not hasattr(self, "tip_unit") or not self.tip_unit or len(self.tip_unit) == 0 or not hasattr(self, "tip_quantity") or type(self.tip_quantity) != Decimal:
 				self.setAmount() # update default amount
 			else:
-				self.evaluateAmount() # refresh parsed amount (to set payment_status = "amount set")
+				self.evaluateAmount() # refresh parsed amount (to set payment state "amount set")
 
 	#
 
@@ -878,10 +1122,6 @@ class RedditTip(Tip):
 			self.print_error("strange Exception in RedditTip.isValid(): ", e)
 			return False
 
-	def isPaid(self):
-		if not self.payment_status: return False
-		return self.payment_status[:4] == "paid"
-
 	def isFinished(self):
 		try:
 			is_pre_tclink = self.chaintip_message_created_utc and self.chaintip_message_created_utc < RedditTip.CHAINTIP_TIPPING_COMMENT_LINK_INTRODUCTION_TIME
@@ -897,12 +1137,6 @@ class RedditTip(Tip):
 				# (self.acceptance_status == "not yet linked" and (is_pre_tclink or (hasattr(self, "chaintip_confirmation_status") and self.chaintip_confirmation_status == "returned"))) \
 			)
 
-	p_subject_outgoing_tip = re.compile('Tip (\S*)')
-	p_tip_comment = re.compile('.*\[your tip\]\(\S*/_/(\S*)\).*', re.MULTILINE | re.DOTALL)
-	p_recipient_acceptance = re.compile('^u/(\S*) has (.*linked).*?Bitcoin Cash \(BCH\) to: \*\*(bitcoincash:q\w*)\*\*.*', re.MULTILINE | re.DOTALL)
-	p_sender = re.compile('^u/(\S*) has just sent you (\S*) Bitcoin Cash \(about \S* USD\) \[via\]\(\S*/_/(\S*)\) .*', re.MULTILINE | re.DOTALL)
-	p_stealth = re.compile('.*Tip \*\*.*\*\* for their \[(\w*)\]\((/(r/\w*)/\S*/(\w*)/(\w*)/)\).*', re.MULTILINE | re.DOTALL)
-
 	def parseChaintipMessage(self, message: praw.models.Message):
 		"""returns True if item was digested or deferred, False otherwise"""
 		self.chaintip_message = message
@@ -926,81 +1160,51 @@ class RedditTip(Tip):
 			#self.print_error(f"parsing chaintip message {message.id}")
 			#self.print_error(self.chaintip_message.body)
 
-			# "Tip funded."
-			if self.chaintip_message.subject == "Tip funded.":
-				return False
+			parsed = message_classifier.classifyMessage(self.chaintip_message.subject, self.chaintip_message.body)
 
-			# "Tip claimed." <- we need to ignore this here, p_tip_comment will catch it as tip otherwise
-			if self.chaintip_message.subject == "Tip claimed.":
+			# "You've been tipped!"
+			if isinstance(parsed, message_classifier.IncomingTip):
+				self.type = 'receive'
+				self.username = parsed.username
+				self.direction = 'incoming'
+				self.amount_bch = Decimal(parsed.amount)
+				self.print_error("incoming tip, user: ", self.username)
 				return False
 
-			# "You've been tipped!"
-			elif self.chaintip_message.subject == "You've been tipped!":
-				m = RedditTip.p_sender.match(self.chaintip_message.body)
-				if m:
-					self.type = 'receive'
-					self.username = m.group(1)
-					self.direction = 'incoming'
-					self.amount_bch = Decimal(m.group(2))
-					self.print_error("p_sender matches, user: ", self.username)
-				else:
-					self.print_error("p_sender doesn't match")
+			# ignore "Tip funded.", "Tip claimed." and whatever else is not an outgoing tip
+			if not isinstance(parsed, message_classifier.OutgoingTip):
 				return False
 
-			# match outgoing tip
-			elif RedditTip.p_subject_outgoing_tip.match(self.chaintip_message.subject):
-				self.type = 'send'
-				self.direction = 'outgoing'
-
-				# match "your tip"
-				m = RedditTip.p_tip_comment.match(self.chaintip_message.body)
-				if m:
-					self.set_tipping_comment_id(RedditTip.sanitizeID(m.group(1)))
-					reference = self.tipping_comment_id
-
-				# match ... has (not) linked ... Bitcoin Cash (BCH) to <address>
-				m = RedditTip.p_recipient_acceptance.match(self.chaintip_message.body)
-				if m:
-					self.username = m.group(1)
-					if m.group(2) == "not yet linked":
-						self.acceptance_status = 'not yet linked'
-					else:
-						self.acceptance_status = 'linked'
-					self.recipient_address = Address.from_cashaddr_string(m.group(3))
-
-				# stealth: match "for their <post|comment> (...)"
-				m = RedditTip.p_stealth.match(self.chaintip_message.body)
-				if m:
-					self.setAmount()
-					self.chaintip_confirmation_status = '<stealth>'
-					post_or_comment = m.group(1)
-					self.subreddit_str = m.group(3)
-					self.tippee_content_link = m.group(2)
-					if post_or_comment == 'comment': 	
-						self.tippee_comment_id = RedditTip.sanitizeID(m.group(5))
-						reference = self.tippee_comment_id
-					if post_or_comment == 'post':
-						self.tippee_post_id = RedditTip.sanitizeID(m.group(4))
-						reference = self.tippee_post_id
-						#self.print_error("reference is tippee_post_id", reference)
-					# self.print_error("   m.group(1)", m.group(1))
-					# self.print_error("   m.group(2)", m.group(2))
-					# self.print_error("   m.group(3)", m.group(3))
-					# self.print_error("   m.group(4)", m.group(4))
-					# self.print_error("   m.group(5)", m.group(5))
+			# outgoing tip
+			self.type = 'send'
+			self.direction = 'outgoing'
+
+			# "your tip"
+			if parsed.tipping_comment_id:
+				self.tipping_comment_id = RedditTip.sanitizeID(parsed.tipping_comment_id)
+				reference = self.tipping_comment_id
+
+			# ... has (not) linked ... Bitcoin Cash (BCH) to <address>
+			if parsed.recipient_address:
+				self.username = parsed.username
+				self.acceptance_status = parsed.acceptance_status
+				self.recipient_address = Address.from_cashaddr_string(parsed.recipient_address)
+
+			# stealth: "for their <post|comment> (...)"
+			if parsed.stealth_content_type:
+				self.setAmount()
+				self.chaintip_confirmation_status = '<stealth>'
+				self.subreddit_str = parsed.stealth_subreddit
+				self.tippee_content_link = parsed.stealth_content_link
+				if parsed.stealth_content_type == 'comment':
+					self.tippee_comment_id = RedditTip.sanitizeID(parsed.stealth_comment_id)
+					reference = self.tippee_comment_id
+				if parsed.stealth_content_type == 'post':
+					self.tippee_post_id = RedditTip.sanitizeID(parsed.stealth_post_id)
+					reference = self.tippee_post_id
 
 			if reference:
-				# associate possible already-parsed claim/return message
-				claim_return_list = self.reddit.unassociated_claim_return_by_tipping_comment_id[reference]
-				if len(claim_return_list) > 0:
-					for claim_return in claim_return_list:
-						self.setAcceptanceOrConfirmationStatus(claim_return["message"], claim_return["action"], claim_return["claim_return_txid"])
-
-				# associate possible confirmation comment
-				confirmation = self.reddit.unassociated_chaintip_comments_by_tipping_comment_id.pop(self.tipping_comment_id, None)
-				if confirmation:
-					self.chaintip_confirmation_status = confirmation["status"]
-					self.chaintip_confirmation_comment = confirmation["comment"]
+				self.associatePending(reference)
 
 			# copy values to top level
 			self.chaintip_message_id = self.chaintip_message.id
@@ -1010,7 +1214,24 @@ class RedditTip(Tip):
 
 			return True
 
-	def setAcceptanceOrConfirmationStatus(self, claim_or_returned_message, action, claim_return_txid):
+	def associatePending(self, reference = None):
+		"""apply claim/return messages and confirmation comment that arrived before this tip"""
+		if reference is None:
+			reference = self.getReference()
+
+		# associate possible already-parsed claim/return message
+		for claim_return in self.reddit.pending_associations.popClaims(reference):
+			self.setAcceptanceOrConfirmationStatus(claim_return["message_id"], claim_return["action"], claim_return["claim_return_txid"])
+
+		# associate possible confirmation comment
+		if self.tipping_comment_id:
+			confirmation = self.reddit.pending_associations.popConfirmation(self.tipping_comment_id)
+			if confirmation:
+				self.chaintip_confirmation_status = confirmation["status"]
+				self.chaintip_confirmation_comment_link = confirmation["comment_link"]
+				self.update()
+
+	def setAcceptanceOrConfirmationStatus(self, claim_or_returned_message_id, action, claim_return_txid):
 		if self.acceptance_status in ("received", "claimed", "returned"):
 			self.update()
 			return
@@ -1018,8 +1239,7 @@ class RedditTip(Tip):
 			self.update()
 			return
 		self.acceptance_status = action
-		self.claim_or_returned_message = claim_or_returned_message
-		self.claim_or_returned_message_id = claim_or_returned_message.id
+		self.claim_or_returned_message_id = claim_or_returned_message_id
 		self.claim_return_txid = claim_return_txid
 		self.update()
 
@@ -1027,102 +1247,74 @@ class RedditTip(Tip):
 	def fetchTippingComment(self):
 		# fetch tipping comment
 		if self.tipping_comment_id and (not hasattr(self, "tipping_comment") or not self.tipping_comment) and self.chaintip_message_created_utc >= RedditTip.CHAINTIP_TIPPING_COMMENT_LINK_INTRODUCTION_TIME:
-			self.tipping_comment = self.reddit.reddit.comment(id = self.tipping_comment_id[3:])
-			self.parseTippingComment(self.tipping_comment)
+			self.parseTippingComment(self.reddit.reddit.comment(id = self.tipping_comment_id[3:]))
 			self.update()
 
 
-	p_tip_amount_unit = re.compile('.*u/chaintip\s*((\S*)\s*(\w*))', re.MULTILINE | re.DOTALL)
-	p_tip_prefix_symbol_decimal = re.compile('.*u/chaintip (.) ?(\d+\.?\d*).*', re.MULTILINE | re.DOTALL)
-	def parseTippingComment(self, comment):
+	def parseTippingComment(self, comment, parent = None):
+		"""
+			parent: the (prefetched) parent comment or submission, lazily fetched if None.
+			tipping_comment is only set if parsing succeeds, so a failed parse leaves the tip eligible for refetch.
+		"""
 		#self.print_error("got tipping comment:", comment.body)
-		self.tipping_comment = comment
+		if parent is None:
+			parent = comment.parent()
 
 		# set tippee_coment_id and tippee_content_link
 		if not self.tippee_comment_id:
-			self.tippee_comment_id = self.tipping_comment.parent().id
-		self.tippee_content_link = self.tipping_comment.parent().permalink
+			self.tippee_comment_id = parent.id
+		self.tippee_content_link = parent.permalink
 
-		self.subreddit_str = "r/" + self.tipping_comment.subreddit.display_name
+		self.subreddit_str = "r/" + comment.subreddit.display_name
 		self.tip_unit = ''
 
-		# match u/chaintip <prefix_symbol> <decimal>
-		m = RedditTip.p_tip_prefix_symbol_decimal.match(self.tipping_comment.body)
-		if m:
-			try:
-				prefix_symbol = m.group(1)
-				amount = m.group(2)
-				self.tip_amount_text = prefix_symbol + amount
-				#self.print_error("parsed <prefix_symbox><decimal>: ", prefix_symbol, amount)
-				self.tip_quantity = Decimal(amount)
-				self.tip_unit = amount_config["prefix_symbols"][prefix_symbol]
-				if not self.isPaid():
-					self.evaluateAmount()
-			except Exception as e:
-				self.print_error("Failed to parse tip amount <prefix_symbol><decimal>: ", repr(e))
-				#traceback.print_exc()
-
-		# match u/chaintip <amount> <unit>
-		if self.tip_unit == '':
-			m = RedditTip.p_tip_amount_unit.match(self.tipping_comment.body)
-			if m:
-				try:
-					if not m.group(3): # <tip_unit>
-						self.tip_unit = m.group(3)
-						self.tip_quantity = Decimal("1")
-					else: # <tip_quantity> <tip_unit>
-						try:
-							self.tip_quantity = amount_config["quantity_aliases"][m.group(2)]
-						except Exception as e:
-							self.tip_quantity = Decimal(m.group(2))
-						self.tip_unit = m.group(3)
-						# <onchain_message>
-						# if m.lastindex >= 3:
-						# 	self.tip_op_return = m.group(3)
-					if not self.isPaid():
-						self.evaluateAmount()
-					self.tip_amount_text = f"{self.tip_quantity} {self.tip_unit}"
-				except Exception as e:
-					self.print_error("Failed to parse tip amount <amount> <unit>: ", repr(e))
-					#traceback.print_exc()
-					if not self.isPaid():
-						self.setAmount()
-			else: # use default amount
-				if not self.isPaid():
-					self.setAmount()
+		amount = amount_parser.parseAmount(comment.body, RateCache.get_instance().currencies())
+		if isinstance(amount, amount_parser.Amount):
+			self.tip_amount_text = amount.text
+			self.tip_quantity = amount.quantity
+			self.tip_unit = amount.unit
+			if not self.isPaid():
+				self.evaluateAmount()
+		else: # use default amount
+			if isinstance(amount, amount_parser.UnparseableAmount):
+				self.print_error(f"unparseable tip amount '{amount.text}' ({amount.reason}), using default amount")
+			if not self.isPaid():
+				self.setAmount()
+		self.tipping_comment = comment
 		self.update()
 
 	def setAmount(self, amount_bch: Decimal = None): 
 		"""
-			sets amount_bch and payment_status = 'amount set'
+			sets amount_bch and payment state 'amount set'
 			if amount_bch==None: use default amount
 		"""
-		if amount_bch:
-			self.default_amount_used = False
-			self.amount_bch = amount_bch
-		else:
-			self.default_amount_used = True
-			self.amount_bch = self.getDefaultAmountBCH()
-		if self.amount_bch and not self.isPaid():
-			self.payment_status = 'amount set'
-			self.amount_set_time = time()
+		if not amount_bch:
+			default_amount_bch = self.getDefaultAmountBCH()
+		with self.lock: # amount and state change together (autopay pays amount_bch of tips in READY_TO_PAY)
+			if self.payment_state == PaymentState.AUTOPAYING:
+				return
+			if amount_bch:
+				self.default_amount_used = False
+				self.amount_bch = amount_bch
+			else:
+				self.default_amount_used = True
+				self.amount_bch = default_amount_bch
+			if self.amount_bch and not self.isPaid():
+				self.setPaymentState(PaymentState.AMOUNT_SET)
 		self.update()
 
 	def evaluateAmount(self):
-		# find unit from amount config
-		matching_units = (unit for unit in amount_config["units"] if self.tip_unit in unit["names"])
-		unit = next(matching_units, None)
-		if unit:
+		# unit from amount config or tip_unit as currency
+		unit = amount_parser.resolveUnit(self.tip_unit, RateCache.get_instance().currencies())
+		try:
+			if unit is None:
+				raise Exception(f"unknown unit '{self.tip_unit}'")
 			rate = self.getRate(unit["value_currency"])
 			amount_bch = round(self.tip_quantity * unit["value"] / rate, 8)
 			self.setAmount(amount_bch = amount_bch)
-			#self.print_error("found unit", unit, "value", unit["value"], "quantity", self.tip_quantity, "rate", rate)
-		else:		
-			# try tip_unit as currency 
-			rate = self.getRate(self.tip_unit)
-			amount_bch = round(self.tip_quantity / rate, 8)
-			#self.print_error("rate for tip_unit", self.tip_unit, ": ", rate)
-			self.setAmount(amount_bch = amount_bch)
+		except Exception as e:
+			self.print_error("evaluateAmount() failed, using default amount: ", repr(e))
+			self.setAmount()
 
 			
 	def getDefaultAmountBCH(self):
@@ -1141,20 +1333,8 @@ class RedditTip(Tip):
 			return None
 
 	def getRate(self, ccy: str):
-		ccy = ccy.upper()
-		if ccy == 'BCH':
-			rate = Decimal("1.0")
-		else:
-			exchanges_by_ccy = get_exchanges_by_ccy(False)
-			exchanges = exchanges_by_ccy[ccy]
-			fx = self.reddit.wallet_ui.window.fx
-			if type(fx.exchange).__name__ in exchanges:
-				exchange = fx.exchange
-			else:
-				exchange_name = exchanges[0]
-				klass = globals()[exchange_name]
-				exchange = klass(None, None)
-			rate = exchange.get_rates(ccy)[ccy]
-		return rate
+		"""get rate from shared RateCache, remembering ccy so rate changes can re-price this tip"""
+		self.rate_currency = ccy.upper()
+		return RateCache.get_instance().getRate(ccy, self.reddit.wallet_ui.window.fx)
 
 
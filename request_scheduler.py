@@ -0,0 +1,168 @@
+import random
+import threading
+from contextlib import contextmanager
+from time import time, sleep
+
+from electroncash.util import PrintError
+
+from . import prawcore
+
+class RequestScheduler(PrintError):
+	"""
+		RequestScheduler
+		gate for all reddit API requests (installed into praw through ScheduledRequestor).
+		Tracks the budget reddit reports in the X-Ratelimit-Remaining/Used/Reset headers and
+		lets a request through while the remaining budget exceeds the reserve of its priority
+		class (set per thread with priority()), so lower classes leave budget for higher ones
+		and nobody runs into the limit. 429 and 5xx responses (and failed connections) cause a
+		jittered exponential backoff for all classes.
+	"""
+
+	INTERACTIVE = 0 # inbox polling, mark read, user actions
+	SYNC = 1 # import and catch-up
+	BACKGROUND = 2 # tipping comment fetching
+
+	RESERVE_FRACTIONS = {INTERACTIVE: 0.0, SYNC: 0.05, BACKGROUND: 0.2} # share of the window budget kept for higher classes
+	BACKOFF_BASE_SECS = 2
+	BACKOFF_MAX_SECS = 300
+	WAIT_STEP_SECS = 0.1
+
+	def __init__(self, should_quit = lambda: False):
+		self.should_quit = should_quit
+		self.lock = threading.Lock()
+		self.thread_local = threading.local()
+		self.remaining = None # requests left in current window (None: unknown)
+		self.used = None
+		self.reset_time = None # end of current window
+		self.backoff_until = 0
+		self.failure_count = 0 # consecutive 429/5xx/connection failures
+
+		# stats
+		self.request_count = 0
+		self.backoff_count = 0
+		self.wait_secs = 0.0
+
+	def debug_stats(self):
+		budget = self.budget()
+		return f"RequestScheduler: {self.request_count} requests, remaining {budget['remaining']} (used {budget['used']}, reset in {budget['reset_in']:.0f}s), {self.backoff_count} backoffs (backoff {budget['backoff_in']:.0f}s left), waited {self.wait_secs:.0f}s"
+
+	def budget(self):
+		"""current rate limit budget as reported by reddit"""
+		with self.lock:
+			self.expireWindow()
+			now = time()
+			return {
+				"remaining": self.remaining,
+				"used": self.used,
+				"reset_in": max(0, self.reset_time - now) if self.reset_time else 0,
+				"backoff_in": max(0, self.backoff_until - now),
+			}
+
+	@contextmanager
+	def priority(self, priority_class: int):
+		"""requests made by this thread inside the with-block use priority_class"""
+		previous = getattr(self.thread_local, "priority_class", RequestScheduler.INTERACTIVE)
+		self.thread_local.priority_class = priority_class
+		try:
+			yield
+		finally:
+			self.thread_local.priority_class = previous
+
+	def currentPriority(self):
+		return getattr(self.thread_local, "priority_class", RequestScheduler.INTERACTIVE)
+
+	def expireWindow(self):
+		"""forget budget of a window that has been reset (caller holds lock)"""
+		if self.reset_time and time() >= self.reset_time:
+			self.remaining = self.used = self.reset_time = None
+
+	def reserve(self, priority_class: int):
+		"""requests to leave for higher classes (caller holds lock)"""
+		window = (self.remaining or 0) + (self.used or 0)
+		return int(window * RequestScheduler.RESERVE_FRACTIONS[priority_class])
+
+	def hasBudget(self, priority_class: int = None):
+		"""True if a request of priority_class (default: current thread's) could be made now"""
+		return self.waitTime(self.currentPriority() if priority_class is None else priority_class) == 0
+
+	def waitTime(self, priority_class: int):
+		with self.lock:
+			self.expireWindow()
+			now = time()
+			if self.backoff_until > now:
+				return self.backoff_until - now
+			if self.remaining is not None and self.remaining <= self.reserve(priority_class):
+				return max(self.reset_time - now, RequestScheduler.WAIT_STEP_SECS)
+			return 0
+
+	def acquire(self):
+		"""block until the current thread's priority class may make a request, then count it"""
+		priority_class = self.currentPriority()
+		t0 = time()
+		while not self.should_quit():
+			with self.lock:
+				self.expireWindow()
+				now = time()
+				if self.backoff_until <= now and (self.remaining is None or self.remaining > self.reserve(priority_class)):
+					if self.remaining is not None:
+						self.remaining -= 1 # until reddit tells us again
+					self.request_count += 1
+					break
+			sleep(RequestScheduler.WAIT_STEP_SECS)
+		with self.lock:
+			self.wait_secs += time() - t0
+
+	def responseReceived(self, response):
+		status = response.status_code
+		headers = response.headers
+		with self.lock:
+			try:
+				if "x-ratelimit-remaining" in headers:
+					self.remaining = int(float(headers["x-ratelimit-remaining"]))
+					self.used = int(float(headers.get("x-ratelimit-used", 0)))
+					self.reset_time = time() + int(float(headers["x-ratelimit-reset"]))
+			except ValueError as e:
+				self.print_error("unparseable ratelimit headers: ", repr(e))
+			if status == 429 or status >= 500:
+				self.backoff(self.reset_time if status == 429 else None)
+			else:
+				self.failure_count = 0
+
+	def requestFailed(self, e: Exception):
+		"""connection level failure (no response)"""
+		with self.lock:
+			self.backoff()
+
+	def backoff(self, not_before: float = None):
+		"""start jittered exponential backoff (caller holds lock)"""
+		self.failure_count += 1
+		self.backoff_count += 1
+		delay = min(RequestScheduler.BACKOFF_BASE_SECS * 2 ** (self.failure_count - 1), RequestScheduler.BACKOFF_MAX_SECS)
+		until = time() + delay * random.uniform(0.5, 1.5)
+		if not_before:
+			until = max(until, not_before)
+		self.backoff_until = max(self.backoff_until, until)
+		self.print_error(f"backing off for {self.backoff_until - time():.1f}s after {self.failure_count} failures")
+
+class ScheduledRequestor(prawcore.Requestor):
+	"""
+		prawcore Requestor passing every request through a RequestScheduler.
+		Requests are serialized (praw isn't thread-safe, but inbox polling, tipping comment
+		fetching and import share one praw.Reddit instance).
+	"""
+
+	def __init__(self, *args, scheduler: RequestScheduler = None, **kwargs):
+		super().__init__(*args, **kwargs)
+		self.scheduler = scheduler
+		self.lock = threading.RLock()
+
+	def request(self, *args, **kwargs):
+		self.scheduler.acquire()
+		try:
+			with self.lock:
+				response = super().request(*args, **kwargs)
+		except prawcore.exceptions.RequestException as e:
+			self.scheduler.requestFailed(e)
+			raise
+		self.scheduler.responseReceived(response)
+		return response
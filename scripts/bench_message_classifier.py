@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+	micro-benchmark for message_classifier: per-item cost on typical chaintip items
+	compared to the previous chained DOTALL regexes, and worst-case time on adversarial
+	multi-KB bodies. Checks that both approaches agree on the typical items.
+
+	usage: scripts/bench_message_classifier.py [--legacy-adversarial]
+	(legacy patterns on adversarial bodies can take minutes, so they're skipped by default)
+"""
+
+import importlib.util
+import os
+import re
+import sys
+import time
+
+spec = importlib.util.spec_from_file_location("message_classifier", os.path.join(os.path.dirname(__file__), "..", "message_classifier.py"))
+mc = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(mc)
+
+# --- previous implementation (as in reddit.py before the classifier) ---
+
+legacy = {
+	"claimed_subject": re.compile('Tip claimed.'),
+	"returned_subject": re.compile('Tip returned to you.'),
+	"funded_subject": re.compile('Tip funded.'),
+	"claimed_or_returned_message": re.compile('Your \\[tip\\]\\(.*_/(\\S*)\\) of (\\d*\\.\\d*) Bitcoin Cash.*to u/(\\S*).* has \\[been (\\S*)\\]\\(.*/(\\w*)\\).*', re.MULTILINE | re.DOTALL),
+	"various_messages": re.compile('Your tip to u/(\\S*) for their \\[(.*)\\]\\(.*/(\\w*)/(\\w*)/\\).*of (\\d*\\.\\d*) Bitcoin Cash.*has \\[been (\\S*)\\].*', re.MULTILINE | re.DOTALL),
+	"confirmation_comment_please_claim": re.compile('.*u/(\\S*), you\'ve \\[been sent\\]\\(.*/(bitcoincash:\\w*)\\).*Please \\[claim it!\\].*', re.MULTILINE | re.DOTALL),
+	"confirmation_comment": re.compile('.*u/(\\S*), you\'ve \\[been sent\\]\\(.*/(bitcoincash:\\w*)\\).*', re.MULTILINE | re.DOTALL),
+	"confirmation_comment_claimed": re.compile('.*u/(\\S*).*has \\[claimed\\].*', re.MULTILINE | re.DOTALL),
+	"confirmation_comment_returned": re.compile('.*\\[chaintip\\].* has \\[returned\\]\\(.*/(bitcoincash:\\w*)\\).*', re.MULTILINE | re.DOTALL),
+	"subject_outgoing_tip": re.compile('Tip (\\S*)'),
+	"tip_comment": re.compile('.*\\[your tip\\]\\(\\S*/_/(\\S*)\\).*', re.MULTILINE | re.DOTALL),
+	"recipient_acceptance": re.compile('^u/(\\S*) has (.*linked).*?Bitcoin Cash \\(BCH\\) to: \\*\\*(bitcoincash:q\\w*)\\*\\*.*', re.MULTILINE | re.DOTALL),
+	"sender": re.compile('^u/(\\S*) has just sent you (\\S*) Bitcoin Cash \\(about \\S* USD\\) \\[via\\]\\(\\S*/_/(\\S*)\\) .*', re.MULTILINE | re.DOTALL),
+	"stealth": re.compile('.*Tip \\*\\*.*\\*\\* for their \\[(\\w*)\\]\\((/(r/\\w*)/\\S*/(\\w*)/(\\w*)/)\\).*', re.MULTILINE | re.DOTALL),
+}
+
+def legacy_classify_message(subject, body):
+	p = legacy
+	if p["claimed_subject"].match(subject) or p["returned_subject"].match(subject) or p["funded_subject"].match(subject):
+		m = p["claimed_or_returned_message"].match(body)
+		if m:
+			return ("claim", m.group(4), m.group(3), m.group(2), None, m.group(1), m.group(5))
+		m = p["various_messages"].match(body)
+		if m:
+			if m.group(2) == 'post':
+				reference, confirmation_comment_id = m.group(3), None
+			elif m.group(2) == 'comment':
+				reference, confirmation_comment_id = m.group(4), None
+			else:
+				reference, confirmation_comment_id = None, m.group(4)
+			return ("claim", m.group(6), m.group(1), m.group(5), reference, confirmation_comment_id, None)
+		if subject in ("Tip funded.", "Tip claimed."):
+			return None
+	if subject == "You've been tipped!":
+		m = p["sender"].match(body)
+		return ("incoming", m.group(1), m.group(2)) if m else None
+	if p["subject_outgoing_tip"].match(subject):
+		m = p["tip_comment"].match(body)
+		tipping_comment_id = m.group(1) if m else None
+		username = acceptance_status = recipient_address = None
+		m = p["recipient_acceptance"].match(body)
+		if m:
+			username, acceptance_status, recipient_address = m.group(1), 'not yet linked' if m.group(2) == "not yet linked" else 'linked', m.group(3)
+		m = p["stealth"].match(body)
+		stealth = (m.group(1), m.group(2), m.group(3), m.group(4), m.group(5)) if m else (None,) * 5
+		return ("outgoing", tipping_comment_id, username, acceptance_status, recipient_address) + stealth
+	return None
+
+def legacy_classify_comment(body):
+	p = legacy
+	status = None
+	if p["confirmation_comment"].match(body): status = 'confirmed'
+	if p["confirmation_comment_please_claim"].match(body): status = 'unclaimed'
+	if p["confirmation_comment_claimed"].match(body): status = 'claimed'
+	if p["confirmation_comment_returned"].match(body): status = 'returned'
+	return status
+
+def classify_message(subject, body):
+	r = mc.classifyMessage(subject, body)
+	if isinstance(r, mc.ClaimReturn):
+		return ("claim",) + tuple(r)
+	if isinstance(r, mc.IncomingTip):
+		return ("incoming",) + tuple(r)
+	if isinstance(r, mc.OutgoingTip):
+		return ("outgoing",) + tuple(r)
+	return None
+
+def classify_comment(body):
+	r = mc.classifyComment(body)
+	return r.status if r else None
+
+# --- sample items ---
+
+FOOTER = "\n\n***\n\n^(chaintip is a bot that lets you tip with Bitcoin Cash.) [^(what is chaintip?)](https://www.chaintip.org) ^| [^(stealth mode)](https://www.chaintip.org/#stealth)"
+ADDRESS = "bitcoincash:qrelay8kxyaz2zaq7gyyh6tqvf07s6r2mcj7zlmlsn"
+TXID = "a" * 64
+
+messages = [
+	("Tip claimed.", f"Your [tip](https://www.reddit.com/r/btc/comments/abc123/_/def456) of 0.00123456 Bitcoin Cash (about 0.50 USD) to u/someone has [been claimed](https://explorer.bitcoin.com/bch/tx/{TXID})." + FOOTER),
+	("Tip returned to you.", f"Your [tip](https://www.reddit.com/r/btc/comments/abc123/_/ghi789) of 0.01 Bitcoin Cash (about 3.20 USD) to u/other_user has [been returned](https://explorer.bitcoin.com/bch/tx/{TXID})." + FOOTER),
+	("Tip returned to you.", "Your tip to u/someone for their [post](https://www.reddit.com/r/btc/comments/abc123/some_title/) of 0.001 Bitcoin Cash (about 0.30 USD) has [been returned](https://explorer.bitcoin.com/bch/tx/" + TXID + ")." + FOOTER),
+	("Tip claimed.", "Your tip to u/someone for their [comment](https://www.reddit.com/r/btc/comments/abc123/some_title/xyz987/) of 0.001 Bitcoin Cash (about 0.30 USD) has [been claimed](https://explorer.bitcoin.com/bch/tx/" + TXID + ")." + FOOTER),
+	("Tip funded.", "Your tip to u/someone for their [tip](https://www.reddit.com/r/btc/comments/abc123/_/conf01/) of 0.001 Bitcoin Cash (about 0.30 USD) has [been funded](https://explorer.bitcoin.com/bch/tx/" + TXID + ")." + FOOTER),
+	("Tip pending.", f"u/someone has not yet linked an address. Your [your tip](https://www.reddit.com/r/btc/comments/abc123/_/def456) of 0.001 Bitcoin Cash (BCH) to: **{ADDRESS}** will be returned in 7 days." + FOOTER),
+	("Tip pending.", f"u/someone has linked an address. Please send 0.001 Bitcoin Cash (BCH) to: **{ADDRESS}**\n\n[your tip](https://www.reddit.com/r/btc/comments/abc123/_/def456)" + FOOTER),
+	("Tip pending.", f"u/someone has linked an address.\n\nTip **0.001 BCH** for their [comment](/r/btc/comments/abc123/some_title/xyz987/) by sending Bitcoin Cash (BCH) to: **{ADDRESS}**" + FOOTER),
+	("Tip pending.", f"u/someone has not yet linked an address.\n\nTip **0.001 BCH** for their [post](/r/btc/comments/abc123/some_title/) by sending Bitcoin Cash (BCH) to: **{ADDRESS}**" + FOOTER),
+	("You've been tipped!", "u/generous has just sent you 0.0042 Bitcoin Cash (about 1.50 USD) [via](https://www.reddit.com/r/btc/comments/abc123/_/def456) this comment." + FOOTER),
+	("Trying to tip yourself?", "Unfortunately, this bot is unable to understand your message." + FOOTER),
+]
+
+comments = [
+	f"u/someone, you've [been sent](https://explorer.bitcoin.com/bch/address/{ADDRESS}) `0.001 BCH` | ~0.30 USD by u/me" + FOOTER,
+	f"u/someone, you've [been sent](https://explorer.bitcoin.com/bch/address/{ADDRESS}) `0.001 BCH` | ~0.30 USD by u/me\n\nPlease [claim it!](https://www.reddit.com/message/compose?to=chaintip)" + FOOTER,
+	f"u/someone has [claimed](https://explorer.bitcoin.com/bch/tx/{TXID}) the `0.001 BCH` | ~0.30 USD sent by u/me" + FOOTER,
+	f"The tip to u/someone has [returned](https://explorer.bitcoin.com/bch/address/{ADDRESS}) to u/me.\n\n[chaintip](https://www.chaintip.org) has [returned](https://explorer.bitcoin.com/bch/address/{ADDRESS})" + FOOTER,
+	"this is not a chaintip comment" + FOOTER,
+]
+
+def adversarial_bodies(size):
+	"""bodies that repeat the fragments the legacy patterns backtrack over, without completing a match"""
+	return [
+		("Tip claimed.", "Your [tip](" + "_/x) of 1.0 Bitcoin Cash to u/a " * (size // 30)),
+		("Tip claimed.", "Your tip to u/a for their [" + "](/a/b/) of 1.0 Bitcoin Cash has [been " * (size // 50)),
+		("Tip pending.", "u/a has " + "linked " * (size // 7)),
+		("Tip pending.", "Tip **" + "** for their [" * (size // 14)),
+		("Tip pending.", "[your tip](" + "/_/x" * (size // 4)),
+		("You've been tipped!", "u/a has just sent you 1 Bitcoin Cash (about 1 USD) [via](" + "/_/x" * (size // 4)),
+		("Tip claimed.", "Your [tip](" + "_/_/" * (size // 4)),
+		(None, "u/a, you've [been sent](" * (size // 24)),
+		(None, "u/a " * (size // 4)),
+		(None, "[chaintip] has [returned](" * (size // 26)),
+	]
+
+def timeit(f, n):
+	t0 = time.perf_counter()
+	for _ in range(n):
+		f()
+	return (time.perf_counter() - t0) / n
+
+def main():
+	# agreement on typical items
+	disagreements = 0
+	for subject, body in messages:
+		if classify_message(subject, body) != legacy_classify_message(subject, body):
+			disagreements += 1
+			print("DISAGREE:", subject, "\n  new:", classify_message(subject, body), "\n  old:", legacy_classify_message(subject, body))
+	for body in comments:
+		if classify_comment(body) != legacy_classify_comment(body):
+			disagreements += 1
+			print("DISAGREE:", body[:60], classify_comment(body), legacy_classify_comment(body))
+	print(f"{len(messages)} messages, {len(comments)} comments, {disagreements} disagreements")
+
+	# per-item cost on typical items
+	n = 2000
+	new_cost = timeit(lambda: [classify_message(s, b) for s, b in messages] + [classify_comment(b) for b in comments], n) / (len(messages) + len(comments))
+	old_cost = timeit(lambda: [legacy_classify_message(s, b) for s, b in messages] + [legacy_classify_comment(b) for b in comments], n) / (len(messages) + len(comments))
+	print(f"typical item: classifier {new_cost * 1e6:.1f} us, legacy regexes {old_cost * 1e6:.1f} us")
+
+	# worst case on adversarial bodies
+	run_legacy = "--legacy-adversarial" in sys.argv
+	for size in (1024, 4096, 16384):
+		worst_new = worst_old = 0.0
+		for subject, body in adversarial_bodies(size):
+			if subject is None:
+				worst_new = max(worst_new, timeit(lambda: classify_comment(body), 3))
+				if run_legacy or size <= 1024:
+					worst_old = max(worst_old, timeit(lambda: legacy_classify_comment(body), 1))
+			else:
+				worst_new = max(worst_new, timeit(lambda: classify_message(subject, body), 3))
+				if run_legacy or size <= 1024:
+					worst_old = max(worst_old, timeit(lambda: legacy_classify_message(subject, body), 1))
+		old_str = f"{worst_old * 1e3:.1f} ms" if worst_old else "skipped"
+		print(f"adversarial {size // 1024:>2} KiB body: classifier worst {worst_new * 1e3:.2f} ms, legacy regexes worst {old_str}")
+
+	return 1 if disagreements else 0
+
+if __name__ == "__main__":
+	sys.exit(main())
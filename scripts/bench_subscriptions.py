@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+	benchmark for subscribing to N tip recipient scripthashes: one subscribe call per tip
+	(as BlockchainWatcher.tipUpdated() used to do, recomputing the scripthash each time)
+	compared to SubscriptionBatcher chunks with scripthashes cached on the tip.
+
+	Client side cost (scripthash computation, building and queueing JSON-RPC messages under
+	a lock, like electroncash's Network.send()) is measured. Time to full subscription adds
+	a simulated server: requests are pipelined, each call costs a round trip plus a fixed
+	per-batch overhead, and each subscription a per-item cost on a single server session.
+
+	usage: scripts/bench_subscriptions.py [n] [rtt_ms] [batch_overhead_ms] [item_us]
+	       (defaults: 10000 100 2 50)
+"""
+
+import hashlib
+import importlib.util
+import json
+import os
+import queue
+import sys
+import threading
+import time
+
+spec = importlib.util.spec_from_file_location("subscription_batcher", os.path.join(os.path.dirname(__file__), "..", "subscription_batcher.py"))
+sb = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(sb)
+
+n = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+rtt = (float(sys.argv[2]) if len(sys.argv) > 2 else 100) / 1000
+batch_overhead = (float(sys.argv[3]) if len(sys.argv) > 3 else 2) / 1000
+item_cost = (float(sys.argv[4]) if len(sys.argv) > 4 else 50) / 1000000
+
+def scripthash_hex(script: bytes):
+	return hashlib.sha256(script).digest()[::-1].hex()
+
+scripts = [bytes.fromhex("76a914") + hashlib.sha256(i.to_bytes(4, "little")).digest()[:20] + bytes.fromhex("88ac") for i in range(n)]
+
+class FakeNetwork:
+	"""queues JSON-RPC messages like Network.send(), records (send time, batch size) per call"""
+
+	def __init__(self):
+		self.lock = threading.Lock()
+		self.message_id = 0
+		self.queue = queue.Queue()
+		self.calls = []
+
+	def subscribe_to_scripthashes(self, scripthashes, callback=None):
+		with self.lock:
+			for scripthash in scripthashes:
+				self.message_id += 1
+				self.queue.put(json.dumps({"id": self.message_id, "method": "blockchain.scripthash.subscribe", "params": [scripthash]}))
+			self.calls.append((time.perf_counter(), len(scripthashes)))
+
+def completionTime(calls, t0):
+	"""simulated time until the server answered all calls"""
+	server_free = 0.0
+	done = 0.0
+	for send_time, size in calls:
+		arrival = send_time - t0 + rtt / 2
+		server_free = max(server_free, arrival) + batch_overhead + size * item_cost
+		done = server_free + rtt / 2
+	return done
+
+def perTip():
+	network = FakeNetwork()
+	t0 = time.perf_counter()
+	for script in scripts:
+		network.subscribe_to_scripthashes([scripthash_hex(script)])
+	return time.perf_counter() - t0, completionTime(network.calls, t0), len(network.calls)
+
+def batched(cached_scripthashes):
+	network = FakeNetwork()
+	batcher = sb.SubscriptionBatcher(network.subscribe_to_scripthashes)
+	t0 = time.perf_counter()
+	for scripthash in cached_scripthashes:
+		batcher.add(scripthash)
+	batcher.flush("server")
+	return time.perf_counter() - t0, completionTime(network.calls, t0), len(network.calls)
+
+def resubscribe(cached_scripthashes):
+	network = FakeNetwork()
+	batcher = sb.SubscriptionBatcher(network.subscribe_to_scripthashes)
+	for scripthash in cached_scripthashes:
+		batcher.add(scripthash)
+	batcher.flush("server_a")
+	network.calls = []
+	t0 = time.perf_counter()
+	batcher.flush("server_b")
+	return time.perf_counter() - t0, completionTime(network.calls, t0), len(network.calls)
+
+cached_scripthashes = [scripthash_hex(script) for script in scripts] # computed once, then stored with the tip
+
+print(f"{n} scripthashes, rtt {rtt * 1000:.0f}ms, server {batch_overhead * 1000:.1f}ms/batch + {item_cost * 1000000:.0f}us/item")
+for name, f in (("per tip", perTip), ("batched", lambda: batched(cached_scripthashes)), ("resubscribe after switch", lambda: resubscribe(cached_scripthashes))):
+	client_secs, full_secs, calls = f()
+	print(f"{name:>25}: {calls:6d} calls, client {client_secs * 1000:8.1f}ms, full subscription {full_secs:6.2f}s")
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+	benchmark for reading (scripthash, satoshis) of transaction outputs as BlockchainWatcher.on_tx()
+	needs them: output_scripthashes() from tx_decoder.py, compared to electroncash's
+	Transaction(raw).outputs() with Address.to_scripthash_hex() (the previous path, only run
+	if electroncash is importable, e.g. with PYTHONPATH pointing to an Electron Cash checkout).
+
+	Transactions are synthetic batch payments: n_in P2PKH inputs, n_out P2PKH outputs.
+
+	usage: scripts/bench_tx_decoder.py [n_in] [repeat]
+	       (defaults: 5 20)
+"""
+
+import hashlib
+import importlib.util
+import os
+import sys
+import time
+
+spec = importlib.util.spec_from_file_location("tx_decoder", os.path.join(os.path.dirname(__file__), "..", "tx_decoder.py"))
+td = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(td)
+
+try:
+	from electroncash.address import Address
+	from electroncash.transaction import Transaction
+except ImportError:
+	Transaction = None
+
+n_in = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+def varint(n):
+	return bytes([n]) if n < 0xfd else b"\xfd" + n.to_bytes(2, "little")
+
+def p2pkh(i):
+	return bytes.fromhex("76a914") + hashlib.sha256(i.to_bytes(4, "little")).digest()[:20] + bytes.fromhex("88ac")
+
+def batchTx(n_out):
+	script_sig = bytes.fromhex("47") + bytes(71) + bytes.fromhex("21") + bytes.fromhex("02") + bytes(32)
+	inputs = b"".join(hashlib.sha256(bytes([i])).digest() + i.to_bytes(4, "little") + varint(len(script_sig)) + script_sig + b"\xff" * 4 for i in range(n_in))
+	outputs = b"".join((1000 + i).to_bytes(8, "little") + varint(25) + p2pkh(i) for i in range(n_out))
+	return ((1).to_bytes(4, "little") + varint(n_in) + inputs + varint(n_out) + outputs + bytes(4)).hex()
+
+def decoder(raw):
+	return [[scripthash.hex(), satoshis, n] for scripthash, satoshis, n in td.output_scripthashes(raw)]
+
+def transaction(raw):
+	return [[o[1].to_scripthash_hex(), o[2], n] for n, o in enumerate(Transaction(raw).outputs()) if isinstance(o[1], Address)]
+
+def timeIt(f, raw):
+	t0 = time.perf_counter()
+	for i in range(repeat):
+		result = f(raw)
+	return (time.perf_counter() - t0) / repeat, result
+
+print(f"{n_in} inputs, mean of {repeat} runs" + ("" if Transaction else " (electroncash not importable, decoder only)"))
+for n_out in (2, 100, 500, 2000):
+	raw = batchTx(n_out)
+	decoder_secs, decoded = timeIt(decoder, raw)
+	line = f"{n_out:5d} outputs ({len(raw) // 2:6d} bytes): decoder {decoder_secs * 1000:8.3f}ms ({decoder_secs / n_out * 1000000:5.2f}us/output)"
+	if Transaction:
+		transaction_secs, expected = timeIt(transaction, raw)
+		assert decoded == expected
+		line += f", Transaction {transaction_secs * 1000:8.3f}ms ({transaction_secs / decoder_secs:.1f}x)"
+	print(line)
@@ -0,0 +1,168 @@
+import base64
+import hashlib
+import json
+import math
+import threading
+import zlib
+from collections import deque
+from time import time
+
+from electroncash.util import PrintError
+
+from .config import c
+
+def fullname_to_int(fullname: str):
+	"""compact integer key for a reddit fullname like 't4_1a2b3c' (base36 id, kind in lowest digit)"""
+	try:
+		kind, id = fullname.split("_", 1)
+		return int(id, 36) * 10 + int(kind[1:])
+	except (ValueError, IndexError):
+		return int.from_bytes(hashlib.blake2b(fullname.encode("utf-8"), digest_size=8).digest(), "little")
+
+class BloomFilter:
+	"""bloom filter over integer keys, sized for capacity entries at the given false positive rate"""
+
+	def __init__(self, capacity: int, error_rate: float):
+		self.capacity = capacity
+		self.error_rate = error_rate
+		self.num_bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+		self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+		self.bits = bytearray((self.num_bits + 7) // 8)
+		self.count = 0
+
+	def positions(self, key: int):
+		h = hashlib.blake2b(key.to_bytes((key.bit_length() + 8) // 8, "little"), digest_size=16).digest()
+		h1 = int.from_bytes(h[:8], "little")
+		h2 = int.from_bytes(h[8:], "little") | 1
+		return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+	def add(self, key: int):
+		for p in self.positions(key):
+			self.bits[p >> 3] |= 1 << (p & 7)
+		self.count += 1
+
+	def __contains__(self, key: int):
+		return all(self.bits[p >> 3] & (1 << (p & 7)) for p in self.positions(key))
+
+	def clear(self):
+		self.bits = bytearray(len(self.bits))
+		self.count = 0
+
+	def to_dict(self):
+		return {
+			"capacity": self.capacity,
+			"error_rate": self.error_rate,
+			"count": self.count,
+			"bits": base64.b64encode(zlib.compress(bytes(self.bits))).decode("ascii"),
+		}
+
+	@classmethod
+	def from_dict(cls, d: dict):
+		bloom = cls(d["capacity"], d["error_rate"])
+		bits = zlib.decompress(base64.b64decode(d["bits"]))
+		if len(bits) != len(bloom.bits):
+			raise ValueError("bloom filter size mismatch")
+		bloom.bits = bytearray(bits)
+		bloom.count = d["count"]
+		return bloom
+
+class SeenItems(PrintError):
+	"""
+		SeenItems
+		compact set of reddit inbox item fullnames seen so far: an exact window of the
+		most recent WINDOW_SIZE items (as ints) backed by a bloom filter holding all of them.
+		The bloom filter can give false positives, so it should only be trusted where a
+		wrong "seen" answer is harmless or other evidence (e.g. the inbox cursor) agrees.
+		When the bloom filter exceeds its capacity, it is cleared.
+		The window is persisted separately from the bloom filter, so stores that can't hold
+		the filter still keep (a tail of) the window.
+	"""
+
+	WINDOW_SIZE = 10000
+	PERSIST_INTERVAL_SECS = 300
+
+	def __init__(self):
+		self.lock = threading.Lock()
+		self.window = set()
+		self.window_order = deque()
+		self.bloom = BloomFilter(c["seen_items_bloom_capacity"], c["seen_items_bloom_error_rate"])
+		self.dirty = False
+		self.persist_time = time()
+
+	def debug_stats(self):
+		return f"{len(self.window)} recent items, {self.bloom.count} items in bloom filter ({len(self.bloom.bits) // 1024} KiB)"
+
+	def add(self, fullname: str):
+		key = fullname_to_int(fullname)
+		with self.lock:
+			if key in self.window:
+				return
+			self.window.add(key)
+			self.window_order.append(key)
+			if len(self.window_order) > SeenItems.WINDOW_SIZE:
+				self.window.discard(self.window_order.popleft())
+			if self.bloom.count >= self.bloom.capacity:
+				self.print_error(f"bloom filter full ({self.bloom.count} items), clearing")
+				self.bloom.clear()
+			self.bloom.add(key)
+			self.dirty = True
+
+	def isRecent(self, fullname: str):
+		"""exact: item is among the WINDOW_SIZE most recently added"""
+		with self.lock:
+			return fullname_to_int(fullname) in self.window
+
+	def mightHaveSeen(self, fullname: str):
+		"""probabilistic: False means definitely not seen, True means seen (or a false positive)"""
+		key = fullname_to_int(fullname)
+		with self.lock:
+			return key in self.window or key in self.bloom
+
+	def loadWindow(self, d: dict):
+		"""restore persisted recent window (oldest first), also adding its items to the bloom filter"""
+		if not d:
+			return
+		try:
+			keys = json.loads(zlib.decompress(base64.b64decode(d["items"])))
+		except Exception as e:
+			self.print_error("discarding persisted seen items window: ", repr(e))
+			return
+		with self.lock:
+			for key in keys[-SeenItems.WINDOW_SIZE:]:
+				if key in self.window:
+					continue
+				self.window.add(key)
+				self.window_order.append(key)
+				if key not in self.bloom:
+					self.bloom.add(key)
+			while len(self.window_order) > SeenItems.WINDOW_SIZE:
+				self.window.discard(self.window_order.popleft())
+
+	def load(self, d: dict):
+		"""restore persisted bloom filter"""
+		if not d:
+			return
+		try:
+			bloom = BloomFilter.from_dict(d)
+		except Exception as e:
+			self.print_error("discarding persisted seen items: ", repr(e))
+			return
+		if bloom.capacity != self.bloom.capacity or bloom.error_rate != self.bloom.error_rate:
+			self.print_error("seen items bloom filter config changed, discarding persisted filter")
+			return
+		with self.lock:
+			self.bloom = bloom
+
+	def takePersistData(self, force: bool = False, window_size: int = WINDOW_SIZE, bloom: bool = True):
+		"""
+			returns (window dict, bloom filter dict or None) to persist if changed and PERSIST_INTERVAL_SECS
+			passed (or force), None otherwise. Only the window_size most recent items of the window are included.
+		"""
+		with self.lock:
+			if not self.dirty or (not force and time() - self.persist_time < SeenItems.PERSIST_INTERVAL_SECS):
+				return None
+			self.dirty = False
+			self.persist_time = time()
+			keys = list(self.window_order)[-window_size:] if window_size > 0 else []
+			window = {"items": base64.b64encode(zlib.compress(json.dumps(keys).encode("ascii"))).decode("ascii")}
+			return window, self.bloom.to_dict() if bloom else None
@@ -0,0 +1,67 @@
+import threading
+from collections import OrderedDict
+
+class SubscriptionBatcher:
+	"""
+		SubscriptionBatcher
+		collects scripthashes to subscribe to and passes them to subscribe(scripthashes)
+		(e.g. network.subscribe_to_scripthashes) in chunks of CHUNK_SIZE when flushed.
+		Remembers what is subscribed, so after a server switch all subscriptions are
+		re-established as one batch. Has no electroncash dependencies (see scripts/bench_subscriptions.py).
+	"""
+
+	CHUNK_SIZE = 500 # scripthashes per subscribe call
+
+	def __init__(self, subscribe):
+		self.subscribe = subscribe
+		self.lock = threading.Lock()
+		self.pending = OrderedDict() # scripthashes to subscribe (values unused)
+		self.subscribed = set()
+		self.server = None # server the subscriptions were made on
+		self.resubscribe_count = 0
+
+	def debug_stats(self):
+		return f"{len(self.subscribed)} subscribed, {len(self.pending)} pending, {self.resubscribe_count} resubscriptions after server switch"
+
+	def add(self, scripthash: str):
+		with self.lock:
+			if scripthash not in self.subscribed:
+				self.pending[scripthash] = None
+
+	def isSubscribed(self, scripthash: str):
+		with self.lock:
+			return scripthash in self.subscribed
+
+	def remove(self, scripthash: str):
+		"""forget scripthash (won't be resubscribed). Returns True if it was subscribed"""
+		with self.lock:
+			self.pending.pop(scripthash, None)
+			if scripthash in self.subscribed:
+				self.subscribed.discard(scripthash)
+				return True
+			return False
+
+	def flush(self, server):
+		"""subscribe pending scripthashes on server (None: not connected, keep pending). Returns list of subscribed scripthashes"""
+		if server is None:
+			return []
+		with self.lock:
+			if self.server is not None and server != self.server and len(self.subscribed) > 0:
+				self.resubscribe_count += 1
+				for scripthash in self.subscribed:
+					self.pending[scripthash] = None
+				self.subscribed.clear()
+			self.server = server
+			scripthashes = list(self.pending.keys())
+			self.pending.clear()
+			self.subscribed.update(scripthashes)
+		for i in range(0, len(scripthashes), SubscriptionBatcher.CHUNK_SIZE):
+			try:
+				self.subscribe(scripthashes[i:i + SubscriptionBatcher.CHUNK_SIZE])
+			except Exception:
+				with self.lock: # retry unsent ones on next flush
+					for scripthash in scripthashes[i:]:
+						self.subscribed.discard(scripthash)
+						self.pending[scripthash] = None
+				raise
+		return scripthashes
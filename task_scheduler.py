@@ -0,0 +1,138 @@
+import math
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from time import time, sleep
+
+from electroncash.util import PrintError
+
+class Task:
+	"""job run by TaskScheduler every interval_secs (None: only at start and when triggered)"""
+
+	def __init__(self, name: str, fn, interval_secs: float = None, warn_after_secs: float = 60, group: str = None):
+		self.name = name
+		self.fn = fn
+		self.interval_secs = interval_secs
+		self.warn_after_secs = warn_after_secs
+		self.group = group # tasks of the same group don't run concurrently
+		self.next_run_time = 0
+		self.not_before = 0 # backoff after failures
+		self.triggered = False
+		self.running_since = None
+		self.overdue_reported = False
+		self.failure_count = 0 # consecutive failures
+
+		# stats
+		self.run_count = 0
+		self.total_failure_count = 0
+		self.overdue_count = 0
+		self.total_secs = 0.0
+		self.max_secs = 0.0
+
+	def isDue(self, now: float):
+		return self.running_since is None and now >= self.not_before and (self.triggered or now >= self.next_run_time)
+
+class TaskScheduler(PrintError):
+	"""
+		TaskScheduler
+		runs periodic and event-triggered tasks on a pool of worker threads. Each task has its
+		own cadence and never overlaps with itself or other tasks of its group. A failing task
+		is retried with exponential backoff (up to MAX_BACKOFF_SECS) without affecting the
+		others. A task running longer than its warn_after_secs is reported while it runs and
+		counted as overdue in the stats; it isn't interrupted (threads can't be killed, and
+		releasing its group early would break the group's mutual exclusion), so only its own
+		group waits for it.
+	"""
+
+	MAX_BACKOFF_SECS = 300
+	TICK_SECS = 0.1
+
+	def __init__(self, name: str, should_quit = lambda: False, max_workers: int = 6):
+		self.name = name
+		self.should_quit = should_quit
+		self.max_workers = max_workers
+		self.lock = threading.Lock()
+		self.tasks = {} # by name
+		self.busy_groups = set()
+
+	def debug_stats(self):
+		now = time()
+		with self.lock:
+			lines = [
+				f"{task.name}: {task.run_count} runs, {task.total_failure_count} failed, {task.overdue_count} overdue, "
+				f"avg {task.total_secs / task.run_count * 1000 if task.run_count else 0:.0f}ms, max {task.max_secs * 1000:.0f}ms"
+				+ (f", overdue now (running for {now - task.running_since:.0f}s)" if task.overdue_reported else "")
+				for task in self.tasks.values()
+			]
+		return f"TaskScheduler {self.name}:\n" + "\n".join("                       " + line for line in lines)
+
+	def addTask(self, name: str, fn, interval_secs: float = None, warn_after_secs: float = 60, group: str = None):
+		with self.lock:
+			self.tasks[name] = Task(name, fn, interval_secs, warn_after_secs, group)
+
+	def trigger(self, name: str):
+		"""run task as soon as possible (again after current run, if running)"""
+		with self.lock:
+			self.tasks[name].triggered = True
+
+	def run(self):
+		"""dispatch tasks until should_quit(), then wait for running tasks to finish"""
+		executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=self.name)
+		try:
+			while not self.should_quit():
+				for task in self.takeDueTasks():
+					executor.submit(self.runTask, task)
+				self.checkOverdue()
+				sleep(TaskScheduler.TICK_SECS)
+		finally:
+			executor.shutdown(wait=True)
+
+	def takeDueTasks(self):
+		now = time()
+		due_tasks = []
+		with self.lock:
+			for task in self.tasks.values():
+				if task.isDue(now) and task.group not in self.busy_groups:
+					task.triggered = False
+					task.running_since = now
+					if task.group is not None:
+						self.busy_groups.add(task.group)
+					due_tasks.append(task)
+		return due_tasks
+
+	def checkOverdue(self):
+		now = time()
+		with self.lock:
+			for task in self.tasks.values():
+				if task.running_since is not None and not task.overdue_reported and now - task.running_since > task.warn_after_secs:
+					task.overdue_reported = True
+					task.overdue_count += 1
+					self.print_error(f"task {task.name} overdue, running for more than {task.warn_after_secs}s")
+
+	def runTask(self, task: Task):
+		t0 = time()
+		failed = False
+		try:
+			task.fn()
+		except Exception as e:
+			failed = True
+			self.print_error(f"task {task.name} failed: ", repr(e))
+			traceback.print_exc()
+		now = time()
+		with self.lock:
+			dt = now - t0
+			task.run_count += 1
+			task.total_secs += dt
+			task.max_secs = max(task.max_secs, dt)
+			task.running_since = None
+			task.overdue_reported = False
+			if task.group is not None:
+				self.busy_groups.discard(task.group)
+			if failed:
+				task.failure_count += 1
+				task.total_failure_count += 1
+				task.not_before = now + min((task.interval_secs or 1) * 2 ** task.failure_count, TaskScheduler.MAX_BACKOFF_SECS)
+			else:
+				task.failure_count = 0
+				task.not_before = 0
+			task.next_run_time = now + task.interval_secs if task.interval_secs is not None else math.inf
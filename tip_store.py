@@ -0,0 +1,309 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from collections import OrderedDict
+
+from electroncash.util import PrintError
+
+class StorageVersionMismatchException(Exception):
+	pass
+
+def get_tip_store_backend(storage):
+	"""name of the backend the wallet's tips are currently stored in"""
+	data = storage.get(WalletStorageTipStore.KEY)
+	if data and data.get("backend", None) == SQLiteTipStore.BACKEND:
+		return SQLiteTipStore.BACKEND
+	return WalletStorageTipStore.BACKEND
+
+def open_tip_store(storage, backend: str):
+	if backend == SQLiteTipStore.BACKEND:
+		return SQLiteTipStore(storage)
+	return WalletStorageTipStore(storage)
+
+class WalletStorageTipStore(PrintError):
+	"""
+		stores tips in wallet storage, one key per tip, so that only changed tips
+		need to be re-serialized. The list key holds the storage version and the tip ids.
+	"""
+	BACKEND = "wallet"
+	BULK_META = False # large meta values (e.g. bloom filter) would bloat the wallet file
+	PARTIAL_LOAD = False # load() returns complete tip dicts
+	KEY = "chaintipper_tiplist"
+	TIP_KEY_PREFIX = "chaintipper_tip_"
+	META_KEY_PREFIX = "chaintipper_"
+	STORAGE_VERSION = "19"
+	LEGACY_STORAGE_VERSION = "18" # all tips in one dict under KEY
+
+	def __init__(self, storage):
+		self.storage = storage
+		self.needs_migration = False
+
+	def load(self):
+		"""returns dict of tip dicts by tip id"""
+		data = self.storage.get(WalletStorageTipStore.KEY)
+		if not data or not "version" in data.keys():
+			raise StorageVersionMismatchException("tiplist not in wallet storage")
+
+		if data["version"] == WalletStorageTipStore.LEGACY_STORAGE_VERSION:
+			self.print_error(f"found legacy storage version {data['version']}, will migrate on next write")
+			self.needs_migration = True
+			tips = data["tips"]
+		elif data["version"] == WalletStorageTipStore.STORAGE_VERSION and "ids" in data:
+			tips = {}
+			for id in data["ids"]:
+				d = self.storage.get(WalletStorageTipStore.TIP_KEY_PREFIX + id)
+				if d is None:
+					self.print_error(f"tip {id} listed but not found in storage")
+					continue
+				tips[id] = d
+		else:
+			raise StorageVersionMismatchException("tiplist storage version too old")
+
+		if len(tips) <= 0:
+			raise StorageVersionMismatchException("tiplist empty")
+		return tips
+
+	def write(self, tip_dicts: dict, removed_ids, ids):
+		"""
+			put changed tips (tip_dicts by id), delete removed tips and,
+			if ids is not None, rewrite the list of tip ids
+		"""
+		for id, d in tip_dicts.items():
+			self.storage.put(WalletStorageTipStore.TIP_KEY_PREFIX + id, d)
+		for id in removed_ids:
+			self.storage.put(WalletStorageTipStore.TIP_KEY_PREFIX + id, None)
+		if ids is not None:
+			self.storage.put(WalletStorageTipStore.KEY, {
+				"version": WalletStorageTipStore.STORAGE_VERSION,
+				"ids": ids
+			})
+			self.needs_migration = False
+
+	def clear(self, ids):
+		"""remove given tips (used after migrating to another store)"""
+		for id in ids:
+			self.storage.put(WalletStorageTipStore.TIP_KEY_PREFIX + id, None)
+
+	def getMeta(self, key: str, default=None):
+		v = self.storage.get(WalletStorageTipStore.META_KEY_PREFIX + key)
+		return default if v is None else v
+
+	def putMeta(self, key: str, value):
+		self.storage.put(WalletStorageTipStore.META_KEY_PREFIX + key, value)
+
+class SQLiteTipStore(PrintError):
+	"""
+		stores tips in a per-wallet SQLite database (WAL mode) next to the wallet file.
+		One row per tip (indexed by status, recipient and created_utc), one row per payment.
+		The fields needed to index and schedule tips are kept in columns of their own, so
+		load() doesn't touch the tip data, which is decoded per tip on demand (loadData()).
+		The wallet file only holds a pointer to the database and a checksum of its identity and
+		generation (counting tip writes), so an older copy of the database or one written by
+		another copy of the wallet is rejected on open.
+	"""
+	BACKEND = "sqlite"
+	BULK_META = True # also keeps TxCache entries (loadTxCache(), writeTxCache())
+	PARTIAL_LOAD = True # load() returns INDEX_COLUMNS fields only, see loadData()
+	SCHEMA_VERSION = "2"
+	FILE_SUFFIX = ".chaintipper.sqlite"
+
+	# tip dict fields stored in columns besides data: (column, type, tip dict key)
+	INDEX_COLUMNS = [
+		("status", "TEXT", "payment_status"),
+		("recipient", "TEXT", "recipient_address"),
+		("created_utc", "INTEGER", "chaintip_message_created_utc"),
+		("class_name", "TEXT", "_class_name"),
+		("scripthash", "TEXT", "recipient_scripthash"),
+		("amount_bch", "TEXT", "amount_bch"),
+		("acceptance_status", "TEXT", "acceptance_status"),
+		("tipping_comment_id", "TEXT", "tipping_comment_id"),
+		("tippee_comment_id", "TEXT", "tippee_comment_id"),
+		("tippee_post_id", "TEXT", "tippee_post_id"),
+		("subreddit", "TEXT", "subreddit_str"),
+		("payments_confirmed", "INTEGER", "payments_confirmed"),
+	]
+	SCHEMA = [
+		"CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)",
+		"CREATE TABLE IF NOT EXISTS tips (id TEXT PRIMARY KEY, " + ", ".join(f"{column} {type}" for column, type, key in INDEX_COLUMNS) + ", data TEXT NOT NULL)",
+		"CREATE INDEX IF NOT EXISTS tips_status ON tips (status)",
+		"CREATE INDEX IF NOT EXISTS tips_recipient ON tips (recipient)",
+		"CREATE INDEX IF NOT EXISTS tips_created_utc ON tips (created_utc)",
+		"CREATE TABLE IF NOT EXISTS payments (tip_id TEXT NOT NULL, txid TEXT NOT NULL, amount_bch TEXT NOT NULL, PRIMARY KEY (tip_id, txid))",
+		"CREATE TABLE IF NOT EXISTS tx_histories (scripthash TEXT PRIMARY KEY, status TEXT, history TEXT NOT NULL)",
+		"CREATE TABLE IF NOT EXISTS tx_outputs (tx_hash TEXT PRIMARY KEY, outputs TEXT NOT NULL)",
+	]
+
+	def __init__(self, storage):
+		self.storage = storage
+		self.needs_migration = False
+		self.lock = threading.RLock()
+
+		pointer = storage.get(WalletStorageTipStore.KEY)
+		if pointer and pointer.get("backend", None) == SQLiteTipStore.BACKEND:
+			self.filename = pointer["path"]
+		else:
+			pointer = None
+			self.filename = os.path.basename(storage.path) + SQLiteTipStore.FILE_SUFFIX
+		self.path = os.path.join(os.path.dirname(storage.path), self.filename)
+
+		self.conn = sqlite3.connect(self.path, check_same_thread=False)
+		self.conn.execute("PRAGMA journal_mode=WAL")
+		self.conn.execute("PRAGMA synchronous=NORMAL")
+		with self.conn:
+			for statement in SQLiteTipStore.SCHEMA:
+				self.conn.execute(statement)
+
+		store_id = self.getMeta("store_id")
+		if store_id is None:
+			store_id = uuid.uuid4().hex
+			self.putMeta("store_id", store_id)
+			self.putMeta("schema_version", SQLiteTipStore.SCHEMA_VERSION)
+		self.store_id = store_id
+		self.generation = self.getMeta("generation", 0)
+
+		if pointer:
+			# pointers written before generations were counted only identify the store
+			checksum = self.checksum() if "generation" in pointer else hashlib.sha256(f"{self.store_id}:{self.getMeta('schema_version')}".encode("utf-8")).hexdigest()
+			if pointer.get("store_id", None) != self.store_id or pointer.get("checksum", None) != checksum:
+				raise StorageVersionMismatchException(f"tip database {self.path} (generation {self.generation}) doesn't match wallet (generation {pointer.get('generation', None)})")
+
+		if self.getMeta("schema_version") == "1":
+			self.upgradeSchema()
+			if pointer:
+				self.writePointer()
+
+	def upgradeSchema(self):
+		"""schema 1 -> 2: add index columns and fill them from the tip data (once)"""
+		with self.lock, self.conn:
+			existing = {row[1] for row in self.conn.execute("PRAGMA table_info(tips)")}
+			for column, type, key in SQLiteTipStore.INDEX_COLUMNS:
+				if column not in existing:
+					self.conn.execute(f"ALTER TABLE tips ADD COLUMN {column} {type}")
+			rows = self.conn.execute("SELECT id, data FROM tips").fetchall()
+			self.conn.executemany(
+				"UPDATE tips SET " + ", ".join(f"{column} = ?" for column, type, key in SQLiteTipStore.INDEX_COLUMNS) + " WHERE id = ?",
+				[(*self.indexValues(json.loads(data)), id) for id, data in rows]
+			)
+			self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", ("schema_version", json.dumps(SQLiteTipStore.SCHEMA_VERSION)))
+		self.print_error(f"upgraded tip database to schema {SQLiteTipStore.SCHEMA_VERSION} ({len(rows)} tips)")
+
+	def indexValues(self, d: dict):
+		return [d.get(key, None) for column, type, key in SQLiteTipStore.INDEX_COLUMNS]
+
+	def checksum(self):
+		return hashlib.sha256(f"{self.store_id}:{self.getMeta('schema_version')}:{self.generation}".encode("utf-8")).hexdigest()
+
+	def writePointer(self):
+		self.storage.put(WalletStorageTipStore.KEY, {
+			"version": WalletStorageTipStore.STORAGE_VERSION,
+			"backend": SQLiteTipStore.BACKEND,
+			"path": self.filename,
+			"store_id": self.store_id,
+			"generation": self.generation,
+			"checksum": self.checksum(),
+		})
+
+	def load(self):
+		"""returns dict of partial tip dicts (INDEX_COLUMNS fields and payments) by tip id"""
+		tips = {}
+		keys = [key for column, type, key in SQLiteTipStore.INDEX_COLUMNS]
+		with self.lock:
+			for row in self.conn.execute("SELECT id, " + ", ".join(column for column, type, key in SQLiteTipStore.INDEX_COLUMNS) + " FROM tips"):
+				tips[row[0]] = dict(zip(keys, row[1:]))
+			self.addPayments(tips, self.conn.execute("SELECT tip_id, txid, amount_bch FROM payments"))
+		if len(tips) <= 0:
+			raise StorageVersionMismatchException("tip database empty")
+		return tips
+
+	def loadData(self, id):
+		"""returns complete tip dict of tip id, None if not found"""
+		with self.lock:
+			row = self.conn.execute("SELECT data FROM tips WHERE id = ?", (id,)).fetchone()
+			if row is None:
+				return None
+			tips = {id: json.loads(row[0])}
+			self.addPayments(tips, self.conn.execute("SELECT tip_id, txid, amount_bch FROM payments WHERE tip_id = ?", (id,)))
+		return tips[id]
+
+	def addPayments(self, tips: dict, rows):
+		for tip_id, txid, amount_bch in rows:
+			if tip_id in tips:
+				tips[tip_id].setdefault("payments", {})[txid] = amount_bch
+
+	def write(self, tip_dicts: dict, removed_ids, ids):
+		"""upsert changed tips (tip_dicts by id) and delete removed tips in one transaction, counting the generation up"""
+		with self.lock, self.conn:
+			generation = self.generation + 1
+			self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", ("generation", json.dumps(generation)))
+			for id, d in tip_dicts.items():
+				d = dict(d)
+				payments = d.pop("payments", {})
+				self.conn.execute(
+					"INSERT OR REPLACE INTO tips (id, " + ", ".join(column for column, type, key in SQLiteTipStore.INDEX_COLUMNS) + ", data) VALUES (?, " + "?, " * len(SQLiteTipStore.INDEX_COLUMNS) + "?)",
+					(id, *self.indexValues(d), json.dumps(d))
+				)
+				self.conn.execute("DELETE FROM payments WHERE tip_id = ?", (id,))
+				self.conn.executemany(
+					"INSERT INTO payments (tip_id, txid, amount_bch) VALUES (?, ?, ?)",
+					[(id, txid, amount_bch) for txid, amount_bch in payments.items()]
+				)
+			for id in removed_ids:
+				self.conn.execute("DELETE FROM tips WHERE id = ?", (id,))
+				self.conn.execute("DELETE FROM payments WHERE tip_id = ?", (id,))
+		with self.lock:
+			self.generation = generation
+			self.writePointer()
+
+	def clear(self, ids):
+		with self.lock, self.conn:
+			self.conn.execute("DELETE FROM tips")
+			self.conn.execute("DELETE FROM payments")
+			self.generation += 1
+			self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", ("generation", json.dumps(self.generation)))
+
+	def getMeta(self, key: str, default=None):
+		with self.lock:
+			row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+		return default if row is None else json.loads(row[0])
+
+	def putMeta(self, key: str, value):
+		"""put meta value, None deletes it"""
+		with self.lock, self.conn:
+			if value is None:
+				self.conn.execute("DELETE FROM meta WHERE key = ?", (key,))
+			else:
+				self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, json.dumps(value)))
+
+	def loadTxCache(self):
+		"""TxCache entries ({"histories", "outputs"}, oldest first)"""
+		with self.lock:
+			histories = OrderedDict(
+				(scripthash, {"status": status, "history": json.loads(history)})
+				for scripthash, status, history in self.conn.execute("SELECT scripthash, status, history FROM tx_histories ORDER BY rowid")
+			)
+			outputs = OrderedDict(
+				(tx_hash, json.loads(outputs))
+				for tx_hash, outputs in self.conn.execute("SELECT tx_hash, outputs FROM tx_outputs ORDER BY rowid")
+			)
+		return {"histories": histories, "outputs": outputs}
+
+	def writeTxCache(self, delta: dict):
+		"""apply changed TxCache entries (see TxCache.takePersistData(), None deletes) in one transaction"""
+		with self.lock, self.conn:
+			for scripthash, entry in delta["histories"].items():
+				if entry is None:
+					self.conn.execute("DELETE FROM tx_histories WHERE scripthash = ?", (scripthash,))
+				else:
+					self.conn.execute("INSERT OR REPLACE INTO tx_histories (scripthash, status, history) VALUES (?, ?, ?)", (scripthash, entry["status"], json.dumps(entry["history"])))
+			for tx_hash, outputs in delta["outputs"].items():
+				if outputs is None:
+					self.conn.execute("DELETE FROM tx_outputs WHERE tx_hash = ?", (tx_hash,))
+				else:
+					self.conn.execute("INSERT OR REPLACE INTO tx_outputs (tx_hash, outputs) VALUES (?, ?)", (tx_hash, json.dumps(outputs)))
+
+	def close(self):
+		with self.lock:
+			self.conn.close()
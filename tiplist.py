@@ -16,14 +16,15 @@ from time import sleep
 from datetime import datetime
 from typing import Union
 
-from PyQt5.QtCore import Qt
-from PyQt5.QtWidgets import QApplication, QTreeWidgetItem, QAbstractItemView, QMenu, QVBoxLayout
+from PyQt5.QtCore import Qt, QAbstractTableModel, QSortFilterProxyModel, QModelIndex, QTimer, QPoint
+from PyQt5.QtGui import QBrush
+from PyQt5.QtWidgets import QTreeView, QAbstractItemView, QMenu, QVBoxLayout
 from electroncash_gui.qt.util import WindowModalDialog, filename_field, Buttons, CancelButton, OkButton
 from electroncash.plugins import run_hook
 
 from electroncash.i18n import _
 from electroncash_gui.qt import ElectrumWindow
-from electroncash_gui.qt.util import webopen, MessageBoxMixin, MyTreeWidget
+from electroncash_gui.qt.util import webopen, MessageBoxMixin
 from electroncash.transaction import Transaction
 from electroncash.util import PrintError, print_error, age, Weak, InvalidPassword, format_time
 from electroncash import keystore, get_config
@@ -31,10 +32,11 @@ from electroncash.storage import WalletStorage
 from electroncash.keystore import Hardware_KeyStore
 from electroncash.wallet import Standard_Wallet, Multisig_Wallet
 from electroncash.address import Address
-from electroncash.wallet import Abstract_Wallet, WalletStorage
+from electroncash.wallet import Abstract_Wallet
 import electroncash.web as web
 
-from .model import Tip, TipList, TipListener
+from .model import TipList, TipListener, PaymentState
+from .tip_store import WalletStorageTipStore, StorageVersionMismatchException, get_tip_store_backend, open_tip_store
 from .config import c
 from .util import read_config, write_config
 
@@ -58,135 +60,500 @@ from . import prawcore
 #                                                                                                            88                                              #
 ##############################################################################################################################################################
 
-class StorageVersionMismatchException(Exception):
-	pass
-
 class PersistentTipList(TipList):
-	KEY = "chaintipper_tiplist"
-	STORAGE_VERSION = "18"
+	"""TipList that tracks changed tips and writes only those to its store"""
 
 	def __init__(self, wallet_ui):
 		super(PersistentTipList, self).__init__()
 		self.wallet_ui = wallet_ui
-		self.dirty = False
+		self.store = None # opened by read()
+		self.migrate_from = None # (store, tip ids, meta keys) to clear after migration to self.store
+		self.dirty_ids = set() # ids of tips added or changed since last write
+		self.removed_ids = set() # ids of tips removed since last write
+		self.ids_dirty = False # list of tip ids changed since last write
+		self.pending_meta = {} # meta values to write together with the next tips write (None deletes)
+		self.write_lock = threading.Lock() # serializes writes from reddit and gui thread
+
+	def debug_stats(self):
+		return super().debug_stats() + f", {len(self.dirty_ids)} unsaved"
 
 	def addTip(self, tip):
 		super().addTip(tip)
-		self.dirty = True
+		with self.lock:
+			self.dirty_ids.add(tip.getID())
+			self.removed_ids.discard(tip.getID())
+			self.ids_dirty = True
+
+	def addTips(self, tips):
+		added_tips = super().addTips(tips)
+		with self.lock:
+			for tip in added_tips:
+				self.dirty_ids.add(tip.getID())
+				self.removed_ids.discard(tip.getID())
+			self.ids_dirty = True
+		return added_tips
 
 	def removeTip(self, tip):
 		super().removeTip(tip)
-		self.dirty = True
+		with self.lock:
+			self.dirty_ids.discard(tip.getID())
+			self.removed_ids.add(tip.getID())
+			self.ids_dirty = True
 
 	def updateTip(self, tip):
 		super().updateTip(tip)
-		self.dirty = True
-
-	def to_dict(self):
-		d = {}
-		for id, tip in self.tips.items():
-			d[id] = tip.to_dict()
-			d[id]["_class_name"] = type(tip).__name__
+		with self.lock:
+			if self.tips.get(tip.getID(), None) is tip:
+				self.dirty_ids.add(tip.getID())
+
+	def tipToDict(self, tip):
+		d = tip.to_dict()
+		d["_class_name"] = type(tip).__name__
+		d["payments"] = {txid: str(amount) for txid, amount in tip.payments_by_txhash.items()}
+		d["payments_confirmed"] = tip.payments_confirmed
 		return d
 
-	def write_if_dirty(self, storage: WalletStorage):
-		if self.dirty:
+	def openStore(self, backend: str):
+		try:
+			return open_tip_store(self.wallet_ui.wallet.storage, backend)
+		except Exception as e:
+			self.print_error(f"error opening {backend} tip store: ", repr(e))
+			return None
+
+	def write_if_dirty(self):
+		"""write changed tips to store. Snapshot is taken under lock, so adds/removes from other threads can't interfere"""
+		with self.write_lock:
+			with self.lock:
+				if self.store is None:
+					return
+				if len(self.dirty_ids) == 0 and len(self.removed_ids) == 0 and not self.ids_dirty and len(self.pending_meta) == 0:
+					return
+				dirty_ids, self.dirty_ids = self.dirty_ids, set()
+				removed_ids, self.removed_ids = self.removed_ids, set()
+				ids_dirty, self.ids_dirty = self.ids_dirty, False
+				pending_meta, self.pending_meta = self.pending_meta, {}
+				tip_dicts = {id: self.tipToDict(self.tips[id]) for id in dirty_ids if id in self.tips}
+				ids = list(self.tips.keys()) if ids_dirty else None
 			try:
-				d = {
-					"version": PersistentTipList.STORAGE_VERSION,
-					"tips": self.to_dict()
-				}
-				storage.put(PersistentTipList.KEY, d)
-				self.dirty = False
-			except RuntimeError as e: # looking for "RuntimeError: dictionary changed size during iteration"
-				pass
-
-	def read(self, storage: WalletStorage):
-		data = storage.get(PersistentTipList.KEY)
-		if not data or not "version" in data.keys() or data["version"] != PersistentTipList.STORAGE_VERSION:
-			raise StorageVersionMismatchException("tiplist not in wallet storage or tiplist storage version too old")
-		tips = data["tips"]
-		if len(tips) <= 0:
-			raise StorageVersionMismatchException("tiplist empty")
+				self.store.write(tip_dicts, removed_ids, ids)
+				# meta (e.g. sync cursors) after the tips it refers to
+				for key, value in pending_meta.items():
+					self.store.putMeta(key, value)
+			except Exception as e:
+				self.print_error("error writing tips, will retry: ", repr(e))
+				traceback.print_exc()
+				with self.lock:
+					self.dirty_ids |= dirty_ids
+					self.removed_ids |= removed_ids
+					self.ids_dirty = self.ids_dirty or ids_dirty
+					self.pending_meta = {**pending_meta, **self.pending_meta}
+				return
+
+			if self.migrate_from and ids is not None:
+				store, migrated_ids, migrated_meta_keys = self.migrate_from
+				self.migrate_from = None
+				self.print_error(f"migrated {len(migrated_ids)} tips and {len(migrated_meta_keys)} meta values from {store.BACKEND} to {self.store.BACKEND} store")
+				store.clear(migrated_ids)
+				for key in migrated_meta_keys:
+					store.putMeta(key, None)
+
+	def getMeta(self, key: str, default=None):
+		with self.lock:
+			if key in self.pending_meta:
+				value = self.pending_meta[key]
+				return default if value is None else value
+			if self.store is None:
+				return default
+		return self.store.getMeta(key, default)
+
+	def storesBulkMeta(self):
+		"""True if the store takes large meta values without bloating the wallet file"""
+		return self.store is not None and self.store.BULK_META
+
+	def loadTxCache(self):
+		"""persisted TxCache entries, None if the store doesn't keep them"""
+		return self.store.loadTxCache() if self.storesBulkMeta() else None
+
+	def writeTxCache(self, delta: dict):
+		"""persist changed TxCache entries (if the store keeps them)"""
+		if not self.storesBulkMeta():
+			return
+		try:
+			self.store.writeTxCache(delta)
+		except Exception as e:
+			self.print_error("error writing tx cache: ", repr(e))
+
+	def setMeta(self, key: str, value):
+		"""set meta value (None deletes it), written after the tips added before this call"""
+		with self.lock:
+			self.pending_meta[key] = value
+		self.write_if_dirty()
+
+	def read(self):
+		"""open store (backend chosen by wallet setting 'tip_store') and load tips, migrating them if backend changed"""
+		storage = self.wallet_ui.wallet.storage
+		current_backend = get_tip_store_backend(storage)
+		desired_backend = read_config(self.wallet_ui.wallet, "tip_store")
+		current = self.openStore(current_backend)
+		self.store = current if current_backend == desired_backend else self.openStore(desired_backend)
+		if self.store is None:
+			self.store = WalletStorageTipStore(storage)
+		if current is None:
+			raise StorageVersionMismatchException(f"unable to open {current_backend} tip store")
+
+		t0 = time.time()
+		tips = current.load()
+		t1 = time.time()
+		loaded_tips = []
 		for id, d in tips.items():
 			# klass = globals()[d["_class_name"]]
 			# tip = klass(self)
 			class_name = d["_class_name"]
-			if class_name == "RedditTip":
-				tip = RedditTip(self, self.wallet_ui.reddit)
-			tip.from_dict(d)
+			if current.PARTIAL_LOAD: # only indexed fields loaded, rest is decoded on demand
+				if class_name == "RedditTip":
+					tip = RedditTip.fromIndexDict(self, self.wallet_ui.reddit, id, d, lambda id=id, store=current: store.loadData(id))
+			else:
+				if class_name == "RedditTip":
+					tip = RedditTip(self, self.wallet_ui.reddit)
+				tip.from_dict(d)
 			assert tip.getID() == id
-			self.addTip(tip)
-			self.updateTip(tip)
-
-#################################################
-#                                               #
-#    88                                         #
-#    88   ,d                                    #
-#    88   88                                    #
-#    88 MM88MMM ,adPPYba, 88,dPYba,,adPYba,     #
-#    88   88   a8P_____88 88P'   "88"    "8a    #
-#    88   88   8PP""""""" 88      88      88    #
-#    88   88,  "8b,   ,aa 88      88      88    #
-#    88   "Y888 `"Ybbd8"' 88      88      88    #
-#                                               #
-#                                               #
-#################################################
-
-class TipListItem(QTreeWidgetItem, PrintError):
-
-	def __init__(self, o):
-		if isinstance(o, list):
-			QTreeWidgetItem.__init__(self, o)
-		elif isinstance(o, Tip):
-			self.tip = o
-			self.tip.tiplist_item = self
-			self.__init__(self.getDataArray(self.tip))
-		else:
-			QTreeWidgetItem.__init__(self)
-		self.refreshData()
+			for txid, amount in d.get("payments", {}).items():
+				tip.payments_by_txhash[txid] = Decimal(amount)
+			if len(tip.payments_by_txhash) > 0:
+				tip.amount_received_bch = sum(tip.payments_by_txhash.values())
+			tip.payments_confirmed = bool(d.get("payments_confirmed", False))
+			loaded_tips.append(tip)
+		t2 = time.time()
+		self.addTips(loaded_tips)
+		t3 = time.time()
+		self.print_error(f"read {len(loaded_tips)} tips from {current.BACKEND} store in {t3-t0:.3f}s (load {t1-t0:.3f}s, decode {t2-t1:.3f}s, add {t3-t2:.3f}s)")
+
+		# nothing changed by loading, unless tips need to be rewritten in new format or to another store
+		with self.lock:
+			if self.store is not current:
+				# meta values go with the tips (written in the same write, removed from current store after it)
+				meta_keys = [key for key in Reddit.META_KEYS if current.getMeta(key) is not None]
+				for key in meta_keys:
+					if self.store.BULK_META or key not in Reddit.BULK_META_KEYS:
+						self.pending_meta.setdefault(key, current.getMeta(key))
+				self.migrate_from = (current, list(tips.keys()), meta_keys)
+			elif not self.store.needs_migration:
+				self.dirty_ids = set()
+				self.ids_dirty = False
+
+###################################################################
+#                                                                 #
+#    88b           d88                      88            88      #
+#    888b         d888                      88            88      #
+#    88`8b       d8'88                      88            88      #
+#    88 `8b     d8' 88  ,adPPYba,   ,adPPYb,88  ,adPPYba, 88      #
+#    88  `8b   d8'  88 a8"     "8a a8"    `Y88 a8P_____88 88      #
+#    88   `8b d8'   88 8b       d8 8b       88 8PP""""""" 88      #
+#    88    `888'    88 "8a,   ,a8" "8a,   ,d88 "8b,   ,aa 88      #
+#    88     `8'     88  `"YbbdP"'   `"8bbdP"Y8  `"Ybbd8"' 88      #
+#                                                                 #
+#                                                                 #
+###################################################################
+
+class TipListModel(QAbstractTableModel, TipListener, PrintError):
+	"""
+		table model over a TipList. Display data is computed per row on demand and cached
+		until the tip is updated, changed rows are signalled in contiguous row ranges.
+		Adds, updates and removes arriving from any thread are collected (deduped by tip id)
+		and flushed in one batch by a timer in the gui thread, at most every FLUSH_INTERVAL_MS.
+		Changes are only signalled for rows the view shows (see visible_rows), other rows are
+		marked stale and signalled when they are scrolled into view (refreshStaleRows()).
+		Rows showing a payment countdown are invalidated every COUNTDOWN_INTERVAL_MS.
+	"""
+
+	FLUSH_INTERVAL_MS = 100 # bounds gui refresh rate to 10 Hz
+	COUNTDOWN_INTERVAL_MS = 1000
+
+	# column indexes
+	COL_DATE, COL_ACCEPTANCE, COL_STEALTH, COL_PAYMENT, COL_RECEIVED, COL_SUBREDDIT, \
+		COL_RECIPIENT, COL_AMOUNT_TEXT, COL_AMOUNT_BCH, COL_AMOUNT_FIAT = range(10)
+	NUMERIC_COLUMNS = (COL_DATE, COL_RECEIVED, COL_AMOUNT_BCH, COL_AMOUNT_FIAT)
+	AMOUNT_COLUMNS = (COL_RECEIVED, COL_AMOUNT_BCH, COL_AMOUNT_FIAT)
+
+	def __init__(self, window: ElectrumWindow, tiplist: TipList):
+		QAbstractTableModel.__init__(self)
+		self.window = window
+		self.tiplist = tiplist
+
+		self.tips = [] # tips by row
+		self.row_by_id = {}
+		self.row_data_by_id = {} # cached (display values, sort keys, finished) by tip id
+		self.stale_ids = set() # tips changed while not visible, change not signalled yet
+		self.countdown_ids = set() # tips whose cached row data shows a countdown
+		self.visible_rows = None # function returning set of rows shown by the view or None (all rows), set by view
+
+		# pending changes, collected by TipListener calls (any thread), guarded by self.lock
+		self.lock = threading.Lock()
+		self.added_tips = {} # by id, insertion ordered
+		self.dirty_ids = set()
+		self.removed_tips = {} # by id
+		self.paused = False
+
+		self.flush_timer = QTimer(self)
+		self.flush_timer.setSingleShot(True)
+		self.flush_timer.setInterval(TipListModel.FLUSH_INTERVAL_MS)
+		self.flush_timer.timeout.connect(self.flush)
+
+		self.countdown_timer = QTimer(self)
+		self.countdown_timer.setInterval(TipListModel.COUNTDOWN_INTERVAL_MS)
+		self.countdown_timer.timeout.connect(self.expireCountdowns)
+
+		# tiplist signals only wake up the flush timer
+		self.tiplist.added_signal.connect(self.scheduleFlush)
+		self.tiplist.update_signal.connect(self.scheduleFlush)
+		self.tiplist.removed_signal.connect(self.scheduleFlush)
+
+		# register as TipListener
+		self.tiplist.registerTipListener(self)
+
+	def unregister(self):
+		self.tiplist.unregisterTipListener(self)
 
-	def getDataArray(self, tip):
+	def getHeaders(self):
 		return [
-			#tip.getID(),
+			_('Date'),
+			_('Acceptance'), # translated
+			_('Stealth'),
+			_('Payment'),
+			_('Received (BCH)'),
+			_('Subreddit'), 
+			_('Recipient'), 
+			_('Tip Amount Text'),
+			_('Amount (BCH)'),
+			_('Amount ({ccy})').format(ccy=self.window.fx.ccy),
+		]
+
+	def calculateFiatAmount(self, tip):
+		# calc tip.amount_fiat
+		d_t = datetime.utcfromtimestamp(tip.chaintip_message_created_utc)
+		fx_rate = self.window.fx.history_rate(d_t)
+
+		tip.fiat_currency = self.window.fx.ccy
+		if fx_rate and tip.amount_bch:
+			try:
+				tip.amount_fiat = fx_rate * tip.amount_bch
+			except Exception as e:
+				self.print_error("error with fx_rate", fx_rate, "tip amount", tip.amount_bch)
+				traceback.print_exc(file=sys.stderr)
+		else:
+			tip.amount_fiat = None
+
+	def computeRowData(self, tip):
+		"""returns (display values, sort keys, finished) for tip"""
+		self.calculateFiatAmount(tip)
+		display = [
 			format_time(tip.chaintip_message_created_utc), 
-			#tip.acceptance_status,
-			#tip.chaintip_confirmation_status if hasattr(tip, "chaintip_confirmation_status") else "",
 			'linked' if tip.acceptance_status == 'received' else 'not yet linked' if tip.acceptance_status == 'funded' else tip.acceptance_status,
-			#tip.chaintip_confirmation_status if hasattr(tip, "chaintip_confirmation_status") else "",
 			tip.chaintip_confirmation_status if (hasattr(tip, "chaintip_confirmation_status") and tip.chaintip_confirmation_status == "<stealth>") else "",
 			tip.payment_status,
 			"{0:.8f}".format(tip.amount_received_bch) if isinstance(tip.amount_received_bch, Decimal) else "",
-			#tip.chaintip_message_author_name,
-			#tip.chaintip_message_subject,
 			tip.subreddit_str if hasattr(tip, "subreddit_str") else "",
 			tip.username,
-			#tip.direction,
 			tip.tip_amount_text,
 			"{0:.8f}".format(tip.amount_bch) if isinstance(tip.amount_bch, Decimal) else "",
 			"{0:.2f}".format(tip.amount_fiat) if hasattr(tip, "amount_fiat") and tip.amount_fiat else "",
-			#tip.fiat_currency if hasattr(tip, "fiat_currency") else "",
-			#tip.recipient_address.to_ui_string() if tip.recipient_address else None,
-			#str(tip.tip_quantity),
-			#tip.tip_unit,
-			#tip.tipping_comment_id,
-			#tip.tippee_content_link,
-			#tip.tippee_post_id,
-			#tip.tippee_comment_id,
-			#tip.tipping_comment.body.partition('\n')[0] if hasattr(tip, "tipping_comment") else "",
-			#tip.claim_return_txid if hasattr(tip, "claim_return_txid") and tip.claim_return_txid else ""
 		]
+		display = [v if v is not None else "" for v in display]
+
+		# sort keys: numbers for numeric columns (so they are compared natively by the proxy), lowercase text otherwise
+		def number(v):
+			return float(v) if isinstance(v, Decimal) else -1.0
+		sort_keys = [v.lower() for v in display]
+		sort_keys[TipListModel.COL_DATE] = float(tip.chaintip_message_created_utc or 0)
+		sort_keys[TipListModel.COL_RECEIVED] = number(tip.amount_received_bch)
+		sort_keys[TipListModel.COL_AMOUNT_BCH] = number(tip.amount_bch)
+		sort_keys[TipListModel.COL_AMOUNT_FIAT] = number(getattr(tip, "amount_fiat", None))
+
+		if tip.payment_state in (PaymentState.AMOUNT_SET, PaymentState.CHECK) and tip.getPaymentDeadline():
+			self.countdown_ids.add(tip.getID())
+			if not self.countdown_timer.isActive():
+				self.countdown_timer.start()
+
+		return (display, sort_keys, tip.isFinished())
+
+	def getRowData(self, row):
+		tip = self.tips[row]
+		row_data = self.row_data_by_id.get(tip.getID(), None)
+		if row_data is None:
+			row_data = self.computeRowData(tip)
+			self.row_data_by_id[tip.getID()] = row_data
+		return row_data
+
+	def getTip(self, row):
+		return self.tips[row]
+
+	# QAbstractTableModel overrides
+
+	def rowCount(self, parent=QModelIndex()):
+		return 0 if parent.isValid() else len(self.tips)
+
+	def columnCount(self, parent=QModelIndex()):
+		return 0 if parent.isValid() else 10
+
+	def headerData(self, section, orientation, role=Qt.DisplayRole):
+		if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+			return self.getHeaders()[section]
+		return None
+
+	def data(self, index, role=Qt.DisplayRole):
+		if not index.isValid():
+			return None
+		if role == Qt.DisplayRole:
+			return self.getRowData(index.row())[0][index.column()]
+		if role == Qt.UserRole:
+			if index.column() == TipListModel.COL_DATE: # default sort column, doesn't need (and decode) the whole tip
+				return float(self.tips[index.row()].getCreatedUTC() or 0)
+			return self.getRowData(index.row())[1][index.column()]
+		if role == Qt.ForegroundRole:
+			return QBrush(Qt.gray) if self.getRowData(index.row())[2] else None
+		if role == Qt.TextAlignmentRole and index.column() in TipListModel.AMOUNT_COLUMNS:
+			return Qt.AlignRight | Qt.AlignVCenter
+		return None
+
+	# TipListener implementation
+
+	def tipAdded(self, tip):
+		"""store added tip for later digestion in gui thread"""
+		with self.lock:
+			self.added_tips[tip.getID()] = tip
+
+	def tipsAdded(self, tips):
+		with self.lock:
+			for tip in tips:
+				self.added_tips[tip.getID()] = tip
 
-	def refreshData(self):
-		#self.print_error("refreshData() called from", threading.current_thread())
-		data = self.getDataArray(self.tip)
-		for idx, value in enumerate(data, start=0):
-			self.setData(idx, Qt.DisplayRole, value)
-			self.setForeground(idx, Qt.gray if self.tip.isFinished() else Qt.black)			
-		QApplication.processEvents() # keep gui alive
+	def tipUpdated(self, tip):
+		"""mark tip dirty for later digestion in gui thread"""
+		with self.lock:
+			self.dirty_ids.add(tip.getID())
+
+	def tipRemoved(self, tip):
+		"""store removed tip for later digestion in gui thread"""
+		with self.lock:
+			self.added_tips.pop(tip.getID(), None)
+			self.dirty_ids.discard(tip.getID())
+			self.removed_tips[tip.getID()] = tip
+
+	#
 
+	def scheduleFlush(self):
+		if not self.flush_timer.isActive():
+			self.flush_timer.start()
 
+	def expireCountdowns(self):
+		"""drop cached row data showing countdowns (refreshed with next flush)"""
+		if len(self.countdown_ids) == 0:
+			self.countdown_timer.stop()
+			return
+		with self.lock:
+			self.dirty_ids |= self.countdown_ids
+		self.countdown_ids = set()
+		self.scheduleFlush()
+
+	def setPaused(self, paused: bool):
+		"""while paused (view not visible), changes keep being collected but aren't flushed"""
+		self.paused = paused
+		if not paused:
+			self.scheduleFlush()
+
+	def flush(self):
+		"""digest all pending removes, adds and updates in one batch (runs in gui thread)"""
+		if self.paused:
+			return
+		with self.lock:
+			removed_tips, self.removed_tips = self.removed_tips, {}
+			added_tips, self.added_tips = self.added_tips, {}
+			dirty_ids, self.dirty_ids = self.dirty_ids, set()
+		if len(removed_tips) > 0:
+			self.digestTipRemoves(removed_tips.values())
+		if len(added_tips) > 0:
+			self.digestTipAdds(added_tips.values())
+		if len(dirty_ids) > 0:
+			self.digestTipUpdates(dirty_ids)
+
+	def digestTipAdds(self, added_tips):
+		added_tips = [tip for tip in added_tips if tip.getID() not in self.row_by_id]
+		if len(added_tips) == 0:
+			return
+		first = len(self.tips)
+		self.beginInsertRows(QModelIndex(), first, first + len(added_tips) - 1)
+		for row, tip in enumerate(added_tips, start=first):
+			self.tips.append(tip)
+			self.row_by_id[tip.getID()] = row
+		self.endInsertRows()
+
+	def digestTipUpdates(self, dirty_ids):
+		"""drop cached row data (recomputed lazily when the row is displayed) and signal changed rows that are visible"""
+		visible = self.visible_rows() if self.visible_rows else None
+		rows = []
+		for tip_id in dirty_ids:
+			self.row_data_by_id.pop(tip_id, None)
+			self.countdown_ids.discard(tip_id)
+			row = self.row_by_id.get(tip_id, None)
+			if row is None:
+				continue
+			if visible is None or row in visible:
+				rows.append(row)
+				self.stale_ids.discard(tip_id)
+			else:
+				self.stale_ids.add(tip_id)
+		self.emitRowsChanged(sorted(rows))
 
+	def refreshStaleRows(self):
+		"""signal changes of stale rows that are visible now (called by view when scrolled)"""
+		if len(self.stale_ids) == 0:
+			return
+		visible = self.visible_rows() if self.visible_rows else None
+		if visible is None:
+			visible = range(len(self.tips))
+		rows = []
+		for row in visible:
+			tip_id = self.tips[row].getID()
+			if tip_id in self.stale_ids:
+				self.stale_ids.discard(tip_id)
+				rows.append(row)
+		self.emitRowsChanged(sorted(rows))
+
+	def emitRowsChanged(self, rows: list):
+		"""emit dataChanged for each contiguous range in sorted list of rows"""
+		last_column = self.columnCount() - 1
+		start = None
+		for i, row in enumerate(rows):
+			if start is None:
+				start = row
+			if i + 1 == len(rows) or rows[i + 1] != row + 1:
+				self.dataChanged.emit(self.index(start, 0), self.index(row, last_column))
+				start = None
+
+	def digestTipRemoves(self, removed_tips):
+		rows = sorted((self.row_by_id[tip.getID()] for tip in removed_tips if tip.getID() in self.row_by_id), reverse=True)
+		if len(rows) == 0:
+			return
+		for row in rows:
+			self.beginRemoveRows(QModelIndex(), row, row)
+			tip = self.tips.pop(row)
+			del self.row_by_id[tip.getID()]
+			self.row_data_by_id.pop(tip.getID(), None)
+			self.stale_ids.discard(tip.getID())
+			self.countdown_ids.discard(tip.getID())
+			self.endRemoveRows()
+		for row in range(rows[-1], len(self.tips)):
+			self.row_by_id[self.tips[row].getID()] = row
+
+class TipListSortFilterProxyModel(QSortFilterProxyModel):
+	"""sorts by the numeric/text sort keys of TipListModel (Qt.UserRole) and filters on all displayed columns"""
+
+	def __init__(self, parent=None):
+		super().__init__(parent)
+		self.setSortRole(Qt.UserRole)
+		self.setFilterKeyColumn(-1)
+		self.setFilterCaseSensitivity(Qt.CaseInsensitive)
+		self.setDynamicSortFilter(True)
 
 ###############################################################################
 #                                                                             #
@@ -202,174 +569,90 @@ class TipListItem(QTreeWidgetItem, PrintError):
 #                                             "Y8bbdP"                        #
 ###############################################################################
 
-class TipListWidget(PrintError, MyTreeWidget, TipListener):
-
-	default_sort = MyTreeWidget.SortSpec(1, Qt.AscendingOrder)
-
-	def get_headers(self):
-		headers = [
-			#_('getID()'), 
-			_('Date'),
-			#_('Acceptance_o'), # original
-			#_('ChaintTip_o'),
-			_('Acceptance'), # translated
-			_('Stealth'),
-			_('Payment'),
-			_('Received (BCH)'),
-			#_('Author'), 
-			#_('Subject'), 
-			_('Subreddit'), 
-			_('Recipient'), 
-			#_('Direction'), 
-			_('Tip Amount Text'),
-			_('Amount (BCH)'),
-			"amount_fiat", 
-			#"fiat_currency",
-			#_('Recipient Address'),
-			#_('Tip Quantity'),
-			#_('Tip Unit'),
-			#_('Tip Comment ID'), 
-			#_('Tippee Content Link'),
-			#_('Tipee post id'),
-			#_('Tipee comment id'),
-			#_('Tip Comment body')
-			#_('Claim/Return txid')
-		]
-		fx = self.window.fx
-		
-		# replace 'amount_fiat' header
-		headers = [_('Amount ({ccy})').format(ccy=fx.ccy) if h=='amount_fiat' else h for h in headers]
-
-		return headers
+class TipListWidget(PrintError, QTreeView):
+	"""view on a TipListModel (through a TipListSortFilterProxyModel)"""
 
 	def __init__(self, wallet_ui, window: ElectrumWindow, wallet: Abstract_Wallet, tiplist: TipList, reddit: Reddit):
+		QTreeView.__init__(self, window)
 		self.wallet_ui = wallet_ui
 		self.window = window
 		self.wallet = wallet
 		self.reddit = reddit
-
-		MyTreeWidget.__init__(self, window, self.create_menu, self.get_headers(), 10, [],  # headers, stretch_column, editable_columns
-							deferred_updates=True, save_sort_settings=True)
-
-		self.updated_tips = []
-		self.added_tips = []
-
-		self.setTiplist(tiplist)
+		self.tiplist = tiplist
 
 		if self.reddit == None:
 			raise Exception("no reddit")
 
 		self.print_error("TipListWidget.__init__()")
-		self.setSelectionMode(QAbstractItemView.ExtendedSelection)
-		self.setSortingEnabled(True)
-		self.setIndentation(0)
-
-		if c["use_categories"]:
-			self.outgoing_items = QTreeWidgetItem([_("outgoing")])
-			self.addTopLevelItem(self.outgoing_items)
-			self.incoming_items = QTreeWidgetItem([_("incoming")])
-			self.addTopLevelItem(self.incoming_items)
-			self.other_items = QTreeWidgetItem([_("other messages")])
-			#self.addTopLevelItem(self.other_items)
-
-	def __del__(self):
-		if self.tiplist:
-			# clean up signal connections
-			# self.tiplist.update_signal.disconnect(self.digestTipUpdates)
-			# self.tiplist.added_signal.disconnect(self.digestTipAdds)
-			# deregister as tiplistener
-			self.tiplist.unregisterTipListener(self)
-
-	def setTiplist(self, tiplist):
-		if hasattr(self, "tiplist") and self.tiplist:
-			self.tiplist.unregistertipListener(self)
-
-		self.tips_by_address = dict()
-		self.tiplist = tiplist
-
-		# connect to tiplist added and update signals
-		self.tiplist.update_signal.connect(self.digestTipUpdates)
-		self.tiplist.added_signal.connect(self.digestTipAdds)
-
-		# register as TipListener
-		self.tiplist.registerTipListener(self)
-
-
-	def calculateFiatAmount(self, tip):
-		# calc tip.amount_fiat
-		d_t = datetime.utcfromtimestamp(tip.chaintip_message_created_utc)
-		fx_rate = self.window.fx.history_rate(d_t)
-
-		tip.fiat_currency = self.window.fx.ccy
-		if fx_rate and tip.amount_bch:
-			try:
-				tip.amount_fiat = fx_rate * tip.amount_bch
-			except Exception as e:
-				self.print_error("error with fx_rate", fx_rate, "tip amount", tip.amount_bch)
-				traceback.print_exc(file=sys.stderr)
-		else:
-			tip.amount_fiat = None
-
-	# TipListener implementation
-
-
-	def tipAdded(self, tip):
-		"""store added tip to local list for later digestion in gui thread"""
-		self.added_tips.append(tip)
-
-	def tipUpdated(self, tip):
-		"""store updated tip to local list for later digestion in gui thread"""
-		self.updated_tips.append(tip)
-
-	def tipRemoved(self, tip):
-		if tip.recipient_address:
-			del self.tips_by_address[tip.recipient_address]
-		if hasattr(tip, 'tiplist_item'):
-			if c["use_categories"]:
-				category_item = self.getCategoryItemForTip(tip)
-				category_item.removeChild(tip.tiplist_item)
-			else:
-				self.takeTopLevelItem(self.indexOfTopLevelItem(tip.tiplist_item))
-			del tip.tiplist_item
-		else:
-			self.print_error("no tiplist_item")
-
-	def digestTipAdds(self):
-		"""actually digest tip adds collected through tipAdded() (runs in gui thread)"""
-		added_tips = self.added_tips
-		self.added_tips = []
 
-		#if len(added_tips) > 0: self.print_error(f"digesting {len(added_tips)} tip adds")
+		self.tiplist_model = TipListModel(window, tiplist)
+		self.proxy_model = TipListSortFilterProxyModel(self)
+		self.proxy_model.setSourceModel(self.tiplist_model)
+		self.setModel(self.proxy_model)
 
-		for tip in added_tips:
-			if tip.recipient_address:
-				self.tips_by_address[tip.recipient_address] = tip 
-
-			TipListItem(tip) 
-			self.calculateFiatAmount(tip)
+		self.setRootIsDecorated(False)
+		self.setUniformRowHeights(True)
+		self.setAlternatingRowColors(True)
+		self.setSelectionMode(QAbstractItemView.ExtendedSelection)
+		self.setSelectionBehavior(QAbstractItemView.SelectRows)
+		self.setIndentation(0)
+		self.header().setStretchLastSection(True)
 
-			if c["use_categories"]:
-				category_item = self.getCategoryItemForTip(tip)
-				category_item.setExpanded(True)
-				category_item.addChild(tip.tiplist_item)
-			else:
-				self.addTopLevelItem(tip.tiplist_item)
+		# sorting (persisted per wallet)
+		sort_column, sort_order = read_config(self.wallet, "tiplist_sort", [TipListModel.COL_DATE, int(Qt.DescendingOrder)])
+		self.setSortingEnabled(True)
+		self.sortByColumn(sort_column, Qt.SortOrder(sort_order))
+		self.header().sortIndicatorChanged.connect(self.on_sort_indicator_changed)
 
-	def digestTipUpdates(self):
-		"""actually digest tip updates collected through tipUpdated() (runs in gui thread)"""
-		updated_tips = self.updated_tips
-		self.updated_tips = []
+		# changes of rows outside the viewport are signalled when they are scrolled into view
+		self.tiplist_model.visible_rows = self.visibleSourceRows
+		self.verticalScrollBar().valueChanged.connect(lambda value: self.tiplist_model.refreshStaleRows())
+		self.verticalScrollBar().rangeChanged.connect(lambda minimum, maximum: self.tiplist_model.refreshStaleRows())
+		self.proxy_model.layoutChanged.connect(lambda *args: self.tiplist_model.refreshStaleRows())
 
-		#if len(updated_tips) > 0: self.print_error(f"digesting {len(updated_tips)} tip updates")
+		# context menu
+		self.setContextMenuPolicy(Qt.CustomContextMenu)
+		self.customContextMenuRequested.connect(self.create_menu)
 
-		for tip in updated_tips:
-			if hasattr(tip, 'tiplist_item'):
-				#self.print_error("digesting tip update for tip", tip)
-				self.calculateFiatAmount(tip)
-				tip.tiplist_item.refreshData()
-			else:
-				self.updated_tips.append(tip)
-				#self.print_error("trying to update tip without tiplistitem: ", tip, ", re-adding to updated_tips list")
+	def __del__(self):
+		if self.tiplist_model:
+			self.tiplist_model.unregister()
+
+	def showEvent(self, event):
+		self.tiplist_model.setPaused(False)
+		super().showEvent(event)
+
+	def hideEvent(self, event):
+		self.tiplist_model.setPaused(True)
+		super().hideEvent(event)
+
+	def visibleSourceRows(self):
+		"""
+			tiplist model rows shown in the viewport, None if changes to any row can matter to the view:
+			while filtering or sorting by a column other than date (which never changes), the proxy needs
+			to see every change to place rows
+		"""
+		if self.proxy_model.sortColumn() != TipListModel.COL_DATE or self.proxy_model.filterRegExp().pattern():
+			return None
+		rows = set()
+		top = self.indexAt(QPoint(0, 0))
+		if not top.isValid():
+			return rows
+		bottom = self.indexAt(QPoint(0, self.viewport().height() - 1))
+		last = bottom.row() if bottom.isValid() else self.proxy_model.rowCount() - 1
+		for row in range(top.row(), last + 1):
+			rows.add(self.proxy_model.mapToSource(self.proxy_model.index(row, 0)).row())
+		return rows
+
+	def on_sort_indicator_changed(self, column, order):
+		write_config(self.wallet, "tiplist_sort", [column, int(order)])
+
+	def filter(self, p):
+		"""called by window search"""
+		self.proxy_model.setFilterFixedString(p)
+
+	def selectedTips(self):
+		return [self.tiplist_model.getTip(self.proxy_model.mapToSource(index).row()) for index in self.selectionModel().selectedRows()]
 
 	def do_export_history(self, filename):
 		self.print_error(f"do_export_history({filename})")
@@ -415,13 +698,13 @@ class TipListWidget(PrintError, MyTreeWidget, TipListener):
 		return False
 
 	def export_dialog(self, tips: list):
-		d = WindowModalDialog(self.parent, _('Export {c} Tips').format(c=len(tips)))
+		d = WindowModalDialog(self.window, _('Export {c} Tips').format(c=len(tips)))
 		d.setMinimumSize(400, 200)
 		vbox = QVBoxLayout(d)
 		defaultname = os.path.expanduser(read_config(self.wallet, 'export_history_filename', f"~/ChainTipper tips - wallet {self.wallet.basename()}.csv"))
 		select_msg = _('Select file to export your tips to')
 
-		box, filename_e, csv_button = filename_field(self.config, defaultname, select_msg)
+		box, filename_e, csv_button = filename_field(self.window.config, defaultname, select_msg)
 
 		vbox.addWidget(box)
 		vbox.addStretch(1)
@@ -446,12 +729,12 @@ class TipListWidget(PrintError, MyTreeWidget, TipListener):
 		except Exception as reason:
 			traceback.print_exc(file=sys.stderr)
 			export_error_label = _("Error exporting tips")
-			self.parent.show_critical(export_error_label + "\n" + str(reason), title=_("Unable to export tips"))
+			self.window.show_critical(export_error_label + "\n" + str(reason), title=_("Unable to export tips"))
 		else:
 			if success:
-				self.parent.show_message(_("{l} Tips successfully exported to {filename}").format(l=len(tips), filename=filename))
+				self.window.show_message(_("{l} Tips successfully exported to {filename}").format(l=len(tips), filename=filename))
 			else:
-				self.parent.show_message(_("Exporting tips to {filename} failed. More detail might be seen in terminal output.").format(filename=filename))
+				self.window.show_message(_("Exporting tips to {filename} failed. More detail might be seen in terminal output.").format(filename=filename))
 
 
 
@@ -463,7 +746,7 @@ class TipListWidget(PrintError, MyTreeWidget, TipListener):
 		def doPay(tips: list):
 			"""Start semi-automatic payment of a list of tips using the payto dialog ('send' tab)"""
 			self.print_error("paying tips: ", [t.getID() for t in tips])
-			w = self.parent # main_window
+			w = self.window # main_window
 
 			valid_tips = [tip for tip in tips if tip.isValid() and not tip.isPaid() and tip.amount_bch and isinstance(tip.amount_bch, Decimal)]
 
@@ -506,11 +789,11 @@ class TipListWidget(PrintError, MyTreeWidget, TipListener):
 			doOpenBrowser(tip.tipping_comment.permalink)
 
 		def doOpenBlockExplorerTX(txid: str):
-			URL = web.BE_URL(self.config, 'tx', txid)
+			URL = web.BE_URL(self.window.config, 'tx', txid)
 			webopen(URL)
 
 		def doOpenBlockExplorerAddress(address: Address):
-			URL = web.BE_URL(self.config, 'addr', address)
+			URL = web.BE_URL(self.window.config, 'addr', address)
 			webopen(URL)
 
 		def doMarkRead(tips: list, include_associated_items: bool = False, unread: bool = False):
@@ -524,14 +807,14 @@ class TipListWidget(PrintError, MyTreeWidget, TipListener):
 		def doExport(tips: list):
 			self.export_dialog(tips)
 
-		col = self.currentColumn()
-		column_title = self.headerItem().text(col)
+		def doRecheckPayments(tips: list):
+			self.wallet_ui.blockchain_watcher.recheck(tips)
 
 		# put tips into array (single or multiple if selection)
 		count_display_string = ""
-		tips = [s.tip for s in self.selectedItems()]
-		if len(self.selectedItems()) > 1:
-			if len(self.selectedItems()) == len(self.tiplist.tips.items()):
+		tips = self.selectedTips()
+		if len(tips) > 1:
+			if len(tips) == len(self.tiplist.tips.items()):
 				count_display_string = f" (all {len(tips)})"
 			else:
 				count_display_string = f" ({len(tips)})"
@@ -553,8 +836,8 @@ class TipListWidget(PrintError, MyTreeWidget, TipListener):
 				menu.addAction(_("open browser to the content that made you tip"), lambda: doOpenBrowser(tip.tippee_content_link))
 			if tip.tipping_comment_id:
 				menu.addAction(_("open browser to tipping comment"), lambda: doOpenBrowserToTippingComment(tip))
-			if hasattr(tip, "chaintip_confirmation_comment") and tip.chaintip_confirmation_comment:
-				menu.addAction(_("open browser to chaintip confirmation comment"), lambda: doOpenBrowser(self.reddit.getCommentLink(tip.chaintip_confirmation_comment)))
+			if getattr(tip, "chaintip_confirmation_comment_link", None):
+				menu.addAction(_("open browser to chaintip confirmation comment"), lambda: doOpenBrowser(tip.chaintip_confirmation_comment_link))
 			if hasattr(tip, "claim_or_returned_message_id") and tip.claim_or_returned_message_id:
 				menu.addAction(_('open browser to "{type}" message').format(type="funded" if hasattr(tip, "chaintip_confirmation_status") and tip.chaintip_confirmation_status == "funded" else tip.acceptance_status), lambda: doOpenBrowserToMessage(tip.claim_or_returned_message_id))
 			
@@ -588,10 +871,16 @@ class TipListWidget(PrintError, MyTreeWidget, TipListener):
 			menu.addSeparator()
 			menu.addAction(_(f"pay{unpaid_count_display_string}..."), lambda: doPay(unpaid_tips))
 
+		# re-check payments of settled (unwatched) tips
+		settled_tips = [tip for tip in tips if tip.payments_confirmed]
+		if len(settled_tips) > 0 and getattr(self.wallet_ui, "blockchain_watcher", None):
+			menu.addSeparator()
+			menu.addAction(_("re-check payment{s}").format(s=f"s ({len(settled_tips)})" if len(tips) > 1 else ""), lambda: doRecheckPayments(settled_tips))
+
 		# export
 		menu.addSeparator()
 		menu.addAction(_("export{}...").format(count_display_string), lambda: doExport(tips))
-		if len(self.selectedItems()) == 1 and len(self.tiplist.tips.items()) > 1:
+		if len(tips) == 1 and len(self.tiplist.tips.items()) > 1:
 			menu.addAction(_("export (all {})...").format(len(self.tiplist.tips.items())), lambda: doExport(self.tiplist.tips.items()))
 
 		# remove
@@ -600,15 +889,3 @@ class TipListWidget(PrintError, MyTreeWidget, TipListener):
 			menu.addAction(_("remove{}").format(count_display_string), lambda: doRemove(tips))
 		
 		menu.exec_(self.viewport().mapToGlobal(position))
-
-	# category items
-
-	def getCategoryItemForTip(self, tip: Tip):
-		"""Choose correct category (top level) item base on tip direction""" 
-		i = self.other_items
-		if tip.direction == 'incoming':
-			i = self.incoming_items
-		elif tip.direction == 'outgoing':
-			i = self.outgoing_items
-		return i
-
@@ -0,0 +1,194 @@
+import heapq
+import math
+import threading
+from collections import OrderedDict
+from time import time
+
+from electroncash.util import PrintError
+
+from .model import TipListener
+from .fetch_outcomes import FetchOutcomes
+from .request_scheduler import RequestScheduler
+
+class TippingCommentFetcher(TipListener, PrintError):
+	"""
+		TippingCommentFetcher
+		maintains queues of tips whose tipping comment hasn't been fetched yet
+		(unpaid tips first) and resolves them in batches of up to BATCH_SIZE fullnames
+		per reddit.info() request, back-to-back while the request scheduler has budget
+		for BACKGROUND requests.
+		The parents of a batch's comments are fetched by a second info() request.
+		Tips whose tipping comment couldn't be fetched or parsed wait in deferred_tips until
+		their retry time from reddit.fetch_outcomes (never, once given up).
+	"""
+
+	BATCH_SIZE = 100 # reddit info endpoint limit
+	MAX_SECS_PER_CYCLE = 10 # don't starve the rest of the reddit loop
+
+	def __init__(self, tiplist, reddit):
+		self.tiplist = tiplist
+		self.reddit = reddit
+		self.lock = threading.Lock()
+		self.unpaid_queue = OrderedDict() # tips by id
+		self.paid_queue = OrderedDict() # tips by id
+		self.deferred_tips = {} # tips waiting for retry by id
+		self.deferred_heap = [] # (retry time, tip id)
+		self.given_up_ids = set() # tips whose tipping comment won't be fetched again
+
+		# throughput stats
+		self.fetched_count = 0
+		self.unresolved_count = 0
+		self.request_count = 0
+		self.fetch_secs = 0.0
+
+		self.tiplist.registerTipListener(self)
+		self.tipsAdded(list(self.tiplist.tips.values()))
+
+	def __del__(self):
+		self.tiplist.unregisterTipListener(self)
+
+	def debug_stats(self):
+		rate = self.fetched_count / self.fetch_secs if self.fetch_secs > 0 else 0
+		return f"TippingCommentFetcher: {len(self.unpaid_queue)} unpaid + {len(self.paid_queue)} paid queued, {len(self.deferred_tips)} deferred, {len(self.given_up_ids)} given up, {self.fetched_count} fetched ({self.unresolved_count} unresolved) in {self.request_count} requests, {rate:.1f} comments/s\n\
+                       {self.reddit.fetch_outcomes.debug_stats()}"
+
+	# TipListener overrides
+
+	def tipAdded(self, tip):
+		self.enqueue(tip)
+
+	def tipUpdated(self, tip):
+		self.enqueue(tip)
+
+	def tipRemoved(self, tip):
+		with self.lock:
+			self.unpaid_queue.pop(tip.getID(), None)
+			self.paid_queue.pop(tip.getID(), None)
+			self.deferred_tips.pop(tip.getID(), None)
+			self.given_up_ids.discard(tip.getID())
+
+	#
+
+	@staticmethod
+	def needsTippingComment(tip):
+		# subreddit_str before tipping_comment: only the latter makes a partially loaded tip decode its stored data
+		return getattr(tip, "tipping_comment_id", None) is not None and \
+			len(getattr(tip, "subreddit_str", None) or "") == 0 and \
+			getattr(tip, "tipping_comment", None) is None
+
+	def enqueue(self, tip):
+		"""(re-)queue tip according to its state and fetch outcome, or drop it from the queues if it doesn't need fetching"""
+		tip_id = tip.getID()
+		needs_tipping_comment = TippingCommentFetcher.needsTippingComment(tip)
+		retry_time = self.reddit.fetch_outcomes.retryTime(tip.tipping_comment_id) if needs_tipping_comment else 0
+		with self.lock:
+			if not needs_tipping_comment or retry_time > time():
+				self.unpaid_queue.pop(tip_id, None)
+				self.paid_queue.pop(tip_id, None)
+				if not needs_tipping_comment or retry_time == math.inf:
+					self.deferred_tips.pop(tip_id, None)
+					if needs_tipping_comment:
+						self.given_up_ids.add(tip_id)
+				elif tip_id not in self.deferred_tips:
+					self.deferred_tips[tip_id] = tip
+					heapq.heappush(self.deferred_heap, (retry_time, tip_id))
+			elif tip.isPaid():
+				self.unpaid_queue.pop(tip_id, None)
+				if tip_id not in self.paid_queue:
+					self.paid_queue[tip_id] = tip
+			else:
+				self.paid_queue.pop(tip_id, None)
+				if tip_id not in self.unpaid_queue:
+					self.unpaid_queue[tip_id] = tip
+
+	def releaseDeferred(self):
+		"""re-queue deferred tips whose retry time has come"""
+		due_tips = []
+		now = time()
+		with self.lock:
+			while len(self.deferred_heap) > 0 and self.deferred_heap[0][0] <= now:
+				retry_time, tip_id = heapq.heappop(self.deferred_heap)
+				tip = self.deferred_tips.pop(tip_id, None)
+				if tip:
+					due_tips.append(tip)
+		for tip in due_tips:
+			self.enqueue(tip)
+
+	def takeBatch(self):
+		"""dequeue tips for up to BATCH_SIZE tipping comments, unpaid first. Returns lists of tips by tipping comment id (tips can share a comment)"""
+		batch = {}
+		fetch_outcomes = self.reddit.fetch_outcomes
+		now = time()
+		deferred = []
+		with self.lock:
+			for queue in (self.unpaid_queue, self.paid_queue):
+				while len(queue) > 0 and len(batch) < TippingCommentFetcher.BATCH_SIZE:
+					tip_id, tip = queue.popitem(last=False)
+					if fetch_outcomes.retryTime(tip.tipping_comment_id) > now: # outcomes loaded after tip was queued
+						deferred.append(tip)
+						continue
+					batch.setdefault(tip.tipping_comment_id, []).append(tip)
+		for tip in deferred:
+			self.enqueue(tip)
+		return batch
+
+	def do_work(self):
+		"""fetch batches back-to-back until queues are empty, time or rate budget is used up"""
+		start_time = time()
+		self.releaseDeferred()
+		scheduler = self.reddit.scheduler
+		with scheduler.priority(RequestScheduler.BACKGROUND):
+			while not self.reddit.should_quit and time() - start_time < TippingCommentFetcher.MAX_SECS_PER_CYCLE:
+				if not scheduler.hasBudget():
+					self.print_error("rate budget exhausted, continuing later")
+					break
+				batch = self.takeBatch()
+				if len(batch) == 0:
+					break
+				self.fetchBatch(batch)
+
+	def fetchBatch(self, batch: dict):
+		t0 = time()
+		try:
+			comments = list(self.reddit.reddit.info(fullnames = list(batch.keys())))
+		except Exception as e:
+			self.print_error(f"fetchBatch() error: {e}, re-queueing tips of {len(batch)} tipping comments")
+			for tips in batch.values():
+				for tip in tips:
+					self.enqueue(tip)
+			raise
+		self.request_count += 1
+
+		# prefetch parents (tippee comments and posts) of the whole batch in one go
+		parent_ids = list(set(comment.parent_id for comment in comments))
+		parents_by_fullname = {parent.fullname: parent for parent in self.reddit.reddit.info(fullnames = parent_ids)} if len(parent_ids) > 0 else {}
+		self.request_count += 1 if len(parent_ids) > 0 else 0
+
+		for comment in comments:
+			tips = batch.pop(comment.fullname, None)
+			if tips is None:
+				continue
+			outcome = FetchOutcomes.OK
+			failed_tips = []
+			for tip in tips:
+				try:
+					tip.parseTippingComment(comment, parents_by_fullname.get(comment.parent_id, None))
+				except Exception as e: # possibly tip was removed while we made the request
+					self.print_error(f"fetchBatch() error parsing {comment.fullname}: {e}")
+					outcome = FetchOutcomes.PARSE_FAILED
+					failed_tips.append(tip)
+				self.fetched_count += 1
+			self.reddit.fetch_outcomes.record(comment.fullname, outcome)
+			for tip in failed_tips:
+				self.enqueue(tip)
+
+		for unresolved_tipping_comment_id, tips in batch.items():
+			self.print_error("unresolved: ", unresolved_tipping_comment_id)
+			self.reddit.fetch_outcomes.record(unresolved_tipping_comment_id, FetchOutcomes.NOT_FOUND)
+			for tip in tips:
+				self.enqueue(tip)
+				self.unresolved_count += 1
+
+		dt = time() - t0
+		self.fetch_secs += dt
+		self.print_error(f"fetched {len(comments)} tipping comments in {dt:.2f}s, {len(self.unpaid_queue)} unpaid + {len(self.paid_queue)} paid queued")
@@ -0,0 +1,103 @@
+import threading
+from collections import OrderedDict
+from time import time
+
+from electroncash.util import PrintError
+
+class TxCache(PrintError):
+	"""
+		TxCache
+		what BlockchainWatcher learned from the server: status hash and history of each
+		scripthash and the outputs ([scripthash, satoshis, n]) of fetched transactions.
+		A status notification matching the cached status needs no history request and a
+		cached transaction is never fetched again. Oldest entries beyond MAX_SCRIPTHASHES /
+		MAX_TXS are dropped. Persisted through takePersistData() (changed entries only) and load().
+	"""
+
+	MAX_SCRIPTHASHES = 50000
+	MAX_TXS = 50000
+	PERSIST_INTERVAL_SECS = 60
+
+	def __init__(self):
+		self.lock = threading.Lock()
+		self.histories = OrderedDict() # {"status", "history": [[tx_hash, height], ...]} by scripthash, least recently used first
+		self.outputs = OrderedDict() # [[scripthash, satoshis, n], ...] by tx_hash, oldest first
+		self.dirty_scripthashes = set() # histories changed or dropped since last persist
+		self.dirty_tx_hashes = set()
+		self.persist_time = time()
+
+		# stats
+		self.status_hits = 0
+		self.tx_hits = 0
+
+	def debug_stats(self):
+		return f"TxCache: {len(self.histories)} histories, {len(self.outputs)} txs, {self.status_hits} unchanged statuses, {self.tx_hits} cached txs used"
+
+	def getHistory(self, scripthash: str, status: str):
+		"""cached history if status is unchanged, None otherwise"""
+		with self.lock:
+			entry = self.histories.get(scripthash, None)
+			if entry is None or entry["status"] != status:
+				return None
+			self.histories.move_to_end(scripthash)
+			self.status_hits += 1
+			return entry["history"]
+
+	def putHistory(self, scripthash: str, status: str, history: list):
+		with self.lock:
+			self.histories.pop(scripthash, None)
+			self.histories[scripthash] = {"status": status, "history": history}
+			self.dirty_scripthashes.add(scripthash)
+			while len(self.histories) > TxCache.MAX_SCRIPTHASHES:
+				self.dirty_scripthashes.add(self.histories.popitem(last=False)[0])
+
+	def forgetHistory(self, scripthash: str):
+		"""make next status notification request the history (e.g. when user asks for a re-check)"""
+		with self.lock:
+			if self.histories.pop(scripthash, None):
+				self.dirty_scripthashes.add(scripthash)
+
+	def getOutputs(self, tx_hash: str):
+		"""cached outputs of tx, None if not cached"""
+		with self.lock:
+			outputs = self.outputs.get(tx_hash, None)
+			if outputs is not None:
+				self.tx_hits += 1
+			return outputs
+
+	def putOutputs(self, tx_hash: str, outputs: list):
+		with self.lock:
+			self.outputs[tx_hash] = outputs
+			self.dirty_tx_hashes.add(tx_hash)
+			while len(self.outputs) > TxCache.MAX_TXS:
+				self.dirty_tx_hashes.add(self.outputs.popitem(last=False)[0])
+
+	def takePersistData(self, force: bool = False):
+		"""
+			returns entries changed since last call ({"histories", "outputs"}, None values for dropped
+			entries) if any and PERSIST_INTERVAL_SECS passed (or force), None otherwise
+		"""
+		with self.lock:
+			if (len(self.dirty_scripthashes) == 0 and len(self.dirty_tx_hashes) == 0) or (not force and time() - self.persist_time < TxCache.PERSIST_INTERVAL_SECS):
+				return None
+			delta = {
+				"histories": {scripthash: self.histories.get(scripthash, None) for scripthash in self.dirty_scripthashes},
+				"outputs": {tx_hash: self.outputs.get(tx_hash, None) for tx_hash in self.dirty_tx_hashes},
+			}
+			self.dirty_scripthashes = set()
+			self.dirty_tx_hashes = set()
+			self.persist_time = time()
+			return delta
+
+	def load(self, d: dict):
+		"""merge persisted entries (entries recorded this session win)"""
+		if not d:
+			return
+		with self.lock:
+			for attr in ("histories", "outputs"):
+				merged = OrderedDict(d.get(attr, {}))
+				for key, value in getattr(self, attr).items():
+					merged.pop(key, None)
+					merged[key] = value
+				setattr(self, attr, merged)
+		self.print_error(f"loaded {len(self.histories)} histories and {len(self.outputs)} txs")
@@ -0,0 +1,59 @@
+import hashlib
+import struct
+from struct import unpack_from
+
+OP_RETURN = 0x6a
+PREFIX_TOKEN = 0xef # CashTokens token prefix in front of locking script
+TOKEN_HAS_AMOUNT = 0x10
+TOKEN_HAS_COMMITMENT_LENGTH = 0x40
+
+def read_varint(b, pos: int):
+	"""returns (value, new pos) of compact size integer at pos"""
+	n = b[pos]
+	if n < 0xfd:
+		return n, pos + 1
+	if n == 0xfd:
+		return unpack_from("<H", b, pos + 1)[0], pos + 3
+	if n == 0xfe:
+		return unpack_from("<I", b, pos + 1)[0], pos + 5
+	return unpack_from("<Q", b, pos + 1)[0], pos + 9
+
+def skip_token_prefix(b, pos: int):
+	"""returns pos of locking script behind token prefix starting at pos"""
+	bitfield = b[pos + 33]
+	pos += 34 # prefix, category, bitfield
+	if bitfield & TOKEN_HAS_COMMITMENT_LENGTH:
+		length, pos = read_varint(b, pos)
+		pos += length
+	if bitfield & TOKEN_HAS_AMOUNT:
+		amount, pos = read_varint(b, pos)
+	return pos
+
+def output_scripthashes(raw_tx: str):
+	"""
+		yields (scripthash, satoshis, n) for outputs of serialized transaction raw_tx (hex),
+		scripthash being electrum's (reversed sha256 of the locking script, as bytes).
+		Inputs are skipped without being decoded, OP_RETURN outputs are left out.
+		Raises ValueError on malformed transactions.
+	"""
+	b = bytes.fromhex(raw_tx)
+	view = memoryview(b)
+	try:
+		n_in, pos = read_varint(b, 4) # after version
+		for i in range(n_in):
+			script_length, pos = read_varint(b, pos + 36) # after prevout
+			pos += script_length + 4 # script, sequence
+		n_out, pos = read_varint(b, pos)
+		for n in range(n_out):
+			satoshis = unpack_from("<q", b, pos)[0]
+			script_length, pos = read_varint(b, pos + 8)
+			end = pos + script_length
+			if end > len(b):
+				raise ValueError("output script exceeds transaction")
+			if script_length > 0 and b[pos] == PREFIX_TOKEN:
+				pos = skip_token_prefix(b, pos)
+			if pos < end and b[pos] != OP_RETURN:
+				yield hashlib.sha256(view[pos:end]).digest()[::-1], satoshis, n
+			pos = end
+	except (IndexError, struct.error) as e:
+		raise ValueError(f"malformed transaction: {e!r}") from e
@@ -4,12 +4,11 @@ from PyQt5.QtWidgets import QMessageBox
 from PyQt5.QtWidgets import (
 	QAction, QVBoxLayout, QHBoxLayout, QLabel, QComboBox, QGroupBox, QCheckBox, 
 	QStackedLayout, QWidget, QGridLayout, QRadioButton, QDoubleSpinBox, QSpinBox,
-	QSizePolicy, QLineEdit
+	QSizePolicy, QLineEdit, QProgressBar, QPushButton
 )
 from PyQt5.QtCore import Qt
 from PyQt5.QtWidgets import QApplication
 
-import traceback
 import weakref
 import decimal
 from datetime import datetime
@@ -18,7 +17,7 @@ from electroncash.i18n import _
 from electroncash_gui.qt import ElectrumWindow, MessageBoxMixin
 from electroncash_gui.qt.util import (
 	destroyed_print_error,
-	Buttons, CancelButton, CloseButton, ColorScheme, OkButton, WaitingDialog, 
+	Buttons, CancelButton, CloseButton, ColorScheme, OkButton,
 	WindowModalDialog
 )
 from electroncash_gui.qt.amountedit import BTCAmountEdit
@@ -37,6 +36,9 @@ from .util import read_config, write_config, commit_config
 from .config import c, amount_config_to_rich_text
 from .blockchain_watcher import BlockchainWatcher
 from .autopay import AutoPay
+from .payment_scheduler import PaymentScheduler
+from .tipping_comment_fetcher import TippingCommentFetcher
+from .rate_cache import RateCache
 
 icon_chaintip = QtGui.QIcon(":icons/chaintip.svg")
 icon_chaintip_gray = QtGui.QIcon(":icons/chaintip_gray.svg")
@@ -98,8 +100,13 @@ class WalletUI(MessageBoxMixin, PrintError, QWidget):
 			s += "   " + self.blockchain_watcher.debug_stats() + "\n"
 		if hasattr(self, "autopay") and self.autopay:
 			s += "   " + self.autopay.debug_stats() + "\n"
+		if hasattr(self, "payment_scheduler") and self.payment_scheduler:
+			s += "   " + self.payment_scheduler.debug_stats() + "\n"
+		if hasattr(self, "tipping_comment_fetcher") and self.tipping_comment_fetcher:
+			s += "   " + self.tipping_comment_fetcher.debug_stats() + "\n"
 		if hasattr(self, "reddit") and self.reddit:
 			s += "   " + self.reddit.debug_stats() + "\n"
+		s += "   " + RateCache.get_instance().debug_stats() + "\n"
 
 		if s != self.old_debug_stats:
 			self.old_debug_stats = s
@@ -107,7 +114,7 @@ class WalletUI(MessageBoxMixin, PrintError, QWidget):
 
 	def persistTipList(self):
 		if hasattr(self, "tiplist") and isinstance(self.tiplist, PersistentTipList):
-			self.tiplist.write_if_dirty(self.wallet.storage)
+			self.tiplist.write_if_dirty()
 
 	def kill_join(self):
 		self.print_error("kill_join()")
@@ -150,6 +157,8 @@ class WalletUI(MessageBoxMixin, PrintError, QWidget):
 				self.add_ui()
 
 				self.reddit.new_tip.connect(self.tiplist.addTip)
+				self.reddit.meta_signal.connect(self.tiplist.setMeta)
+				self.reddit.import_progress_signal.connect(self.importProgress)
 				self.print_error("initializeTipList")
 				self.initializeTipList()
 
@@ -206,11 +215,13 @@ class WalletUI(MessageBoxMixin, PrintError, QWidget):
 			self.window.tabs.setCurrentIndex(self.previous_tab_index)
 			self.previous_tab_index = None
 
-	def importError(self, stuff):
-		klass, exc, tb = stuff
-		self.print_error("import error:", klass, exc)
-		traceback.print_tb(tb)
-		self.window.show_error(_("Import aborted with error: {klass} {exc}. Please report (more info in output)").format(klass=klass, exc=exc))
+	def importProgress(self, progress: dict):
+		"""show progress of background import, inform user about errors"""
+		if hasattr(self, "import_progress_row") and self.import_progress_row:
+			self.import_progress_row.setProgress(progress)
+		if progress.get("error", None):
+			self.print_error("import error:", progress["error"])
+			self.window.show_error(_("Import aborted with error: {error}. Please report (more info in output)").format(error=progress["error"]))
 
 	def importTipsFromReddit(self):
 		choice = self.msg_box(
@@ -234,30 +245,27 @@ class WalletUI(MessageBoxMixin, PrintError, QWidget):
 			#self.reddit.triggerImport(days)
 			
 			# import...
-			try:
-				dialog = WaitingDialog(self.window, "importing from Reddit...", lambda: self.reddit.doImport(days), auto_exec=True, on_error=self.importError)
-			except Exception as e:
-				traceback.print_exc()
-				traceback.print_stack()
+			self.reddit.queueImport(days, description = _("importing from Reddit"))
+
+	def resumeImportFromReddit(self):
+		checkpoint = self.reddit.getImportCheckpoint()
+		if checkpoint:
+			self.print_error(f"resumeImportFromReddit(): resuming import (limit_days={checkpoint['limit_days']})...")
+			self.reddit.queueImport(checkpoint["limit_days"], checkpoint["start_date_utc"], _("resuming import from Reddit"))
 
 	def importRecentTipsFromReddit(self):
-		dates = []
-		for tip in self.tiplist.tips.values():
-			if hasattr(tip, "chaintip_message_created_utc"):
-				dates.append(int(tip.chaintip_message_created_utc))
-		if len(dates) > 0:
-			dates = sorted(dates)
-			self.print_error(f"importRecentTipsFromReddit(): latest tip date: {dates[-1]} = {format_time(dates[-1])}, importing...")
+		cursor = self.reddit.getInboxCursor()
+		latest = cursor["created_utc"] if cursor else self.tiplist.getNewestCreatedUTC()
+		if latest is not None:
+			latest = int(latest)
+			self.print_error(f"importRecentTipsFromReddit(): latest item date: {latest} = {format_time(latest)}, importing...")
 			# import...
-			try:
-				dialog = WaitingDialog(self.window, _("importing from Reddit (starting {d})...").format(d=format_time(dates[-1])), lambda: self.reddit.doImport(-3, dates[-1]), auto_exec=True, on_error=self.importError)
-			except Exception as e:
-				traceback.print_exc()
-				traceback.print_stack()
+			self.reddit.queueImport(-3, latest, _("importing from Reddit (starting {d})").format(d=format_time(latest)))
 
 	def initializeTipList(self):
 		try:
-			self.tiplist.read(self.wallet.storage)
+			self.tiplist.read()
+			self.resumeImportFromReddit()
 			self.importRecentTipsFromReddit()
 		except StorageVersionMismatchException as e:
 			self.print_error("error loading tips from wallet file: ", e)
@@ -268,7 +276,11 @@ class WalletUI(MessageBoxMixin, PrintError, QWidget):
 		self.tiplist = PersistentTipList(self)
 		self.autopay = AutoPay(self.wallet, self.tiplist)
 		self.blockchain_watcher = BlockchainWatcher(self.wallet, self.tiplist)
+		self.payment_scheduler = PaymentScheduler(self.tiplist)
+		self.tipping_comment_fetcher = TippingCommentFetcher(self.tiplist, self.reddit)
 		self.tiplist_widget = TipListWidget(self, self.window, self.wallet, self.tiplist, self.reddit)
+		self.import_progress_row = ImportProgressRow(self.reddit)
+		self.vbox.addWidget(self.import_progress_row)
 		self.vbox.addWidget(self.tiplist_widget)
 
 		self.tab = self.window.create_list_tab(self)
@@ -279,8 +291,14 @@ class WalletUI(MessageBoxMixin, PrintError, QWidget):
 		if hasattr(self, "autopay") and self.autopay:
 			del self.autopay
 		if hasattr(self, "blockchain_watcher") and self.blockchain_watcher:
+			self.blockchain_watcher.close()
 			del self.blockchain_watcher
+		if hasattr(self, "payment_scheduler") and self.payment_scheduler:
+			del self.payment_scheduler
+		if hasattr(self, "tipping_comment_fetcher") and self.tipping_comment_fetcher:
+			del self.tipping_comment_fetcher
 		if self.vbox:
+			self.vbox.removeWidget(self.import_progress_row)
 			self.vbox.removeWidget(self.tiplist_widget)
 		if hasattr(self, "tiplist") and self.tiplist:
 			del self.tiplist
@@ -289,6 +307,11 @@ class WalletUI(MessageBoxMixin, PrintError, QWidget):
 #			self.tab.deleteLater()
 		self.tab = None
 
+	def filter(self, p):
+		"""called by window search (we're the tab's searchable list)"""
+		if hasattr(self, "tiplist_widget") and self.tiplist_widget:
+			self.tiplist_widget.filter(p)
+
 	# TODO: not sure this is necessary
 	def refresh_ui(self):
 		if self.tab: 
@@ -311,6 +334,71 @@ class WalletUI(MessageBoxMixin, PrintError, QWidget):
 
 
 
+############################################################################
+#                                                                          #
+#    88                                                                    #
+#    88                                                         ,d         #
+#    88                                                         88         #
+#    88 88,dPYba,,adPYba,  8b,dPPYba,   ,adPPYba,  8b,dPPYba, MM88MMM      #
+#    88 88P'   "88"    "8a 88P'    "8a a8"     "8a 88P'   "Y8   88         #
+#    88 88      88      88 88       d8 8b       d8 88           88         #
+#    88 88      88      88 88b,   ,a8" "8a,   ,a8" 88           88,        #
+#    88 88      88      88 88`YbbdP"'   `"YbbdP"'  88           "Y888      #
+#                          88                                              #
+#                          88                                              #
+#                                                                          #
+#                                                                          #
+############################################################################
+
+class ImportProgressRow(QWidget):
+	"""progress of background reddit imports with a cancel button, shown above the tiplist while importing"""
+
+	def __init__(self, reddit: Reddit):
+		QWidget.__init__(self)
+		self.reddit = reddit
+		hbox = QHBoxLayout(self)
+		hbox.setContentsMargins(4, 2, 4, 2)
+		self.label = QLabel()
+		hbox.addWidget(self.label, 1)
+		self.progress_bar = QProgressBar()
+		self.progress_bar.setMaximumWidth(200)
+		self.progress_bar.setRange(0, 1000)
+		hbox.addWidget(self.progress_bar)
+		self.cancel_button = QPushButton(_("Cancel"))
+		self.cancel_button.clicked.connect(self.cancel)
+		hbox.addWidget(self.cancel_button)
+		self.hide()
+
+	def cancel(self):
+		self.cancel_button.setEnabled(False)
+		self.reddit.cancelImports()
+
+	def setProgress(self, progress: dict):
+		if progress["finished"]:
+			self.hide()
+			return
+		text = _("{description}: {scanned} items scanned, {digested} digested, {skipped} skipped ({rate:.1f} items/s)").format(
+			description = progress["description"],
+			scanned = progress["scanned"],
+			digested = progress["digested"],
+			skipped = progress["skipped"],
+			rate = progress["items_per_sec"],
+		)
+		if progress["eta_secs"] is not None:
+			eta = int(progress["eta_secs"])
+			text += ", " + _("ETA {m}:{s:02d}").format(m = eta // 60, s = eta % 60)
+		self.label.setText(text)
+		if progress["fraction"] is None:
+			self.progress_bar.setRange(0, 0) # busy indicator
+		else:
+			self.progress_bar.setRange(0, 1000)
+			self.progress_bar.setValue(int(progress["fraction"] * 1000))
+		if not self.isVisible():
+			self.cancel_button.setEnabled(True)
+			self.show()
+
+
+
 ########################################################################
 #                                                                      #
 #    88888888ba                                                        #
@@ -472,6 +560,14 @@ class WalletSettingsDialog(WindowModalDialog, PrintError, MessageBoxMixin):
 		self.cb_mark_read_digested_tips.stateChanged.connect(on_cb_mark_read_digested_tips)
 		grid.addWidget(self.cb_mark_read_digested_tips)
 
+		# tip store backend
+		self.cb_tip_store_sqlite = QCheckBox(_("Store tips in a separate database file next to the wallet file (recommended for many tips, takes effect on next activation)"))
+		self.cb_tip_store_sqlite.setChecked(read_config(self.wallet, "tip_store") == "sqlite")
+		def on_cb_tip_store_sqlite():
+			write_config(self.wallet, "tip_store", "sqlite" if self.cb_tip_store_sqlite.isChecked() else "wallet")
+		self.cb_tip_store_sqlite.stateChanged.connect(on_cb_tip_store_sqlite)
+		grid.addWidget(self.cb_tip_store_sqlite)
+
 		# --- group Default Tip Amount ------------------------------------------------------------------------------------------
 
 		main_layout.addStretch(1)